@@ -0,0 +1,165 @@
+# Состояние обхода между запусками паука link_parser: граница обхода, просмотренные страницы и файлы
+import json
+import math
+import sqlite3
+import time
+
+DAY = 86400
+# Априорная оценка частоты изменений: половина изменения за неделю наблюдений
+PRIOR_CHANGES = 0.5
+PRIOR_DAYS = 7
+
+
+class CrawlState:
+    """
+    SQLite-файл с состоянием обхода.
+
+    pages - страницы, которые уже скачивались: ETag и Last-Modified для условных запросов,
+    хэш содержимого, ссылки со страницы (по ним продолжается обход после ответа 304),
+    число проверок и обнаруженных изменений. frontier - запросы, поставленные в очередь
+    и ещё не обработанные: прерванный обход продолжается с них. files - найденные ссылки
+    на PDF/DOCX, чтобы не дописывать их в links.csv повторно.
+
+    Изменения фиксируются вызовом commit(), а не каждой записью: паук фиксирует их один раз
+    на ответ, поэтому отметка страницы обработанной и постановка её ссылок в границу обхода
+    сохраняются вместе или не сохраняются вовсе.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " sha1 TEXT,"
+            " links TEXT NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " checked_at REAL NOT NULL,"
+            " checks INTEGER NOT NULL,"
+            " changes INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS frontier (url TEXT PRIMARY KEY, priority INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS files (url TEXT PRIMARY KEY, type TEXT NOT NULL)")
+        self._db.commit()
+
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.new = 0
+
+    def page(self, url):
+        row = self._db.execute(
+            "SELECT etag, last_modified, sha1, links, first_seen, checked_at, checks, changes FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, sha1, links, first_seen, checked_at, checks, changes = row
+        return {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha1": sha1,
+            "links": json.loads(links),
+            "first_seen": first_seen,
+            "checked_at": checked_at,
+            "checks": checks,
+            "changes": changes,
+        }
+
+    def is_known(self, url):
+        return self._db.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    @staticmethod
+    def conditional_headers(page):
+        headers = {}
+        if page:
+            if page["etag"]:
+                headers["If-None-Match"] = page["etag"]
+            if page["last_modified"]:
+                headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    @staticmethod
+    def change_probability(page, now=None):
+        """
+        Вероятность, что страница изменилась с последней проверки. Изменения считаются
+        пуассоновским потоком с частотой (изменения + априорные) / (дни наблюдения + априорные):
+        страница, которая меняется при каждой проверке, быстро становится срочной, а неизменная
+        проверяется всё реже.
+        """
+        now = now or time.time()
+        observed_days = (page["checked_at"] - page["first_seen"]) / DAY
+        rate = (page["changes"] + PRIOR_CHANGES) / (observed_days + PRIOR_DAYS)
+        age_days = max(0.0, now - page["checked_at"]) / DAY
+        return 1 - math.exp(-rate * age_days)
+
+    def due_pages(self, min_probability=0.0):
+        """(url, вероятность изменения) страниц, которые пора перепроверить, сначала самые вероятные."""
+        now = time.time()
+        due = []
+        for url, first_seen, checked_at, changes in self._db.execute("SELECT url, first_seen, checked_at, changes FROM pages"):
+            probability = self.change_probability({"first_seen": first_seen, "checked_at": checked_at, "changes": changes}, now)
+            if probability >= min_probability:
+                due.append((url, probability))
+        due.sort(key=lambda item: item[1], reverse=True)
+        return due
+
+    def pending(self):
+        return self._db.execute("SELECT url, priority FROM frontier ORDER BY priority DESC").fetchall()
+
+    def push(self, url, priority):
+        self._db.execute("INSERT OR REPLACE INTO frontier (url, priority) VALUES (?, ?)", (url, priority))
+
+    def pop(self, url):
+        self._db.execute("DELETE FROM frontier WHERE url = ?", (url,))
+
+    def record_page(self, url, etag, last_modified, sha1, links):
+        """Ответ 200: запоминает валидаторы и ссылки страницы. True, если содержимое новое или изменилось."""
+        now = time.time()
+        page = self.page(url)
+        changed = page is None or page["sha1"] != sha1
+        if page is None:
+            self.new += 1
+            first_seen, checks, changes = now, 1, 0
+        else:
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+            first_seen, checks, changes = page["first_seen"], page["checks"] + 1, page["changes"] + int(changed)
+        self._db.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, sha1, links, first_seen, checked_at, checks, changes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, sha1, json.dumps(links, ensure_ascii=False), first_seen, now, checks, changes),
+        )
+        self._db.execute("DELETE FROM frontier WHERE url = ?", (url,))
+        return changed
+
+    def record_not_modified(self, url, etag=None, last_modified=None):
+        """Ответ 304: страница не изменилась, возвращает её запись с сохранёнными ссылками."""
+        self.not_modified += 1
+        self._db.execute(
+            "UPDATE pages SET checked_at = ?, checks = checks + 1,"
+            " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (time.time(), etag, last_modified, url),
+        )
+        self._db.execute("DELETE FROM frontier WHERE url = ?", (url,))
+        return self.page(url)
+
+    def add_file(self, url, file_type):
+        """True, если ссылка на файл встретилась впервые за все запуски."""
+        cursor = self._db.execute("INSERT OR IGNORE INTO files (url, type) VALUES (?, ?)", (url, file_type))
+        return cursor.rowcount > 0
+
+    def summary(self):
+        return f"новых страниц {self.new}, изменились {self.changed}, без изменений {self.unchanged}, не изменились (304) {self.not_modified}"
+
+    def commit(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
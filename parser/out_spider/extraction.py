@@ -0,0 +1,99 @@
+# Извлечение текста из HTML на lxml в пуле процессов, чтобы разбор не занимал поток реактора Scrapy
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree, html
+from twisted.internet import defer
+
+# Элементы, текст которых не относится к содержимому страницы
+DROP_TAGS = ['script', 'style', 'noscript', 'iframe', 'header', 'footer', 'aside', 'form']
+# Блок с основным текстом: <div>, <main> или <article> с одним из этих классов (первый в документе)
+MAIN_CONTENT = (
+    "//*[self::div or self::main or self::article]"
+    "[contains(concat(' ', normalize-space(@class), ' '), ' content ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' post ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' article ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' main ')]"
+)
+ADS = "//div[@class='ads']"
+
+
+def parse_html(body, encoding=None):
+    parser = html.HTMLParser(encoding=encoding, remove_comments=True)
+    try:
+        return html.document_fromstring(body, parser=parser)
+    except (etree.ParserError, ValueError):
+        # Пустой ответ или тело без разметки
+        return None
+
+
+def page_text(root):
+    etree.strip_elements(root, *DROP_TAGS, with_tail=False)
+    main_content = root.xpath(MAIN_CONTENT)
+    node = main_content[0] if main_content else root
+    return ' '.join(' '.join(node.itertext()).split())
+
+
+def cleaned_html(root):
+    # То же, что прежний clean_html: без скриптов, стилей, комментариев и рекламных блоков
+    etree.strip_elements(root, 'script', 'style', 'noscript', with_tail=False)
+    for ads in root.xpath(ADS):
+        ads.drop_tree()
+    return html.tostring(root, encoding='unicode')
+
+
+def extract(body, encoding=None, keep_html=False):
+    """
+    Поля элемента ContentItem по телу ответа: text_content, а с keep_html ещё raw_content
+    и cleaned_content. Тело разбирается один раз; вызывается в процессе пула.
+    """
+    fields = {}
+    if keep_html:
+        fields['raw_content'] = body.decode(encoding or 'utf-8', errors='replace')
+
+    root = parse_html(body, encoding)
+    if root is None:
+        fields['text_content'] = ''
+        if keep_html:
+            fields['cleaned_content'] = ''
+        return fields
+
+    if keep_html:
+        # Очистка и page_text удаляют разные элементы, поэтому HTML чистится на копии дерева:
+        # text_content не зависит от keep_html
+        fields['cleaned_content'] = cleaned_html(copy.deepcopy(root))
+    fields['text_content'] = page_text(root)
+    return fields
+
+
+class ExtractionPool:
+    """
+    Пул процессов для extract. submit возвращает Deferred, который async-колбэк паука ждёт
+    через maybe_deferred_to_future: реактор продолжает скачивание, пока страницы разбираются.
+    Число страниц в разборе ограничено самим Scrapy (CONCURRENT_REQUESTS и SCRAPER_SLOT_MAX_ACTIVE_SIZE).
+    """
+
+    def __init__(self, workers=None):
+        # spawn, а не fork: у процесса с реактором уже есть потоки (DNS, пул потоков Twisted)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, body, encoding=None, keep_html=False):
+        # Реактор импортируется здесь: Scrapy устанавливает его сам (TWISTED_REACTOR) после загрузки пауков
+        from twisted.internet import reactor
+
+        result = defer.Deferred()
+        future = self.executor.submit(extract, body, encoding, keep_html)
+
+        def done(future):
+            error = future.exception()
+            if error is not None:
+                reactor.callFromThread(result.errback, error)
+            else:
+                reactor.callFromThread(result.callback, future.result())
+
+        future.add_done_callback(done)
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
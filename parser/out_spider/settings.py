@@ -27,6 +27,11 @@ CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 1
 
 DOWNLOAD_TIMEOUT = 30  # Таймаут для скачивания страницы (по умолчанию 180 секунд)
+HTML_EXTRACT_WORKERS = 0  # Процессы разбора HTML в content_spider, 0 - по числу CPU
+
+# Инкрементальный обход link_parser: состояние между запусками и порог перепроверки известных страниц
+CRAWL_STATE = 'crawl_state.sqlite3'
+RECRAWL_MIN_CHANGE_PROBABILITY = 0.1  # перепроверяются страницы, изменившиеся с этой вероятностью и выше
 
 
 # Добавляем поддержку файловой пайплайна
@@ -1,112 +1,177 @@
-import os
+import argparse
+import asyncio
 import json
-from docx_parser import DocumentParser
-from docx import Document
-import requests
-from io import BytesIO
-
-
-# Основной метод для извлечения текста из документа
-def extract_text_from_docx(file_path):
-    try:
-        doc = Document(file_path)
-        text_data = []
-
-        # Извлекаем текст из параграфов
-        for para in doc.paragraphs:
-            para_text = para.text.strip()
-            if para_text:
-                text_data.append(para_text)
-
-        # Извлекаем текст из таблиц
-        table_data = extract_table_data(file_path)  # Используем второй метод для таблиц
-        for table_row in table_data:
-            text_data.append(" | ".join(table_row))  # Склеиваем данные ячеек таблицы
-
-        # Объединяем все извлеченные данные в одну строку
-        merge_text = " ".join(text_data)
-        return merge_text
-
-    except Exception as e:
-        print(f"Ошибка при обработке {os.path.basename(file_path)}: {e}")
-        return []
-
-# Метод для извлечения данных из таблиц
-def extract_table_data(docx_path):
-    doc = Document(docx_path)
-    table_data = []
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-    for table in doc.tables:
-        for row in table.rows:
-            row_data = []
+import httpx
 
-            for idx, cell in enumerate(row.cells):
-                cell_text = cell.text.strip()
+# Скачивание (rag_sources) и хранилище чанков (src/services) лежат в корне репозитория
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "src"))
 
-                # Если в ячейке несколько строк, например, во втором столбце
-                if '\n' in cell_text:
-                    cell_text = " ".join(cell_text.split('\n')).strip()
+from rag_sources.download_cache import DownloadCache  # noqa: E402
+from rag_sources.downloader import Downloader  # noqa: E402
+from rag_sources.extractors import extract_text_from_docx  # noqa: E402
 
-                row_data.append(cell_text)
-            table_data.append(row_data)
+LINKS_FILE = Path(__file__).resolve().parent / "links.csv"
+OUTPUT_JSONL = Path(__file__).resolve().parent / "parsed_docx.jsonl"
+DOWNLOAD_DIR = ROOT / "cache" / "docx"
+MAX_CONCURRENT = 12  # одновременных скачиваний (размер пула соединений)
+MAX_PER_HOST = 4
+MAX_RETRIES = 3
+MAX_PENDING = 64  # документов в работе одновременно: скачиваются или ждут разбора
 
-    return table_data
 
-# Функция для скачивания документа по URL
-def download_docx(url):
+# Разбор в пуле процессов: тот же парсер DOCX, что и в конвейере загрузки (rag_sources/extractors.py)
+def parse_docx(file_path):
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Проверка на ошибки HTTP
-        docx_file = BytesIO(response.content)  # Сохраняем контент в байтовый поток
-        return docx_file
+        return extract_text_from_docx(file_path)
     except Exception as e:
-        print(f"Ошибка при скачивании {url}: {e}")
-        return None
-
-
-# Основной процесс для обработки списка ссылок
-def process_docx_links(links):
-    result = {}
-
-    for url in links:
-        if not url.lower().endswith('.docx'):
-            continue
-
-        print(f"Обрабатывается: {url}")
-
-        # Скачиваем документ
-        docx_file = download_docx(url)
-        if docx_file:
-            # Извлекаем текст
-            text_content = extract_text_from_docx(docx_file)
-            result[url] = text_content
-
-    return result
-
-# Сохранение данных в JSON файл
-def save_to_json(data, filename='parsed_docx.json'):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-# Чтение списка ссылок из файла
+        print(f"Ошибка при обработке {os.path.basename(str(file_path))}: {e}")
+        return ""
+
+
+def is_docx(headers):
+    # Вместо документа сервер иногда отдаёт HTML-страницу (логин, 404 с кодом 200)
+    return "text/html" not in headers.get("content-type", "")
+
+
+async def iter_parsed_docx(links, download_dir=DOWNLOAD_DIR, workers=None, max_pending=MAX_PENDING):
+    """
+    Скачивает DOCX по ссылкам и отдаёт (url, текст) в порядке ссылок.
+
+    Скачивание асинхронное с общим пулом соединений и кэшем (rag_sources/download_cache.py),
+    разбор - в пуле процессов; одновременно в работе не больше max_pending документов,
+    поэтому память не растёт с числом ссылок. Готовые раньше очереди документы ждут
+    в окне, зато вывод и отбор копий дедупликацией не зависят от скорости скачивания.
+    """
+    loop = asyncio.get_running_loop()
+    cache = DownloadCache(download_dir, Path(download_dir) / "downloads.sqlite3")
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT)
+
+    async with httpx.AsyncClient(headers=headers, timeout=30, follow_redirects=True, limits=limits) as client:
+        downloader = Downloader(client, cache, per_host=MAX_PER_HOST, retries=MAX_RETRIES)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+
+            async def fetch_and_parse(url):
+                try:
+                    path = await downloader.fetch(url, suffix=".docx", accept=is_docx)
+                    if path is None:
+                        return url, None
+                    return url, await loop.run_in_executor(executor, parse_docx, str(path))
+                except Exception as e:
+                    print(f"Ошибка при обработке {url}: {e}")
+                    return url, None
+
+            pending = deque()
+            for url in links:
+                if len(pending) >= max_pending:
+                    yield await pending.popleft()
+                pending.append(asyncio.create_task(fetch_and_parse(url)))
+            while pending:
+                yield await pending.popleft()
+
+    print(cache.summary())
+    cache.close()
+
+
+# Чтение списка ссылок из файла (url или url,тип в строке), только DOCX без повторов
 def read_links_from_file(filename):
-    with open(filename, 'r') as file:
-        links = file.readlines()
-    return [link.strip() for link in links]
-
-if __name__ == "__main__":
-    links = read_links_from_file('parser\out_spider\spiders\links.csv')
-
-    parsed_data = process_docx_links(links)
+    with open(filename, 'r', encoding='utf-8') as file:
+        links = [line.split(',')[0].strip() for line in file]
+    return list(dict.fromkeys(link for link in links if link.lower().endswith('.docx')))
+
+
+class ParsedDocxWriter:
+    """
+    Куда пишутся разобранные документы: parsed_*.jsonl дописывается по одному документу,
+    для прежнего parsed_docx.json словарь собирается и сохраняется в конце. С chunk_store
+    документы сразу режутся на чанки (как rag_sources/docx_to_chunks_pipeline.py)
+    и дописываются в хранилище чанков. Чанки уже записаны к моменту, когда находится зеркало
+    документа, поэтому поле mirrors в этом режиме не заполняется, а из копий документа остаётся первая
+    по списку ссылок, а не самая новая - для этого нужен docx_to_chunks_pipeline.py по готовому
+    parsed_docx.jsonl.
+    """
+
+    def __init__(self, output, chunk_store=None):
+        self.output = Path(output)
+        self.documents = {} if self.output.suffix == ".json" else None
+        self._file = None if self.documents is not None else open(self.output, 'w', encoding='utf-8')
+        self.count = 0
+        self.store = self.dedup = None
+        if chunk_store:
+            from rag_sources.near_dedup import CorpusDeduplicator
+            from services.chunk_store import ChunkStoreWriter
+
+            self.store = ChunkStoreWriter(chunk_store)
+            self.dedup = CorpusDeduplicator(document_threshold=0.85, chunk_threshold=0.9)
+
+    def add(self, url, text):
+        self.count += 1
+        if self.documents is not None:
+            self.documents[url] = text
+        else:
+            self._file.write(json.dumps({"url": url, "text": text}, ensure_ascii=False) + "\n")
+        if self.store is not None:
+            self._add_chunks(url, text)
+
+    def _add_chunks(self, url, text):
+        from rag_sources.chunk_ids import assign_stable_ids
+        from rag_sources.chunking import chunk_by_gpt_tokens, normalize_text
+
+        text = normalize_text(text)
+        if not text or self.dedup.is_duplicate_document(url, text):
+            return
+        for chunk in self.dedup.filter_chunks(assign_stable_ids(chunk_by_gpt_tokens(text), url)):
+            self.store.add(chunk)
+
+    def close(self):
+        if self.documents is not None:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump(self.documents, f, ensure_ascii=False, indent=2)
+        else:
+            self._file.close()
+        if self.store is not None:
+            self.store.close()
+            print(self.dedup.summary())
+
+    def discard(self):
+        # Разобранное до ошибки сохраняется, а недописанное хранилище чанков не подменяет прежнее
+        self.store, store = None, self.store
+        if store is not None:
+            store.discard()
+        self.close()
+
+
+async def main(args):
+    links = read_links_from_file(args.links)
+    print(f"Ссылок на DOCX: {len(links)}")
+
+    writer = ParsedDocxWriter(args.output, args.chunk_store)
+    try:
+        async for url, text in iter_parsed_docx(links, args.download_dir, args.workers):
+            if text:
+                writer.add(url, text)
+    except BaseException:
+        writer.discard()
+        raise
+    writer.close()
+    print(f"Обработано ссылок: {writer.count} из {len(links)}")
 
-    output_json = 'parsed_docx.json'
-    save_to_json(parsed_data, output_json)
 
-    # Статистика
-    total_files = len(parsed_data)
-    total_text_elements = sum(len(texts) for texts in parsed_data.values())
-    print(f"Обработано ссылок: {total_files}")
-    print(f"Всего текстовых элементов: {total_text_elements}")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скачивание и разбор DOCX по ссылкам")
+    parser.add_argument("--links", type=Path, default=LINKS_FILE)
+    parser.add_argument("--output", type=Path, default=OUTPUT_JSONL, help="parsed_docx.json или parsed_docx.jsonl (дописывается по документу)")
+    parser.add_argument("--chunk-store", type=Path, help="Сразу нарезать документы на чанки в хранилище чанков")
+    parser.add_argument("--download-dir", type=Path, default=DOWNLOAD_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Процессы разбора DOCX")
+    asyncio.run(main(parser.parse_args()))
@@ -1,19 +1,22 @@
 # spiders/content_spider_html.py
 import scrapy
-import re
 from urllib.parse import urlparse
+from scrapy.utils.defer import maybe_deferred_to_future
+from out_spider.extraction import ExtractionPool
 from out_spider.items import ContentItem
-from bs4 import BeautifulSoup
 
 class ContentSpider(scrapy.Spider):
     name = 'content_spider'
 
-    def __init__(self, start_urls=None, *args, **kwargs):
+    def __init__(self, start_urls=None, keep_html=None, *args, **kwargs):
         super(ContentSpider, self).__init__(*args, **kwargs)
         if start_urls:
             self.start_urls = start_urls.split(',')
         else:
             self.start_urls = self.load_links()
+        # Исходный и очищенный HTML в элементах только по запросу: scrapy crawl content_spider -a keep_html=1
+        self.keep_html = keep_html not in (None, '', '0', 'false', 'False')
+        self.extraction_pool = None
 
     def load_links(self):
         try:
@@ -25,19 +28,25 @@ class ContentSpider(scrapy.Spider):
             print("Файл links.csv не найден")
             return []
 
-    def parse(self, response):
+    async def parse(self, response):
         item = ContentItem()
         item['url'] = response.url
         item['content_type'] = 'html' # Тип файла
         item['filename'] = self.generate_filename(response.url)
 
-        # Очищаем HTML
-        item['raw_content'] = response.body.decode('utf-8')  # Преобразуем в строку и сохраняем исходный HTML
-        item['cleaned_content'] = self.clean_html(response.body)  # Очищенный HTML
-        item['text_content'] = self.extract_text(response)  # Извлекаем текст
+        # Разбор HTML (и при keep_html - исходный и очищенный HTML) выполняется в пуле процессов
+        if self.extraction_pool is None:
+            self.extraction_pool = ExtractionPool(self.settings.getint('HTML_EXTRACT_WORKERS') or None)
+        fields = await maybe_deferred_to_future(self.extraction_pool.submit(response.body, response.encoding, self.keep_html))
+        for field, value in fields.items():
+            item[field] = value
 
         yield item
 
+    def closed(self, reason):
+        if self.extraction_pool is not None:
+            self.extraction_pool.close()
+
     def generate_filename(self, url):
         parsed = urlparse(url)
         path = parsed.path.strip('/')
@@ -47,34 +56,3 @@ class ContentSpider(scrapy.Spider):
         # Заменяем недопустимые символы
         filename = path.replace('/', '_').replace('\\', '_')
         return filename
-
-    def clean_html(self, html):
-        # Очистка HTML от ненужных тегов и элементов
-        cleaned_html = re.sub(r'<(script|style|noscript).*?>.*?</\1>', '', html.decode('utf-8'),
-                              flags=re.DOTALL)  # Удаляем скрипты, стили, noscript
-        cleaned_html = re.sub(r'<!--.*?-->', '', cleaned_html, flags=re.DOTALL)  # Удаляем комментарии
-        cleaned_html = re.sub(r'<div class="ads">.*?</div>', '', cleaned_html,
-                              flags=re.DOTALL)  # Удаляем рекламные блоки (если есть)
-        return cleaned_html
-
-
-    def extract_text(self, response):
-        soup = BeautifulSoup(response.body, 'html.parser')
-
-        # Удаляем ненужные элементы: скрипты, стили, если они есть
-        for element in soup(['script', 'style', 'noscript', 'iframe', 'header', 'footer', 'aside', 'form']):
-            element.decompose()
-
-        # Таргетируем основной контент:
-        # Допустим, основной текст находится в <div class="content"> или <main>
-        main_content = soup.find(['div', 'main', 'article'], class_=['content', 'post', 'article', 'main'])
-
-        # Если найден основной блок, извлекаем текст
-        if main_content:
-            text = main_content.get_text(separator=' ', strip=True)
-        else:
-            # Если не нашли целевой блок, извлекаем текст с всей страницы
-            text = soup.get_text(separator=' ', strip=True)
-
-        cleaned_text = ' '.join(text.split())
-        return cleaned_text
@@ -1,10 +1,14 @@
 import scrapy
+from scrapy.http import TextResponse
 from urllib.parse import urljoin, urlparse
 import csv
 import os
 import hashlib
 from scrapy.pipelines.files import FilesPipeline
 import requests
+from out_spider.crawl_state import CrawlState
+
+NEW_PAGE_PRIORITY = 100  # новые страницы и стартовые адреса раньше перепроверки известных
 
 
 class LinkParserSpider(scrapy.Spider):
@@ -14,36 +18,98 @@ class LinkParserSpider(scrapy.Spider):
     html_folder = "saved_html_pages"
     files_folder = "downloaded_files"
 
-    visited = set()
-    file_links = set()
-
     file_extensions = [".pdf", ".docx"]  # Массив для фильтрации файлов по расширениям
     allowed_extensions = [".pdf", ".docx", ".html"]
 
-    def __init__(self, start_urls=None, output_file=None, *args, **kwargs):
+    # 304 - ответ на условный запрос к неизменившейся странице, его тоже обрабатывает parse
+    handle_httpstatus_list = [304]
+
+    def __init__(self, start_urls=None, output_file=None, state_file=None, full=None, *args, **kwargs):
         super(LinkParserSpider, self).__init__(*args, **kwargs)
         if start_urls:
             self.start_urls = [start_urls]
         if output_file:
             self.output_file = output_file
+        # Состояние обхода между запусками (см. out_spider/crawl_state.py), по умолчанию CRAWL_STATE из настроек
+        self.state_file = state_file
+        # -a full=1: перепроверить все известные страницы, а не только те, что вероятно изменились
+        self.full = full not in (None, '', '0', 'false', 'False')
+        self.state = None
+
+        self.visited = set()
+        self.file_links = set()
 
         os.makedirs(self.html_folder, exist_ok=True)
         os.makedirs(self.files_folder, exist_ok=True)
 
+    async def start(self):
+        # Scrapy >= 2.13 вызывает start(), более ранние версии - start_requests()
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        self.state = CrawlState(self.state_file or self.settings.get('CRAWL_STATE', 'crawl_state.sqlite3'))
+        min_probability = 0.0 if self.full else self.settings.getfloat('RECRAWL_MIN_CHANGE_PROBABILITY', 0.1)
+
+        # Стартовые адреса, недообработанная граница прошлого запуска и известные страницы,
+        # которые вероятно изменились, - по убыванию вероятности изменения
+        queue = [(url, NEW_PAGE_PRIORITY) for url in self.start_urls]
+        queue += self.state.pending()
+        queue += [(url, round(probability * NEW_PAGE_PRIORITY)) for url, probability in self.state.due_pages(min_probability)]
+        for url, priority in queue:
+            if url not in self.visited:
+                self.visited.add(url)
+                yield self.page_request(url, priority)
+        self.state.commit()
+
+    def page_request(self, url, priority=NEW_PAGE_PRIORITY):
+        # Запрос попадает в границу обхода до отправки и убирается из неё после ответа;
+        # фиксируется вместе с остальными изменениями ответа (CrawlState.commit в parse)
+        self.state.push(url, priority)
+        return scrapy.Request(
+            url=url,
+            callback=self.parse,
+            errback=self.handle_error,
+            priority=priority,
+            headers=self.state.conditional_headers(self.state.page(url)),
+            meta={'page_url': url},
+        )
+
     def parse(self, response):
-        self.save_html_page(response.url, response.body)
+        # Состояние фиксируется одной транзакцией на ответ, а не на каждую найденную ссылку
+        try:
+            yield from self.parse_page(response)
+        finally:
+            self.state.commit()
+
+    def parse_page(self, response):
+        page_url = response.meta.get('page_url', response.url)
 
         if response.status == 404:
             self.logger.warning(f"Страница не найдена: {response.url}")
             return
 
-        links = response.css('a::attr(href)').getall()
+        if not isinstance(response, TextResponse):
+            # Внутренняя ссылка на изображение или архив: ссылок в ней нет
+            self.state.pop(page_url)
+            return
 
-        for link in links:
-            if link:
+        if response.status == 304:
+            # Страница не изменилась: тело не скачивалось, ссылки берём из состояния
+            page = self.state.record_not_modified(page_url, self.header(response, 'ETag'), self.header(response, 'Last-Modified'))
+            links = page['links'] if page else []
+        else:
+            links = [response.urljoin(link) for link in response.css('a::attr(href)').getall() if link]
+            changed = self.state.record_page(
+                page_url, self.header(response, 'ETag'), self.header(response, 'Last-Modified'), self.content_hash(response, links), links
+            )
+            # Сохранённая копия перезаписывается, только если страница новая или изменилась
+            if changed:
+                self.save_html_page(response.url, response.body)
+
+        for full_url in links:
+            if full_url:
                 try:
-                    full_url = response.urljoin(link)
-
                     # Пропускаем уже посещенные URL
                     if full_url in self.visited:
                         continue
@@ -57,22 +123,34 @@ class LinkParserSpider(scrapy.Spider):
                     if is_pdf or is_docx:
                         file_type = "pdf" if is_pdf else "docx"
                         self.file_links.add(full_url)
-                        self.save_link(full_url, file_type)
+                        # В links.csv попадают только файлы, не найденные в прошлых запусках
+                        if self.state.add_file(full_url, file_type):
+                            self.save_link(full_url, file_type)
 
                         # # Пробуем скачать файл
                         # self.download_file(full_url, file_type)
 
                     elif full_url.lower().endswith('.html') or urlparse(full_url).netloc == urlparse(
                             self.start_urls[0]).netloc:
-                        # Внутренние страницы продолжаем обходить
-                        yield scrapy.Request(
-                            url=full_url,
-                            callback=self.parse,
-                            errback=self.handle_error
-                        )
+                        # Внутренние страницы продолжаем обходить; известные уже перепроверены
+                        # в start_requests, если вероятно изменились
+                        if self.full or not self.state.is_known(full_url):
+                            yield self.page_request(full_url)
 
                 except Exception as e:
-                    self.logger.error(f"Ошибка при обработке ссылки {link}: {e}")
+                    self.logger.error(f"Ошибка при обработке ссылки {full_url}: {e}")
+
+    @staticmethod
+    def header(response, name):
+        value = response.headers.get(name)
+        return value.decode('latin-1') if value else None
+
+    @staticmethod
+    def content_hash(response, links):
+        # Хэш видимого текста и ссылок, а не тела: токены и метки времени в разметке не считаются изменением
+        text = response.xpath('//body//text()[not(ancestor::script) and not(ancestor::style)]').getall()
+        content = ' '.join(' '.join(text).split()) + '\n' + '\n'.join(links)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
     def save_html_page(self, url, html_content):
         try:
@@ -100,6 +178,12 @@ class LinkParserSpider(scrapy.Spider):
     def handle_error(self, failure):
         """Обработка ошибок запроса"""
         self.logger.error(f"Ошибка запроса: {failure.value}")
+        # Запрос уже повторялся RetryMiddleware, из границы обхода его убираем
+        self.state.pop(failure.request.meta.get('page_url', failure.request.url))
+        self.state.commit()
 
     def closed(self, reason):
         self.logger.info(f"Парсинг завершён. Всего найдено {len(self.visited)} ссылок, {len(self.file_links)} файлов.")
+        if self.state is not None:
+            self.logger.info(f"Состояние обхода: {self.state.summary()}")
+            self.state.close()
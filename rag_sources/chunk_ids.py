@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Идентификаторы чанков общие с сервером (src/services/chunk_ids.py): id точек в Qdrant выводятся из chunk_uid
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+from services.chunk_ids import assign_stable_ids, content_hash, document_key  # noqa: E402, F401
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+# Граница предложения: пробел после одного из этих знаков
+_SENTENCE_END = ".!?…"
+
+_encoding = None
+
+
+def get_encoding():
+    global _encoding
+    # tiktoken нужен только для нарезки: извлечение текста (normalize_text) и сервер без него обходятся
+    import tiktoken
+
+    if _encoding is None:
+        _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    return _encoding
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def token_offsets(enc, tokens):
+    """
+    Смещение начала каждого токена в символах текста (плюс конец текста) и признак того,
+    что токен начинается на границе символа, а не с середины многобайтового символа.
+    """
+    token_bytes = enc.decode_tokens_bytes(tokens)
+    data = np.frombuffer(b"".join(token_bytes), dtype=np.uint8)
+    # Байт начинает символ, если это не продолжение многобайтовой последовательности UTF-8 (10xxxxxx)
+    char_start = np.append((data & 0xC0) != 0x80, True)
+    char_index = np.cumsum(char_start) - 1
+    byte_offsets = np.zeros(len(token_bytes) + 1, dtype=np.int64)
+    np.cumsum([len(token) for token in token_bytes], out=byte_offsets[1:])
+    return char_index[byte_offsets].tolist(), char_start[byte_offsets].tolist()
+
+
+def _word_boundary(text, offset):
+    return 0 < offset < len(text) and (text[offset].isspace() or text[offset - 1].isspace())
+
+
+def _sentence_boundary(text, offset):
+    # Пробел между словами бывает и в конце предыдущего токена, и в начале следующего
+    before = offset - 1 if text[offset].isspace() else offset - 2
+    return before >= 0 and text[before] in _SENTENCE_END
+
+
+def _snap_end(text, offsets, clean, start, end):
+    """Конец чанка не дальше end: конец предложения в последней четверти, иначе пробел во второй половине."""
+    sentence_floor = end - max(1, (end - start) // 4)
+    word_floor = start + max(1, (end - start) // 2)
+    word_end = None
+    for t in range(end, word_floor - 1, -1):
+        if word_end is not None and t < sentence_floor:
+            break
+        if not _word_boundary(text, offsets[t]):
+            continue
+        if t >= sentence_floor and _sentence_boundary(text, offsets[t]):
+            return t
+        if word_end is None:
+            word_end = t
+    if word_end is not None:
+        return word_end
+    # Длинный фрагмент без пробелов режем по последней целой границе символа
+    for t in range(end, start, -1):
+        if clean[t]:
+            return t
+    return end
+
+
+def _snap_start(text, offsets, start, end, overlap):
+    """Начало следующего чанка: перекрытие до overlap токенов, начиная с целого слова."""
+    if overlap <= 0:
+        return end
+    for t in range(max(end - overlap, start + 1), end):
+        if _word_boundary(text, offsets[t]):
+            return t
+    return end
+
+
+def chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Чанки по chunk_size токенов с перекрытием overlap за один проход по тексту.
+
+    Текст кодируется один раз, границы чанков выбираются по заранее посчитанным смещениям
+    токенов: конец чанка сдвигается назад к концу предложения или пробелу без повторного
+    кодирования, start_offset/end_offset - точные позиции чанка в text
+    (text[start_offset:end_offset] == chunk["text"]), в том числе для повторяющихся фрагментов.
+    """
+    enc = get_encoding()
+    tokens = enc.encode_ordinary(text)
+    offsets, clean = token_offsets(enc, tokens)
+
+    chunks, start = [], 0
+    while start < len(tokens):
+        end = min(start + chunk_size, len(tokens))
+        if end < len(tokens):
+            end = _snap_end(text, offsets, clean, start, end)
+
+        start_offset, end_offset = offsets[start], offsets[end]
+        while start_offset < end_offset and text[start_offset].isspace():
+            start_offset += 1
+        while end_offset > start_offset and text[end_offset - 1].isspace():
+            end_offset -= 1
+        if end_offset > start_offset:
+            chunk_id = len(chunks)
+            chunks.append({
+                "chunk_uid": f"chunk_{chunk_id}",
+                "chunk_id": chunk_id,
+                "text": text[start_offset:end_offset],
+                "token_count": end - start,
+                "start_offset": start_offset,
+                "end_offset": end_offset
+            })
+
+        if end >= len(tokens):
+            break
+        start = _snap_start(text, offsets, start, end, overlap)
+    return chunks
@@ -1,82 +1,67 @@
+import argparse
 import json
-import re
+import sys
 from pathlib import Path
-import tiktoken
 from tqdm import tqdm
 
-INPUT_JSON = Path(r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\parser\out_spider\spiders\parsed_docx.json")
-OUTPUT_JSON = Path(r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\rag_sources\chunks_all_docx.json")
-
-# Создаем папку, если нужно
-OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-
-# --- Функции ---
-def normalize_text(text):
-    return re.sub(r'\s+', ' ', text).strip()
-
-def chunk_by_gpt_tokens(text, chunk_size=512, overlap=50):
-    enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    tokens = enc.encode(text)
-
-    chunks = []
-    start_idx = 0
-    chunk_id = 0
-
-    while start_idx < len(tokens):
-        end_idx = min(start_idx + chunk_size, len(tokens))
-        chunk_text = enc.decode(tokens[start_idx:end_idx])
-
-        last_space = chunk_text.rfind(" ")
-        if last_space != -1 and end_idx != len(tokens):
-            chunk_text_trimmed = chunk_text[:last_space]
-            new_end_idx = start_idx + len(enc.encode(chunk_text_trimmed))
-            chunk_text = chunk_text_trimmed
-        else:
-            new_end_idx = end_idx
-
-        start_offset = text.find(chunk_text)
-        end_offset = start_offset + len(chunk_text)
-
-        chunks.append({
-            "chunk_uid": f"chunk_{chunk_id}",
-            "chunk_id": chunk_id,
-            "text": chunk_text.strip(),
-            "token_count": len(enc.encode(chunk_text)),
-            "start_offset": start_offset,
-            "end_offset": end_offset
-        })
-
-        start_idx = max(new_end_idx - overlap, new_end_idx)
-        chunk_id += 1
-
-    return chunks
+from rag_sources.chunk_ids import assign_stable_ids
+from rag_sources.chunking import chunk_by_gpt_tokens, normalize_text
+from rag_sources.near_dedup import CorpusDeduplicator
+
+# Пути относительно корня репозитория
+ROOT = Path(__file__).resolve().parent.parent
+INPUT_JSONL = ROOT / "parser" / "out_spider" / "spiders" / "parsed_docx.jsonl"
+OUTPUT_JSON = ROOT / "rag_sources" / "chunks_all_docx.json"
+
+# Формат хранилища чанков общий с сервером (src/services/chunk_store.py)
+sys.path.append(str(ROOT / "src"))
+from services.chunk_metadata import document_date  # noqa: E402
+from services.chunk_store import save_chunks  # noqa: E402
+
+
+def iter_documents(path):
+    """(url, текст) из parsed_docx.json ({url: текст}) или parsed_docx.jsonl (строки {"url", "text"})."""
+    if path.suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["url"], record["text"]
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from json.load(f).items()
 
 # --- Основной скрипт ---
-with open(INPUT_JSON, "r", encoding="utf-8") as f:
-    documents_dict = json.load(f)
-
-all_chunks = []
-global_chunk_id = 0  # для уникальности chunk_id по всем документам
-
-for doc_id, text in tqdm(documents_dict.items(), desc="Chunking documents"):
-    if isinstance(text, list):
-        text = " ".join(map(str, text))
-    elif not isinstance(text, str):
-        text = str(text)
-
-    text = normalize_text(text)
-    chunks = chunk_by_gpt_tokens(text, chunk_size=512, overlap=50)
-
-    for chunk in chunks:
-        chunk["document_id"] = doc_id
-        # глобальный chunk_id
-        chunk["chunk_id"] = global_chunk_id
-        chunk["chunk_uid"] = f"chunk_{global_chunk_id}"
-        global_chunk_id += 1
-        all_chunks.append(chunk)
-
-# Сохраняем JSON
-with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-    json.dump({"chunks": all_chunks}, f, ensure_ascii=False, indent=2)
-
-print(f"Все документы с чанками сохранены в {OUTPUT_JSON}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Чанки из текстов DOCX (parsed_docx.jsonl)")
+    parser.add_argument("--input", type=Path, default=INPUT_JSONL, help="parsed_docx.json или parsed_docx.jsonl")
+    parser.add_argument("--output", type=Path, default=OUTPUT_JSON, help="chunks_*.json или каталог хранилища чанков")
+    args = parser.parse_args()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    all_chunks = []
+    # Зеркала и копии документов отбрасываются до чанкинга, чтобы не платить за их эмбеддинги
+    dedup = CorpusDeduplicator(document_threshold=0.85, chunk_threshold=0.9)
+
+    for doc_id, text in tqdm(iter_documents(args.input), desc="Chunking documents"):
+        if isinstance(text, list):
+            text = " ".join(map(str, text))
+        elif not isinstance(text, str):
+            text = str(text)
+
+        text = normalize_text(text)
+        # Из копий документа остаётся самая новая по году в URL
+        if not text or dedup.is_duplicate_document(doc_id, text, version=document_date({"url": doc_id})):
+            continue
+        chunks = chunk_by_gpt_tokens(text, chunk_size=512, overlap=50)
+
+        # chunk_uid зависит только от документа и текста чанка, а не от позиции в корпусе
+        all_chunks.extend(dedup.filter_chunks(assign_stable_ids(chunks, doc_id)))
+
+    all_chunks = dedup.attach_mirrors(dedup.without_superseded(all_chunks))
+    print(dedup.summary())
+
+    # .json - прежний формат, иначе каталог хранилища чанков
+    save_chunks(all_chunks, args.output)
+
+    print(f"Все документы с чанками сохранены в {args.output}")
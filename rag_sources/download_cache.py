@@ -0,0 +1,209 @@
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path, PurePosixPath
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+# Символы пути, которые не перекодируются при приведении URL к каноническому виду
+_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+_DEFAULT_PORTS = {("http", 80), ("https", 443)}
+
+
+def canonical_url(url):
+    """
+    Ключ кэша для URL: схема и хост в нижнем регистре, без порта по умолчанию и фрагмента,
+    путь в едином процентном кодировании, параметры запроса отсортированы.
+    """
+    parts = urlsplit(url.strip())
+    scheme, host, port = parts.scheme.lower(), (parts.hostname or "").lower(), parts.port
+    netloc = host if port is None or (scheme, port) in _DEFAULT_PORTS else f"{host}:{port}"
+    path = quote(unquote(parts.path) or "/", safe=_PATH_SAFE)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_key(url):
+    return hashlib.sha1(canonical_url(url).encode("utf-8")).hexdigest()
+
+
+def url_filename(url):
+    """Исходное имя документа - последняя часть пути URL; файл в кэше называется по содержимому."""
+    return unquote(PurePosixPath(urlsplit(url).path).name)
+
+
+class PartialDownload:
+    """
+    Временный файл загрузки: тело пишется по частям и сразу хэшируется.
+
+    С resume=True уже скачанное начало сохраняется (и хэшируется заново), чтобы докачать
+    остаток запросом Range; валидатор ответа (ETag или Last-Modified), к которому относится
+    начало файла, хранится рядом в <имя>.validator и передаётся в If-Range.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.validator_path = path.with_name(path.name + ".validator")
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+        self.validator = None
+        if resume and path.exists() and self.validator_path.exists():
+            self.validator = self.validator_path.read_text(encoding="utf-8") or None
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    self.sha1.update(block)
+                    self.size += len(block)
+        self._file = open(path, "ab" if self.size else "wb")
+
+    def remember_validator(self, headers):
+        # Strong ETag надёжнее даты; слабый (W/...) для If-Range не подходит
+        etag = headers.get("etag")
+        self.validator = etag if etag and not etag.startswith("W/") else headers.get("last-modified")
+        self.validator_path.write_text(self.validator or "", encoding="utf-8")
+
+    def restart(self):
+        """Начать файл заново: сервер прислал всё тело, а не продолжение."""
+        self._file.close()
+        self._file = open(self.path, "wb")
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+
+    def write(self, block):
+        self._file.write(block)
+        self.sha1.update(block)
+        self.size += len(block)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.validator_path.unlink(missing_ok=True)
+        self.size = 0
+        self.validator = None
+
+
+class DownloadCache:
+    """
+    Кэш скачанных документов с адресацией по содержимому.
+
+    Файл хранится в objects_dir под именем <sha1 содержимого><suffix>, поэтому одинаковые
+    документы по разным ссылкам лежат один раз, а имя не зависит от запуска. В SQLite
+    (index_path) для канонического URL записаны sha1 файла, ETag и Last-Modified ответа:
+    по ним следующий запрос становится условным (If-None-Match / If-Modified-Since),
+    и неизменившийся документ подтверждается ответом 304 без передачи тела.
+    """
+
+    def __init__(self, objects_dir, index_path):
+        self.objects_dir = Path(objects_dir)
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.parts_dir = self.objects_dir / ".parts"
+        self.parts_dir.mkdir(exist_ok=True)
+        Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(index_path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " sha1 TEXT NOT NULL,"
+            " suffix TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS downloads_sha1 ON downloads (sha1)")
+        self._db.commit()
+
+        self.hits = 0  # подтверждены ответом 304
+        self.downloaded = 0
+        self.unchanged = 0  # скачаны заново, но содержимое то же
+
+    def object_path(self, sha1, suffix):
+        return self.objects_dir / f"{sha1}{suffix}"
+
+    def lookup(self, url):
+        """Запись кэша для URL ({"path", "sha1", "etag", "last_modified", ...}) или None, если файла нет."""
+        row = self._db.execute(
+            "SELECT sha1, suffix, size, etag, last_modified, fetched_at FROM downloads WHERE key = ?", (url_key(url),)
+        ).fetchone()
+        if row is None:
+            return None
+        sha1, suffix, size, etag, last_modified, fetched_at = row
+        path = self.object_path(sha1, suffix)
+        if not path.exists():
+            return None
+        return {"path": path, "sha1": sha1, "size": size, "etag": etag, "last_modified": last_modified, "fetched_at": fetched_at}
+
+    def urls(self, sha1):
+        """Канонические URL, по которым скачан файл с этим содержимым, в постоянном порядке."""
+        return [url for (url,) in self._db.execute("SELECT url FROM downloads WHERE sha1 = ? ORDER BY url", (sha1,))]
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def start(self, url, resume=False):
+        return PartialDownload(self.parts_dir / f"{url_key(url)}.part", resume=resume)
+
+    def commit(self, url, part, headers, suffix=""):
+        """Переносит скачанный файл в кэш под именем по содержимому и запоминает валидаторы ответа."""
+        part.close()
+        sha1 = part.sha1.hexdigest()
+        path = self.object_path(sha1, suffix)
+        previous = self.lookup(url)
+        if path.exists():
+            part.path.unlink(missing_ok=True)
+        else:
+            os.replace(part.path, path)
+        part.validator_path.unlink(missing_ok=True)
+        self._save(url, sha1, suffix, part.size, headers)
+
+        if previous and previous["sha1"] == sha1:
+            self.unchanged += 1
+        else:
+            self.downloaded += 1
+            if previous:
+                self._release(previous["path"], previous["sha1"])
+        return path
+
+    def not_modified(self, url, entry, headers):
+        """Ответ 304: файл в кэше актуален, обновляем валидаторы, если сервер прислал новые."""
+        self.hits += 1
+        self._save(
+            url,
+            entry["sha1"],
+            entry["path"].suffix,
+            entry["size"],
+            {"etag": headers.get("etag") or entry["etag"], "last-modified": headers.get("last-modified") or entry["last_modified"]},
+        )
+        return entry["path"]
+
+    def _save(self, url, sha1, suffix, size, headers):
+        self._db.execute(
+            "INSERT OR REPLACE INTO downloads (key, url, sha1, suffix, size, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url_key(url), canonical_url(url), sha1, suffix, size, headers.get("etag"), headers.get("last-modified"), time.time()),
+        )
+        self._db.commit()
+
+    def _release(self, path, sha1):
+        # Прежняя версия документа удаляется, если на неё не ссылается другой URL
+        (count,) = self._db.execute("SELECT COUNT(*) FROM downloads WHERE sha1 = ?", (sha1,)).fetchone()
+        if not count:
+            path.unlink(missing_ok=True)
+
+    def summary(self):
+        return f"скачано {self.downloaded}, не изменились (304) {self.hits}, скачаны повторно без изменений {self.unchanged}"
+
+    def close(self):
+        self._db.close()
@@ -1,17 +1,24 @@
 import asyncio
-import aiohttp
-import aiofiles
+import httpx
 import pandas as pd
 import os
 from pathlib import Path
 from tqdm.asyncio import tqdm_asyncio
 from urllib.parse import quote
 
-# НАСТРОЙКИ
-INPUT_CSV = r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\parser\out_spider\spiders\links.csv"  # путь к CSV с ссылками
-DOWNLOAD_DIR = r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\rag_sources\saved_pdf"  # папка для скачанных PDF
+from rag_sources.download_cache import DownloadCache
+from rag_sources.downloader import Downloader
+
+# НАСТРОЙКИ (пути относительно корня репозитория; полный конвейер - src/ingest.py pipeline)
+ROOT = Path(__file__).resolve().parent.parent
+INPUT_CSV = ROOT / "parser" / "out_spider" / "spiders" / "links.csv"  # путь к CSV с ссылками
+DOWNLOAD_DIR = ROOT / "rag_sources" / "saved_pdf"  # папка для скачанных PDF
+CACHE_INDEX = DOWNLOAD_DIR / "downloads.sqlite3"  # ETag/Last-Modified и sha1 скачанных файлов по URL
 MAX_CONCURRENT = 12  # количество одновременных скачиваний
-MAX_RETRIES = 3      # попыток при ошибке
+MAX_PER_HOST = 4     # одновременных запросов к одному хосту
+MAX_RETRIES = 3      # повторов при сетевой ошибке или ответе 408/429/5xx
+BACKOFF_SECONDS = 1.0  # базовая задержка повтора, растёт вдвое с каждой попыткой
+MAX_BYTES_PER_SECOND = 0  # общий предел скорости, 0 - без предела
 
 # Создаём папку для PDF
 os.makedirs(os.path.join(DOWNLOAD_DIR, "pdf"), exist_ok=True)
@@ -24,41 +31,34 @@ urls = list(dict.fromkeys(urls))  # удаляем дубликаты
 
 print(f"Всего ссылок для скачивания: {len(urls)}")
 
-# Асинхронная функция скачивания PDF
-async def download_pdf(session, url, idx):
-    encoded_url = quote(url, safe=':/?=&')
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            async with session.get(encoded_url, timeout=30, ssl=False) as response:
-                if response.status == 200:
-                    content_type = response.headers.get("Content-Type", "")
-                    if "pdf" not in content_type.lower():
-                        return  # игнорируем не-PDF
+# Файлы называются по sha1 содержимого, повторный запуск отправляет условные запросы
+cache = DownloadCache(Path(DOWNLOAD_DIR) / "pdf", CACHE_INDEX)
+
 
-                    # Генерация уникального имени файла
-                    folder = "pdf"
-                    safe_name = f"{folder}_{idx}_{abs(hash(url))}.pdf"
-                    file_path = Path(DOWNLOAD_DIR) / folder / safe_name
+def is_pdf(headers):
+    return "pdf" in headers.get("content-type", "").lower()
 
-                    if not file_path.exists():
-                        async with aiofiles.open(file_path, 'wb') as f:
-                            content = await response.read()
-                            await f.write(content)
-                    return  # успешно скачано
-                else:
-                    raise Exception(f"HTTP {response.status}")
-        except:
-            if attempt < MAX_RETRIES:
-                await asyncio.sleep(1)
-            # Если попытки закончились, просто пропускаем файл
+
+# Асинхронная функция скачивания PDF
+async def download_pdf(downloader, url):
+    encoded_url = quote(url, safe=':/?=&')
+    try:
+        # Не-PDF игнорируем, недокачанное остаётся в кэше и докачивается при следующем запуске
+        await downloader.fetch(encoded_url, suffix=".pdf", accept=is_pdf)
+    except Exception:
+        pass  # Если попытки закончились, просто пропускаем файл
 
 # Главная функция
 async def main():
-    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENT)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        tasks = [download_pdf(session, url, idx+1) for idx, url in enumerate(urls)]
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT)
+    async with httpx.AsyncClient(timeout=30, verify=False, follow_redirects=True, limits=limits) as client:
+        downloader = Downloader(
+            client, cache, per_host=MAX_PER_HOST, bytes_per_second=MAX_BYTES_PER_SECOND, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS
+        )
+        tasks = [download_pdf(downloader, url) for url in urls]
         for f in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Скачивание PDF"):
             await f
+    print(f"{cache.summary()}, докачано {downloader.resumed}")
 
 # Запуск скрипта
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+import asyncio
+import random
+import re
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+# Ответы, после которых имеет смысл повторить запрос; остальные 4xx - окончательная ошибка
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+BLOCK_SIZE = 1 << 16
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class RetryableError(Exception):
+    pass
+
+
+class ByteRateLimiter:
+    """Общий для всех загрузок предел скорости в байтах в секунду (token bucket); 0 - без предела."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self.allowance = float(bytes_per_second)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, size):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= size
+            if self.allowance < 0:
+                # Долг выплачивается ожиданием; lock держится, поэтому остальные загрузки тоже ждут
+                await asyncio.sleep(-self.allowance / self.rate)
+                self.updated = time.monotonic()
+                self.allowance = 0.0
+
+
+class Downloader:
+    """
+    Скачивание документов в DownloadCache с ограниченной памятью.
+
+    Тело пишется на диск блоками по BLOCK_SIZE через временный файл кэша и переносится на место
+    атомарно. Оборванная загрузка докачивается запросом Range с If-Range, если сервер прислал
+    для неё строгий ETag или Last-Modified. Сетевые ошибки и ответы 408/429/5xx повторяются
+    с экспоненциальной задержкой со случайным разбросом (full jitter), одновременных запросов
+    к одному хосту не больше per_host, а суммарная скорость ограничена bytes_per_second.
+    """
+
+    def __init__(self, client, cache, per_host=4, bytes_per_second=0, retries=3, backoff=1.0, max_backoff=30.0):
+        self.client = client
+        self.cache = cache
+        self.per_host = per_host
+        self.limiter = ByteRateLimiter(bytes_per_second)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.resumed = 0
+        self._hosts = {}
+
+    def _host_slot(self, url):
+        host = urlsplit(url).hostname or ""
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def fetch(self, url, suffix="", accept=None):
+        """
+        Путь к актуальной копии документа в кэше или None, если accept(headers) отверг ответ
+        (например, вместо PDF пришла HTML-страница).
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._host_slot(url):
+                    return await self._fetch_once(url, suffix, accept)
+            except (httpx.TransportError, RetryableError):
+                if attempt >= self.retries:
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+                await asyncio.sleep(delay)
+
+    async def _fetch_once(self, url, suffix, accept):
+        entry = self.cache.lookup(url)
+        part = self.cache.start(url, resume=True)
+        headers = self.cache.conditional_headers(entry)
+        if part.size and part.validator:
+            headers = {"Range": f"bytes={part.size}-", "If-Range": part.validator}
+        # Без сжатия при передаче: смещения Range относятся к байтам файла
+        headers["Accept-Encoding"] = "identity"
+
+        completed = False
+        try:
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and entry:
+                    part.discard()
+                    completed = True
+                    return self.cache.not_modified(url, entry, response.headers)
+                if response.status_code == 416:
+                    # Докачивать нечего или начало устарело - в следующей попытке скачаем заново
+                    part.discard()
+                    raise RetryableError(f"{url}: HTTP 416 на Range")
+                if response.status_code in RETRY_STATUSES:
+                    raise RetryableError(f"{url}: HTTP {response.status_code}")
+                if response.is_error:
+                    # Окончательный отказ (4xx): начало файла больше не пригодится, и Range по нему не уйдёт
+                    part.discard()
+                response.raise_for_status()
+                if accept is not None and not accept(response.headers):
+                    part.discard()
+                    completed = True
+                    return None
+
+                if response.status_code == 206:
+                    if not self._continues(response.headers, part.size):
+                        part.discard()
+                        raise RetryableError(f"{url}: Content-Range не продолжает скачанное начало")
+                    self.resumed += 1
+                else:
+                    part.restart()
+                part.remember_validator(response.headers)
+
+                async for block in response.aiter_bytes(BLOCK_SIZE):
+                    await self.limiter.acquire(len(block))
+                    part.write(block)
+            completed = True
+        finally:
+            # Недокачанный файл остаётся на диске для докачки в следующей попытке или следующем запуске,
+            # если её можно продолжить: есть скачанное начало и валидатор для If-Range
+            if not completed:
+                if part.size and part.validator:
+                    part.close()
+                else:
+                    part.discard()
+        return self.cache.commit(url, part, response.headers, suffix=suffix)
+
+    @staticmethod
+    def _continues(headers, offset):
+        match = _CONTENT_RANGE.match(headers.get("content-range", ""))
+        return bool(match) and int(match.group(1)) == offset
@@ -0,0 +1,161 @@
+import hashlib
+import os
+from pathlib import Path
+
+from rag_sources.chunking import normalize_text
+
+# Зависимости извлечения (pdfminer, pytesseract, python-docx, bs4) импортируются внутри функций:
+# модуль загружается в процессах пула, и для docx/html не нужен стек OCR
+
+# Текстовый слой короче этого (без пробелов) - скорее всего, скан с номером страницы или колонтитулом,
+# и страница распознаётся OCR
+OCR_MIN_TEXT_CHARS = 50
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_page_count(pdf_path):
+    from pdfminer.pdfpage import PDFPage
+
+    with open(pdf_path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+
+def _pdf_page_text_layer(pdf_path, page_number):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTFigure, LTTextContainer
+
+    def recursive_elements(elements):
+        for el in elements:
+            if isinstance(el, LTTextContainer):
+                yield el
+            elif isinstance(el, LTFigure):
+                yield from recursive_elements(el._objs)
+
+    page_text = []
+    for page_layout in extract_pages(pdf_path, page_numbers=[page_number]):
+        for element in recursive_elements(page_layout):
+            text = element.get_text().strip()
+            if text:
+                page_text.append(text)
+    return "\n".join(page_text)
+
+
+def _pdf_page_ocr(pdf_path, page_number):
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    # Растеризуем только эту страницу: в памяти одновременно одно изображение, а не весь документ
+    images = convert_from_path(pdf_path, first_page=page_number + 1, last_page=page_number + 1)
+    return "\n".join(pytesseract.image_to_string(img, config="--psm 6").strip() for img in images)
+
+
+def extract_pdf_page(pdf_path, page_number, file_hash=None, cache_dir=None):
+    """
+    Текст одной страницы PDF (нумерация с 0): текстовый слой, а если в нём меньше OCR_MIN_TEXT_CHARS
+    символов - OCR этой страницы, когда он распознал больше текста.
+
+    С cache_dir результат сохраняется в <cache_dir>/<sha1 файла>/<страница>.txt, и повторный
+    запуск по тому же файлу берёт готовые страницы из кэша.
+    """
+    cache_path = None
+    if cache_dir:
+        file_hash = file_hash or file_sha1(pdf_path)
+        cache_path = Path(cache_dir) / file_hash / f"{page_number:05d}.txt"
+        if cache_path.exists():
+            return cache_path.read_text(encoding="utf-8")
+
+    text = _pdf_page_text_layer(pdf_path, page_number)
+    if len("".join(text.split())) < OCR_MIN_TEXT_CHARS:
+        ocr_text = _pdf_page_ocr(pdf_path, page_number).strip()
+        if len(ocr_text) > len(text):
+            text = ocr_text
+
+    if cache_path:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Через временный файл: параллельный воркер или оборванный запуск не оставят половину страницы
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, cache_path)
+    return text
+
+
+def pdf_page_errors():
+    """Ошибки разбора страницы PDF и OCR: после них пропускается страница, а не весь файл."""
+    import pytesseract
+    from pdf2image import exceptions as pdf2image_errors
+    from pdfminer.psparser import PSException
+
+    return (
+        PSException,
+        pytesseract.TesseractError,
+        pytesseract.TesseractNotFoundError,
+        pdf2image_errors.PopplerNotInstalledError,
+        pdf2image_errors.PDFPageCountError,
+        pdf2image_errors.PDFSyntaxError,
+        pdf2image_errors.PDFPopplerTimeoutError,
+    )
+
+
+def join_pdf_pages(pages):
+    return normalize_text("\n\n".join(page for page in pages if page))
+
+
+def extract_text_from_pdf(pdf_path, cache_dir=None, executor=None):
+    """
+    Текст PDF постранично. С executor страницы обрабатываются параллельно в нём
+    (страница - единица работы), иначе по очереди в текущем процессе.
+    """
+    file_hash = file_sha1(pdf_path) if cache_dir else None
+    pages = range(pdf_page_count(pdf_path))
+    if executor is None:
+        return join_pdf_pages(extract_pdf_page(pdf_path, page, file_hash, cache_dir) for page in pages)
+    futures = [executor.submit(extract_pdf_page, pdf_path, page, file_hash, cache_dir) for page in pages]
+    return join_pdf_pages(future.result() for future in futures)
+
+
+def extract_text_from_docx(source):
+    """Текст параграфов и строки таблиц (ячейки через " | "); source - путь или файловый объект."""
+    from docx import Document
+
+    doc = Document(source)
+    text_data = [para.text.strip() for para in doc.paragraphs if para.text.strip()]
+    for table in doc.tables:
+        for row in table.rows:
+            text_data.append(" | ".join(" ".join(cell.text.split("\n")).strip() for cell in row.cells))
+    return normalize_text(" ".join(text_data))
+
+
+def extract_text_from_html(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(["script", "style", "noscript", "iframe", "header", "footer", "aside", "form"]):
+        element.decompose()
+
+    # Основной текст обычно лежит в <div class="content"> или <main>, иначе берём всю страницу
+    main_content = soup.find(["div", "main", "article"], class_=["content", "post", "article", "main"])
+    node = main_content or soup
+    return normalize_text(node.get_text(separator=" ", strip=True))
+
+
+def extract_text(kind, path, pdf_cache_dir=None):
+    """Текст скачанного файла по его типу (pdf, docx, html); пустая строка, если текста нет."""
+    if kind == "pdf":
+        return extract_text_from_pdf(path, cache_dir=pdf_cache_dir)
+    if kind == "docx":
+        return extract_text_from_docx(path)
+    if kind == "html":
+        return extract_text_from_html(Path(path).read_bytes())
+    raise ValueError(f"Неизвестный тип документа: {kind}")
+
+
+def extract_document(document, pdf_cache_dir=None):
+    """Стадия extract конвейера src/ingest.py pipeline: документ {"url", "kind", "path"} дополняется текстом."""
+    return {**document, "text": extract_text(document["kind"], document["path"], pdf_cache_dir)}
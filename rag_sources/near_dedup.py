@@ -0,0 +1,187 @@
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+# Простое число Мерсенна 2^31 - 1: произведения a * x помещаются в uint64 без переполнения
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingles(text, size=5):
+    """Множество хэшей словесных k-грамм нормализованного текста."""
+    words = _WORD_RE.findall(text.lower().replace("ё", "е"))
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i : i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash-сигнатуры: доля совпадающих позиций двух сигнатур оценивает коэффициент Жаккара их шинглов."""
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64) % _PRIME
+        if not len(hashes):
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        # Блоками, чтобы матрица num_perm x шинглов не росла с размером документа
+        for start in range(0, len(hashes), 4096):
+            block = (self.a * hashes[None, start : start + 4096] + self.b) % _PRIME
+            np.minimum(signature, block.min(axis=1), out=signature)
+        return signature
+
+
+def _choose_bands(num_perm, threshold):
+    # Порог срабатывания LSH примерно (1/b)^(1/r); берём разбиение, где он ближе всего к нужному
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    Banded LSH поверх MinHash для поиска почти-дубликатов.
+
+    Сигнатура делится на bands полос по rows значений; тексты, совпавшие хотя бы в одной
+    полосе, становятся кандидатами и проверяются по оценке Жаккара. Вставка и поиск
+    не зависят от размера индекса, поэтому весь корпус обрабатывается за один проход.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, shingle_size=5, seed=1):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size, seed=seed)
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature):
+        """Ключ самого похожего уже добавленного текста с оценкой Жаккара >= threshold или None."""
+        candidates = set()
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature), strict=True):
+            candidates.update(bucket.get(band_key, ()))
+
+        best_key, best_similarity = None, self.threshold
+        for key in candidates:
+            similarity = float(np.mean(self.signatures[key] == signature))
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature), strict=True):
+            bucket.setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature), strict=True):
+            keys = bucket[band_key]
+            keys.remove(key)
+            if not keys:
+                del bucket[band_key]
+
+    def add_if_new(self, key, text):
+        """Добавляет текст, если он не почти-дубликат; иначе возвращает ключ оригинала."""
+        signature = self.hasher.signature(text)
+        original = self.find(signature)
+        if original is None:
+            self.add(key, signature)
+        return original
+
+
+def _is_newer(version, current):
+    return version is not None and (current is None or version > current)
+
+
+class CorpusDeduplicator:
+    """
+    Дедупликация документов и чанков перед эмбеддингом.
+
+    Из почти совпадающих документов (зеркала на fs/docs/download.guap.ru, копии положения
+    за разные годы) остаётся самая новая копия по version (дата или mtime файла), id остальных
+    записываются в mirrors оставленной. Более старая копия не чанкуется; если она пришла раньше
+    новой, её id попадает в superseded, и её уже выданные чанки вызывающий код отбрасывает
+    (without_superseded). Чанк, почти совпадающий с уже оставленным чанком другого документа
+    (шапки, типовые пункты), отбрасывается, chunk_id оставшихся чанков документа идут подряд,
+    а duplicate_of хранит chunk_uid оригинала отброшенного чанка.
+    """
+
+    def __init__(self, document_threshold=0.85, chunk_threshold=0.9, num_perm=128):
+        self.documents = NearDuplicateIndex(threshold=document_threshold, num_perm=num_perm)
+        self.chunks = NearDuplicateIndex(threshold=chunk_threshold, num_perm=num_perm)
+        self.versions = {}
+        self.chunk_documents = {}
+        self.document_chunks = {}
+        self.mirrors = {}
+        self.superseded = set()
+        self.duplicate_of = {}
+        self.dropped_documents = 0
+        self.dropped_chunks = 0
+
+    def is_duplicate_document(self, doc_id, text, version=None):
+        signature = self.documents.hasher.signature(text)
+        original = self.documents.find(signature)
+        if original is not None and not _is_newer(version, self.versions[original]):
+            self.mirrors.setdefault(original, []).append(doc_id)
+            self.dropped_documents += 1
+            return True
+        if original is not None:
+            self._supersede(original, doc_id)
+        self.documents.add(doc_id, signature)
+        self.versions[doc_id] = version
+        return False
+
+    def _supersede(self, original, doc_id):
+        # Чанки старой копии больше не оригиналы: такие же чанки новой копии должны остаться
+        self.documents.remove(original)
+        for chunk_uid in self.document_chunks.pop(original, []):
+            self.chunks.remove(chunk_uid)
+            del self.chunk_documents[chunk_uid]
+        self.mirrors[doc_id] = [original, *self.mirrors.pop(original, [])]
+        self.superseded.add(original)
+        self.dropped_documents += 1
+
+    def filter_chunks(self, chunks):
+        """Чанки без почти-дубликатов в других документах; повторы внутри документа остаются."""
+        kept = []
+        for chunk in chunks:
+            signature = self.chunks.hasher.signature(chunk["text"])
+            original = self.chunks.find(signature)
+            if original is not None and self.chunk_documents[original] != chunk["document_id"]:
+                self.duplicate_of[chunk["chunk_uid"]] = original
+                self.dropped_chunks += 1
+                continue
+            if original is None:
+                self.chunks.add(chunk["chunk_uid"], signature)
+                self.chunk_documents[chunk["chunk_uid"]] = chunk["document_id"]
+                self.document_chunks.setdefault(chunk["document_id"], []).append(chunk["chunk_uid"])
+            # Без пропусков в нумерации соседние чанки документа находятся по chunk_id +- 1
+            chunk["chunk_id"] = len(kept)
+            kept.append(chunk)
+        return kept
+
+    def without_superseded(self, chunks):
+        """Чанки без документов, вытесненных более новыми копиями."""
+        return [chunk for chunk in chunks if chunk["document_id"] not in self.superseded]
+
+    def attach_mirrors(self, chunks):
+        """Проставляет чанкам оставленных документов список их зеркал."""
+        for chunk in chunks:
+            mirrors = self.mirrors.get(chunk["document_id"])
+            if mirrors:
+                chunk["mirrors"] = mirrors
+        return chunks
+
+    def summary(self):
+        return f"отброшено документов-дубликатов: {self.dropped_documents}, чанков-дубликатов: {self.dropped_chunks}"
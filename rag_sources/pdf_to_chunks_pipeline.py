@@ -1,113 +1,142 @@
+import argparse
 import os
-import json
-import re
+import sys
+from collections import deque
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LTTextContainer, LTFigure
-from pdf2image import convert_from_path
-from PIL import Image
-import pytesseract
-import tiktoken
 import hashlib
 import multiprocessing
 
-# Настройки
-PDF_DIR = Path(r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\rag_sources\saved_pdf\pdf")
-OUTPUT_JSON = Path(r"C:\Users\gideo\project\SUAI_RAG_BOT_SERVER\rag_sources\chunks_all_pdfs.json")
-CHUNK_SIZE = 512
-CHUNK_OVERLAP = 50
-
-
-# Функции
-def normalize_text(text):
-    return re.sub(r'\s+', ' ', text).strip()
-
-
-def chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-    enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    tokens = enc.encode(text)
-    chunks, start_idx, chunk_id = [], 0, 0
-    while start_idx < len(tokens):
-        end_idx = min(start_idx + chunk_size, len(tokens))
-        chunk_text = enc.decode(tokens[start_idx:end_idx])
-        last_space = chunk_text.rfind(" ")
-        if last_space != -1 and end_idx != len(tokens):
-            chunk_text = chunk_text[:last_space]
-            end_idx = start_idx + len(enc.encode(chunk_text))
-        start_offset = text.find(chunk_text)
-        end_offset = start_offset + len(chunk_text)
-        chunks.append({
-            "chunk_uid": f"chunk_{chunk_id}",
-            "chunk_id": chunk_id,
-            "text": chunk_text.strip(),
-            "token_count": len(enc.encode(chunk_text)),
-            "start_offset": start_offset,
-            "end_offset": end_offset
-        })
-        start_idx = max(end_idx - overlap, end_idx)
-        chunk_id += 1
-    return chunks
-
-
-def extract_text_from_pdf(pdf_path):
+from rag_sources.chunk_ids import assign_stable_ids
+from rag_sources.chunking import chunk_by_gpt_tokens
+from rag_sources.download_cache import DownloadCache, url_filename
+from rag_sources.extractors import extract_pdf_page, file_sha1, join_pdf_pages, pdf_page_count, pdf_page_errors
+from rag_sources.near_dedup import CorpusDeduplicator
+
+# Настройки (пути относительно корня репозитория)
+ROOT = Path(__file__).resolve().parent.parent
+PDF_DIR = ROOT / "rag_sources" / "saved_pdf" / "pdf"
+OUTPUT_JSON = ROOT / "rag_sources" / "chunks_all_pdfs.json"
+DOWNLOAD_INDEX = ROOT / "rag_sources" / "saved_pdf" / "downloads.sqlite3"
+PAGE_CACHE_DIR = ROOT / "cache" / "pdf_pages"
+
+# Формат хранилища чанков общий с сервером (src/services/chunk_store.py)
+sys.path.append(str(ROOT / "src"))
+from services.chunk_store import save_chunks  # noqa: E402
+
+
+def inspect_pdf(pdf_path):
+    """Хэш файла (ключ кэша страниц) и число страниц; у битого файла страниц 0."""
     try:
-        text_parts = []
-
-        def recursive_elements(elements):
-            for el in elements:
-                if isinstance(el, LTTextContainer):
-                    yield el
-                elif isinstance(el, LTFigure):
-                    yield from recursive_elements(el._objs)
-
-        for page_layout in extract_pages(pdf_path):
-            page_text = []
-            for element in recursive_elements(page_layout):
-                if isinstance(element, LTTextContainer):
-                    page_text.append(element.get_text().strip())
-            if page_text:
-                text_parts.append("\n".join(page_text))
-
-        if text_parts:
-            return normalize_text("\n\n".join(text_parts))
-
-        # fallback OCR
-        ocr_texts = []
-        images = convert_from_path(pdf_path)
-        for img in images:
-            ocr_texts.append(pytesseract.image_to_string(img, config="--psm 6").strip())
-        return normalize_text("\n\n".join(ocr_texts))
-    except:
+        return file_sha1(pdf_path), pdf_page_count(pdf_path)
+    except Exception:
+        return None, 0
+
+
+def pdf_sources(pdf_files, pdf_dir, index_path):
+    """
+    Документы каждого файла: [(doc_id, url, имя файла), ...]. download_pdf.py называет файлы по sha1
+    содержимого, поэтому id документа - канонический URL из индекса загрузок, а имя - из пути URL:
+    оба не меняются, когда документ обновляется на сайте. Один файл может прийти по нескольким
+    ссылкам - это копии одного документа. Файлы не из индекса определяются по имени, как раньше.
+    """
+    cache = DownloadCache(pdf_dir, index_path) if Path(index_path).exists() else None
+    sources = {}
+    try:
+        for pdf_file in pdf_files:
+            urls = cache.urls(pdf_file.stem) if cache else []
+            # id документа по имени файла, а не по абсолютному пути - не меняется при переносе папки
+            fallback = (hashlib.sha1(pdf_file.name.encode()).hexdigest()[:10], None, pdf_file.name)
+            sources[pdf_file] = [(url, url, url_filename(url)) for url in urls] or [fallback]
+    finally:
+        if cache:
+            cache.close()
+    return sources
+
+
+def safe_extract_page(pdf_path, page_number, file_hash, cache_dir):
+    try:
+        return extract_pdf_page(pdf_path, page_number, file_hash, cache_dir)
+    except pdf_page_errors() as e:
+        # Битая страница или сбой OCR не роняет весь файл; прочие исключения - ошибки кода
+        print(f"Ошибка при обработке страницы {page_number + 1} файла {Path(pdf_path).name}: {e}")
         return ""
 
 
+def iter_pdf_texts(executor, pdf_files, infos, cache_dir, max_pending):
+    """
+    (файл, текст) в порядке файлов. Страницы всех файлов идут в пул одним потоком, но отправленных
+    и ещё не разобранных страниц не больше max_pending: большой скан по-прежнему делят все процессы,
+    а готовые страницы не копятся в памяти быстрее, чем разбираются.
+    """
+    window = deque()
+    texts = []
+
+    def take():
+        pdf_file, page, pages, future = window.popleft()
+        texts.append(future.result())
+        if page < pages - 1:
+            return None
+        text = join_pdf_pages(texts)
+        texts.clear()
+        return pdf_file, text
+
+    for pdf_file, (file_hash, pages) in zip(pdf_files, infos, strict=True):
+        for page in range(pages):
+            if len(window) >= max_pending:
+                done = take()
+                if done:
+                    yield done
+            window.append((pdf_file, page, pages, executor.submit(safe_extract_page, pdf_file, page, file_hash, cache_dir)))
+    while window:
+        done = take()
+        if done:
+            yield done
+
+
 if __name__ == "__main__":
-    multiprocessing.freeze_support()  # важно для Windows
-    all_pdfs = list(PDF_DIR.glob("*.pdf"))
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Текст и чанки из скачанных PDF")
+    parser.add_argument("--pdf-dir", type=Path, default=PDF_DIR)
+    parser.add_argument("--download-index", type=Path, default=DOWNLOAD_INDEX, help="Индекс загрузок download_pdf.py (URL файлов)")
+    parser.add_argument("--output", type=Path, default=OUTPUT_JSON, help="chunks_*.json или каталог хранилища чанков")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-pending", type=int, default=0, help="Страниц в пуле одновременно, по умолчанию 4 на процесс")
+    parser.add_argument("--page-cache", type=Path, default=PAGE_CACHE_DIR, help="Кэш текста страниц по (sha1 файла, страница)")
+    parser.add_argument("--no-page-cache", action="store_true")
+    args = parser.parse_args()
+
+    all_pdfs = sorted(args.pdf_dir.glob("*.pdf"))
     all_chunks = []
-    global_chunk_id = 0  # глобальный счетчик для уникальных chunk_id по всем документам
-
-    with ProcessPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(extract_text_from_pdf, pdf): pdf for pdf in all_pdfs}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Извлечение текста и чанкинг"):
-            pdf_file = futures[future]
-            text = future.result()
-            if not text:
-                continue
-            chunks = chunk_by_gpt_tokens(text)
-            doc_id = hashlib.sha1(str(pdf_file).encode()).hexdigest()[:10]
-
-            for chunk in chunks:
-                chunk["document_id"] = doc_id
-                chunk["filename"] = pdf_file.name
-                chunk["chunk_id"] = global_chunk_id
-                chunk["chunk_uid"] = f"chunk_{global_chunk_id}"
-                global_chunk_id += 1
-                all_chunks.append(chunk)
-
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump({"chunks": all_chunks}, f, ensure_ascii=False, indent=2)
+    # Зеркала и копии документов отбрасываются до чанкинга, чтобы не платить за их эмбеддинги
+    dedup = CorpusDeduplicator(document_threshold=0.85, chunk_threshold=0.9)
+
+    cache_dir = None if args.no_page_cache else args.page_cache
+    sources = pdf_sources(all_pdfs, args.pdf_dir, args.download_index)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Единица работы - страница, а не файл: большой скан делят между собой все процессы,
+        # OCR запускается только для страниц без текстового слоя
+        infos = list(executor.map(inspect_pdf, all_pdfs))
+        max_pending = args.max_pending or 4 * args.workers
+        # Результаты разбираем в порядке файлов: из группы дубликатов всегда остаётся один и тот же документ
+        texts = iter_pdf_texts(executor, all_pdfs, infos, cache_dir, max_pending)
+        for pdf_file, text in tqdm(texts, total=sum(1 for _, pages in infos if pages), desc="Извлечение текста и чанкинг"):
+            # Из копий документа остаётся самая новая по времени изменения файла
+            for doc_id, url, filename in sources[pdf_file]:
+                if not text or dedup.is_duplicate_document(doc_id, text, version=pdf_file.stat().st_mtime):
+                    continue
+                for chunk in dedup.filter_chunks(assign_stable_ids(chunk_by_gpt_tokens(text), doc_id)):
+                    chunk["filename"] = filename
+                    if url:
+                        chunk["url"] = url
+                    all_chunks.append(chunk)
+
+    all_chunks = dedup.attach_mirrors(dedup.without_superseded(all_chunks))
+    print(dedup.summary())
+
+    # .json - прежний формат, иначе каталог хранилища чанков
+    save_chunks(all_chunks, args.output)
 
     print(f"Готово! Всего чанков: {len(all_chunks)}")
@@ -0,0 +1,103 @@
+"""
+Скорость и точность смещений rag_sources.chunking.chunk_by_gpt_tokens относительно прежнего алгоритма.
+
+Прежний чанкер (legacy_chunk_by_gpt_tokens ниже) декодирует и дважды перекодирует каждый чанк и ищет
+его позицию через text.find с начала документа: поиск квадратичен по длине документа, а у повторяющихся
+фрагментов смещения указывают на первое вхождение. Бенчмарк прогоняет оба варианта
+по документам, удлинённым в scale раз следующими документами корпуса, и показывает время, токены в секунду
+и долю чанков, для которых text[start_offset:end_offset] совпадает с текстом чанка.
+
+    PYTHONPATH=src uv run python -m benchmarks.chunking
+    PYTHONPATH=src uv run python -m benchmarks.chunking --scales 1 4 16 64
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from rag_sources.chunking import CHUNK_OVERLAP, CHUNK_SIZE, chunk_by_gpt_tokens, get_encoding, normalize_text
+
+DEFAULT_DOCUMENTS = Path(__file__).resolve().parents[2] / "parser" / "out_spider" / "spiders" / "parsed_docx.json"
+
+
+def legacy_chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    enc = get_encoding()
+    tokens = enc.encode(text)
+    chunks, start_idx, chunk_id = [], 0, 0
+    while start_idx < len(tokens):
+        end_idx = min(start_idx + chunk_size, len(tokens))
+        chunk_text = enc.decode(tokens[start_idx:end_idx])
+        last_space = chunk_text.rfind(" ")
+        if last_space != -1 and end_idx != len(tokens):
+            chunk_text = chunk_text[:last_space]
+            end_idx = start_idx + len(enc.encode(chunk_text))
+        start_offset = text.find(chunk_text)
+        end_offset = start_offset + len(chunk_text)
+        chunks.append({
+            "chunk_uid": f"chunk_{chunk_id}",
+            "chunk_id": chunk_id,
+            "text": chunk_text.strip(),
+            "token_count": len(enc.encode(chunk_text)),
+            "start_offset": start_offset,
+            "end_offset": end_offset
+        })
+        start_idx = max(end_idx - overlap, end_idx)
+        chunk_id += 1
+    return chunks
+
+
+CHUNKERS: Dict[str, Callable] = {
+    "legacy": legacy_chunk_by_gpt_tokens,
+    "linear": chunk_by_gpt_tokens,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Время и точность смещений чанкера по токенам")
+    parser.add_argument("--documents", default=str(DEFAULT_DOCUMENTS), help="JSON {url: текст}, как parsed_docx.json")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8], help="Сколько документов корпуса склеивать в один")
+    parser.add_argument("--chunkers", nargs="+", choices=list(CHUNKERS), default=list(CHUNKERS))
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    return parser.parse_args()
+
+
+def load_documents(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        documents = json.load(f)
+    return [text for text in (normalize_text(text) for text in documents.values()) if text]
+
+
+def exact_offsets(text: str, chunks: List[dict]) -> int:
+    return sum(text[chunk["start_offset"] : chunk["end_offset"]] == chunk["text"] for chunk in chunks)
+
+
+def main():
+    args = parse_args()
+    documents = load_documents(args.documents)
+    enc = get_encoding()
+    print(f"{len(documents)} документов, chunk_size={args.chunk_size}, overlap={args.overlap}")
+    print(f"{'scale':>5} {'чанкер':>7} {'токенов':>9} {'чанков':>7} {'время, с':>9} {'ток/с':>10} {'точные смещения':>16}")
+
+    for scale in args.scales:
+        # Документ удлиняется следующими документами корпуса, а не повтором себя: иначе text.find
+        # в прежнем чанкере находил бы совпадение в первой копии и не показывал рост времени
+        texts = [" ".join(documents[(i + j) % len(documents)] for j in range(scale)) for i in range(len(documents))]
+        total_tokens = sum(len(enc.encode_ordinary(text)) for text in texts)
+        for name in args.chunkers:
+            chunker = CHUNKERS[name]
+            started = time.perf_counter()
+            results = [chunker(text, args.chunk_size, args.overlap) for text in texts]
+            elapsed = time.perf_counter() - started
+            chunks = sum(len(result) for result in results)
+            exact = sum(exact_offsets(text, result) for text, result in zip(texts, results, strict=True))
+            print(
+                f"{scale:>5} {name:>7} {total_tokens:>9} {chunks:>7} {elapsed:>9.3f} "
+                f"{total_tokens / elapsed if elapsed else 0:>10.0f} {exact / chunks if chunks else 1:>16.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
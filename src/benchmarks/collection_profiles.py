@@ -0,0 +1,114 @@
+"""
+Сравнение профилей коллекции (services/collection_profiles.py) с базовым float32.
+
+Для каждого профиля загружает чанки в отдельную коллекцию <prefix>_<profile>, дожидается
+построения HNSW и квантования, затем для каждого сочетания hnsw_ef/oversampling меряет
+recall@k относительно точного поиска по профилю full и латентность плотного поиска.
+
+    PYTHONPATH=src uv run python -m benchmarks.collection_profiles rag_sources/chunks_all_docx.json
+
+Нужен сервер Qdrant: встроенный индекс и локальный режим клиента квантование не поддерживают.
+"""
+
+import argparse
+import asyncio
+import time
+
+from qdrant_client.models import CollectionStatus, OptimizersConfigDiff
+
+from benchmarks.metrics import latency_percentiles, recall_at_k
+from benchmarks.queries import load_queries, sample_queries
+from services.chunk_files import iter_chunk_files
+from services.collection_profiles import COLLECTION_PROFILES, get_collection_profile, search_params
+from services.ingestion_service import ingestion_service
+from services.qdrant_service import qdrant_service
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("CollectionProfilesBenchmark")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall@k и латентность профилей коллекции Qdrant")
+    parser.add_argument("files", nargs="+", help="chunks_*.json или *.jsonl")
+    parser.add_argument("--profiles", nargs="+", choices=list(COLLECTION_PROFILES), default=list(COLLECTION_PROFILES))
+    parser.add_argument("--prefix", default=f"{CONFIG.qdrant.collection}_bench")
+    parser.add_argument("--queries", help="Файл с вопросами, по одному на строку; по умолчанию - начала случайных чанков")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[0, 64, 128])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--reindex", action="store_true", help="Пересоздать коллекции, даже если они уже есть")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def wait_until_indexed(collection_name: str, timeout: float = 600):
+    # Маленькие коллекции Qdrant ищет полным перебором; порог 1 КБ заставляет строить HNSW и квантование
+    await qdrant_service.client.update_collection(collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=1))
+    deadline = time.monotonic() + timeout
+    green_polls = 0
+    while True:
+        info = await qdrant_service.client.get_collection(collection_name)
+        green_polls = green_polls + 1 if info.status == CollectionStatus.GREEN else 0
+        if green_polls and (info.indexed_vectors_count or 0) >= (info.points_count or 0):
+            return info
+        if green_polls >= 5:
+            logger.warning(f"{collection_name}: оптимизатор простаивает, проиндексировано {info.indexed_vectors_count} из {info.points_count}")
+            return info
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Коллекция {collection_name} не проиндексирована за {timeout} с")
+        await asyncio.sleep(1)
+
+
+async def run(args: argparse.Namespace):
+    if CONFIG.qdrant.backend != "remote":
+        raise SystemExit("Бенчмарк профилей требует qdrant.backend: remote")
+
+    chunks = list(iter_chunk_files(args.files))
+    queries = load_queries(args.queries) if args.queries else sample_queries(chunks, args.num_queries, args.seed)
+    vectors = await qdrant_service.get_embeddings(queries)
+    dim = len(vectors[0])
+
+    profiles = ["full", *(name for name in args.profiles if name != "full")]
+    for name in profiles:
+        collection_name = f"{args.prefix}_{name}"
+        if args.reindex or not await qdrant_service.client.collection_exists(collection_name):
+            await ingestion_service.ingest_chunks(chunks, collection_name=collection_name, recreate=True, profile=name)
+        await wait_until_indexed(collection_name)
+
+    backend = qdrant_service.backend
+    exact = search_params(exact=True)
+    truth = [
+        [point.id for point in await backend.dense_search(f"{args.prefix}_full", vector, args.k, params=exact)] for vector in vectors
+    ]
+
+    print(f"{len(chunks)} чанков, размерность {dim}, {len(queries)} запросов, k={args.k}")
+    print(f"{'профиль':<8} {'hnsw_ef':>7} {'oversmp':>7} {f'recall@{args.k}':>9} {'p50, мс':>8} {'p95, мс':>8} {'RAM векторов, МБ':>17}")
+    for name in profiles:
+        profile = get_collection_profile(name)
+        collection_name = f"{args.prefix}_{name}"
+        ram_mb = profile.vector_ram_bytes(len(chunks), dim) / 2**20
+        for hnsw_ef in args.hnsw_ef:
+            for oversampling in args.oversampling if profile.quantization else [0.0]:
+                params = search_params(hnsw_ef=hnsw_ef, oversampling=oversampling)
+                # Прогрев: первый проход подтягивает страницы on_disk-векторов в page cache
+                for vector in vectors[:10]:
+                    await backend.dense_search(collection_name, vector, args.k, params=params)
+
+                latencies, recalls = [], []
+                for vector, relevant in zip(vectors, truth, strict=True):
+                    started = time.perf_counter()
+                    points = await backend.dense_search(collection_name, vector, args.k, params=params)
+                    latencies.append(time.perf_counter() - started)
+                    recalls.append(recall_at_k([point.id for point in points], relevant, args.k))
+
+                latency = latency_percentiles(latencies)
+                print(
+                    f"{name:<8} {hnsw_ef or '-':>7} {oversampling or '-':>7} {sum(recalls) / len(recalls):>9.3f} "
+                    f"{latency['p50_ms']:>8.2f} {latency['p95_ms']:>8.2f} {ram_mb:>17.1f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
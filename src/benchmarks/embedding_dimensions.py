@@ -0,0 +1,92 @@
+"""
+Recall@k эмбеддингов уменьшенной размерности относительно полной.
+
+Полные векторы чанков и запросов берутся через кэш эмбеддингов, уменьшенные получаются
+усечением с перенормировкой (как embeddings.truncate_locally), так что прогон по нескольким
+размерностям стоит одного эмбеддинга корпуса. Поиск - точный перебор на NumPy, поэтому
+латентность показывает относительный выигрыш от размерности, а не латентность Qdrant.
+
+    PYTHONPATH=src uv run python -m benchmarks.embedding_dimensions rag_sources/chunks_all_docx.json
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.metrics import latency_percentiles, recall_at_k
+from benchmarks.queries import load_queries, sample_queries
+from services.chunk_files import batched, iter_chunk_files
+from services.qdrant_service import qdrant_service
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("EmbeddingDimensionsBenchmark")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall@k и скорость поиска для уменьшенной размерности эмбеддингов")
+    parser.add_argument("files", nargs="+", help="chunks_*.json или *.jsonl")
+    parser.add_argument("--dims", type=int, nargs="+", default=[1024, 768, 512, 256])
+    parser.add_argument("--queries", help="Файл с вопросами, по одному на строку; по умолчанию - начала случайных чанков")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+async def embed_all(texts: List[str], batch_size: int = 1024) -> np.ndarray:
+    vectors = []
+    for batch in batched(texts, batch_size):
+        vectors.extend(await qdrant_service.get_embeddings(batch, truncate=False))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def truncate(matrix: np.ndarray, dim: int) -> np.ndarray:
+    # То же, что truncate_embeddings в QdrantService, но без перевода в списки
+    reduced = matrix[:, :dim]
+    return reduced / np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = matrix @ query
+    top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+    return top[np.argsort(-scores[top])]
+
+
+async def run(args: argparse.Namespace):
+    if CONFIG.embeddings.dimensions and not CONFIG.embeddings.truncate_locally:
+        logger.warning(f"API уже возвращает {CONFIG.embeddings.dimensions} измерений - базой сравнения будет эта размерность")
+
+    chunks = list(iter_chunk_files(args.files))
+    queries = load_queries(args.queries) if args.queries else sample_queries(chunks, args.num_queries, args.seed)
+    documents = await embed_all([chunk["text"] for chunk in chunks])
+    questions = await embed_all(queries)
+    full_dim = documents.shape[1]
+
+    full_documents, full_questions = truncate(documents, full_dim), truncate(questions, full_dim)
+    truth = [top_k(full_documents, query, args.k).tolist() for query in full_questions]
+
+    print(f"{len(chunks)} чанков, {len(queries)} запросов, k={args.k}, полная размерность {full_dim}")
+    print(f"{'размерность':>11} {f'recall@{args.k}':>9} {'p50, мс':>8} {'p95, мс':>8} {'векторы, МБ':>12}")
+    for dim in [full_dim, *(d for d in args.dims if d < full_dim)]:
+        matrix, reduced_questions = truncate(documents, dim), truncate(questions, dim)
+
+        latencies, recalls = [], []
+        for query, relevant in zip(reduced_questions, truth, strict=True):
+            started = time.perf_counter()
+            found = top_k(matrix, query, args.k)
+            latencies.append(time.perf_counter() - started)
+            recalls.append(recall_at_k(found.tolist(), relevant, args.k))
+
+        latency = latency_percentiles(latencies)
+        print(
+            f"{dim:>11} {sum(recalls) / len(recalls):>9.3f} {latency['p50_ms']:>8.2f} {latency['p95_ms']:>8.2f} "
+            f"{matrix.nbytes / 2**20:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
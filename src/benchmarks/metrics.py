@@ -0,0 +1,28 @@
+from typing import Hashable, Iterable, Sequence
+
+import numpy as np
+
+
+def recall_at_k(found: Sequence[Hashable], relevant: Iterable[Hashable], k: int) -> float:
+    """Доля релевантных документов, попавших в первые k найденных."""
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(found[:k])) / min(len(relevant), k)
+
+
+def latency_percentiles(latencies: Sequence[float]) -> dict[str, float]:
+    """p50/p95 в миллисекундах по списку замеров в секундах."""
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0}
+    values = np.asarray(latencies) * 1000
+    return {"p50_ms": float(np.percentile(values, 50)), "p95_ms": float(np.percentile(values, 95))}
+
+
+def reciprocal_rank(found: Sequence[Hashable], relevant: Iterable[Hashable]) -> float:
+    """1/позиция первого релевантного документа, 0 - если он не найден."""
+    relevant = set(relevant)
+    for rank, item in enumerate(found, start=1):
+        if item in relevant:
+            return 1.0 / rank
+    return 0.0
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+from utils.logger import get_logger
+
+logger = get_logger("BenchmarkQueries")
+
+DATASETS_PATH = Path(__file__).parent / "datasets"
+
+
+@dataclass(frozen=True)
+class LabelledQuery:
+    question: str
+    relevant: tuple[str, ...]  # chunk_uid релевантных чанков
+
+
+@dataclass(frozen=True)
+class LabelledDataset:
+    version: int
+    corpus: str
+    corpus_sha1: str
+    queries: List[LabelledQuery]
+
+
+def load_queries(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def sample_queries(chunks: List[Dict[str, Any]], count: int, seed: int, words: int = 12) -> List[str]:
+    """Псевдо-вопросы из начал случайных чанков - когда размеченного набора нет."""
+    rng = random.Random(seed)
+    sample = rng.sample(chunks, min(count, len(chunks)))
+    return [" ".join(chunk["text"].split()[:words]) for chunk in sample]
+
+
+def file_sha1(path: str | Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_labelled_dataset(path: str | Path) -> LabelledDataset:
+    """
+    Размеченный набор вопрос -> чанки в JSONL: первая строка - заголовок
+    {"version", "corpus", "corpus_sha1"}, далее {"question", "relevant": [chunk_uid, ...]}.
+
+    Разметка привязана к chunk_uid конкретного файла чанков; если файл изменился
+    (другой sha1), разметку нужно проверить и выпустить новую версию набора.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    header, items = lines[0], lines[1:]
+    dataset = LabelledDataset(
+        version=header["version"],
+        corpus=header["corpus"],
+        corpus_sha1=header["corpus_sha1"],
+        queries=[LabelledQuery(item["question"], tuple(item["relevant"])) for item in items],
+    )
+    if Path(dataset.corpus).exists() and file_sha1(dataset.corpus) != dataset.corpus_sha1:
+        logger.warning(f"{dataset.corpus} изменился после разметки набора {path} (v{dataset.version}) - метрики могут быть занижены")
+    return dataset
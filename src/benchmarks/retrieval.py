@@ -0,0 +1,110 @@
+"""
+Качество и скорость поиска QdrantService.search на размеченном наборе вопросов.
+
+Для каждой стратегии из STRATEGIES считает recall@k, MRR и p50/p95 латентности поиска
+по вопросам набора benchmarks/datasets/retrieval_v<N>.jsonl. Эмбеддинги вопросов
+получаются заранее, поэтому латентность - это поиск без обращения к API эмбеддингов.
+
+    PYTHONPATH=src uv run python -m benchmarks.retrieval
+    PYTHONPATH=src uv run python -m benchmarks.retrieval --offline
+
+С --offline используются хэширующие эмбеддинги (embeddings.provider: hashing) и встроенный
+индекс, собранный из файла чанков набора во временном каталоге: ни сервер Qdrant, ни API
+не нужны, результат детерминирован и подходит для CI. Абсолютные значения метрик в этом
+режиме ниже, чем с настоящей моделью; сравнивать имеет смысл стратегии и прогоны между собой.
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.metrics import latency_percentiles, recall_at_k, reciprocal_rank
+from benchmarks.queries import DATASETS_PATH, LabelledDataset, load_labelled_dataset
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("RetrievalBenchmark")
+
+# Аргументы QdrantService.search; расширение соседями выключено - оно меняет текст, а не порядок попаданий
+STRATEGIES: Dict[str, Dict[str, Any]] = {
+    "dense": {"hybrid": False, "diversify": False},
+    "hybrid": {"hybrid": True, "diversify": False},
+    "dense_mmr": {"hybrid": False, "diversify": True},
+    "hybrid_mmr": {"hybrid": True, "diversify": True},
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall@k, MRR и латентность стратегий поиска на размеченном наборе")
+    parser.add_argument("--dataset", default=str(DATASETS_PATH / "retrieval_v2.jsonl"))
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--collection", default=CONFIG.qdrant.collection)
+    parser.add_argument("--offline", action="store_true", help="Хэширующие эмбеддинги и встроенный индекс вместо API и сервера Qdrant")
+    parser.add_argument("--output", help="Куда записать результаты в JSON")
+    return parser.parse_args()
+
+
+def configure_offline(dataset: LabelledDataset, index_path: str):
+    # QdrantService создаётся при импорте, поэтому конфиг меняется до первого импорта services.qdrant_service
+    CONFIG.embeddings.provider = "hashing"
+    CONFIG.embeddings.cache_path = ""
+    CONFIG.qdrant.backend = "local"
+    CONFIG.qdrant.local.path = index_path
+    CONFIG.qdrant.local.sources = [dataset.corpus]
+
+
+async def evaluate(dataset: LabelledDataset, collection: str, strategy: Dict[str, Any], ks: List[int]) -> Dict[str, float]:
+    from services.qdrant_service import qdrant_service
+
+    limit = max(ks)
+    latencies, rankings = [], []
+    for query in dataset.queries:
+        started = time.perf_counter()
+        documents = await qdrant_service.search(collection, query.question, limit=limit, expand=False, **strategy)
+        latencies.append(time.perf_counter() - started)
+        rankings.append([document["metadata"].get("chunk_uid") for document in documents])
+
+    result = {
+        f"recall@{k}": sum(recall_at_k(found, query.relevant, k) for found, query in zip(rankings, dataset.queries, strict=True)) / len(rankings)
+        for k in ks
+    }
+    result["mrr"] = sum(reciprocal_rank(found, query.relevant) for found, query in zip(rankings, dataset.queries, strict=True)) / len(rankings)
+    return {**result, **latency_percentiles(latencies)}
+
+
+async def run(args: argparse.Namespace, dataset: LabelledDataset) -> Dict[str, Dict[str, float]]:
+    from services.qdrant_service import qdrant_service
+
+    # Прогрев: сборка/загрузка индекса и эмбеддинги вопросов в кэше до замеров
+    await qdrant_service.get_embeddings([query.question for query in dataset.queries])
+    await qdrant_service.search(args.collection, dataset.queries[0].question, limit=1, expand=False)
+
+    results = {name: await evaluate(dataset, args.collection, STRATEGIES[name], args.k) for name in args.strategies}
+
+    columns = [*(f"recall@{k}" for k in args.k), "mrr", "p50_ms", "p95_ms"]
+    print(f"Набор v{dataset.version}: {len(dataset.queries)} вопросов, эмбеддинги {qdrant_service.embeddings_model}, backend {CONFIG.qdrant.backend}")
+    print(f"{'стратегия':>12} " + " ".join(f"{column:>9}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:>12} " + " ".join(f"{result[column]:>9.3f}" for column in columns))
+    return results
+
+
+def main():
+    args = parse_args()
+    dataset = load_labelled_dataset(args.dataset)
+    with tempfile.TemporaryDirectory(prefix="retrieval_bench_") as index_path:
+        if args.offline:
+            configure_offline(dataset, index_path)
+        results = asyncio.run(run(args, dataset))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dataset_version": dataset.version, "offline": args.offline, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
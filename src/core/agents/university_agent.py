@@ -4,6 +4,7 @@ from openai import pydantic_function_tool
 from openai.types.chat import ChatCompletionFunctionToolParam
 
 from core.agents.base_agent import BaseAgent
+from core.models import AgentStatesEnum
 from core.tools import (
     BaseTool,
     ClarificationTool,
@@ -14,6 +15,7 @@ from core.tools import (
 from core.tools.general_info_tool import GeneralInfoTool
 from core.tools.map_tool import MapTool
 from core.tools.schedule_tool import ScheduleTool
+from services.answer_cache import answer_cache
 from utils.config import CONFIG
 
 # University-specific tools
@@ -23,6 +25,11 @@ university_tools = [
     GeneralInfoTool,
 ]
 
+# Only knowledge-base answers are cached: schedule and map answers depend on the date, group or building
+cacheable_tools = {
+    GeneralInfoTool,
+}
+
 
 class UniversityAssistantAgent(BaseAgent):
     """University Assistant Agent for handling schedule, navigation, and general information queries.
@@ -57,6 +64,43 @@ class UniversityAssistantAgent(BaseAgent):
         self.toolkit.remove(ReasoningTool)  # LLM will do reasoning internally
 
         self.tool_choice: Literal["required"] = "required"
+        self.used_tools: set[Type[BaseTool]] = set()
+
+    async def execute(self):
+        """Answer from the semantic answer cache when possible, otherwise run the agent and cache its final answer."""
+        if not CONFIG.answer_cache.enabled:
+            return await super().execute()
+
+        try:
+            cached_answer = await answer_cache.lookup(self.task)
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup failed: {e}")
+            cached_answer = None
+
+        if cached_answer is not None:
+            self._context.execution_result = cached_answer
+            self._context.state = AgentStatesEnum.COMPLETED
+            self.streaming_generator.add_chunk_from_str(cached_answer)
+            self.streaming_generator.finish()
+            return
+
+        await super().execute()
+
+        if self._is_cacheable():
+            try:
+                await answer_cache.store(self.task, self._context.execution_result)
+            except Exception as e:
+                self.logger.warning(f"Failed to store answer in cache: {e}")
+
+    def _is_cacheable(self) -> bool:
+        """Whether the completed run answers the question on its own, regardless of date and dialog."""
+        if self._context.state != AgentStatesEnum.COMPLETED or not self._context.execution_result:
+            return False
+        # Answers that depended on clarifications are specific to this dialog
+        if self._context.clarifications_used:
+            return False
+        data_tools = self.used_tools - set(system_agent_tools)
+        return bool(data_tools) and data_tools <= cacheable_tools
 
     async def _prepare_tools(self) -> list[ChatCompletionFunctionToolParam]:
         """Prepare tool classes with current context limits."""
@@ -121,6 +165,7 @@ class UniversityAssistantAgent(BaseAgent):
     async def _action_phase(self, tool: BaseTool) -> str:
         """Execute the selected tool and update conversation context."""
         result = await tool(self._context)
+        self.used_tools.add(type(tool))
         self.conversation.append({"role": "tool", "content": result, "tool_call_id": f"{self._context.iteration}-action"})
         self.streaming_generator.add_chunk_from_str(f"{result}\n")
         self._log_tool_execution(tool, result)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import json
 from typing import TYPE_CHECKING
 
 from pydantic import Field
 
 from core.base_tool import BaseTool
+from services.chunk_metadata import CATEGORIES, SearchFilters
+from services.qdrant_service import qdrant_service
+from utils.config import CONFIG
 
 if TYPE_CHECKING:
     from core.models import ResearchContext
@@ -22,19 +26,30 @@ class GeneralInfoTool(BaseTool):
     context_needed: bool = Field(default=True, description="Whether to include contextual information from knowledge base")
 
     async def __call__(self, context: "ResearchContext") -> str:
-        # TODO: Implement actual RAG/knowledge base retrieval
-        # This should integrate with vector store, knowledge base, or RAG system
-        # This is a stub implementation
+        queries = [self.query, *(self.keywords or [])]
+        filters = None
+        if self.category in CATEGORIES and self.category != "general":
+            filters = SearchFilters(category=self.category)
+
+        documents = await qdrant_service.search_many_fused(
+            CONFIG.qdrant.collection, queries, limit=CONFIG.search.max_results, filters=filters
+        )
+        if not documents and filters is not None:
+            # Categories are assigned heuristically at ingestion, so fall back to the whole collection
+            documents = await qdrant_service.search_many_fused(CONFIG.qdrant.collection, queries, limit=CONFIG.search.max_results)
+
         result = {
             "query": self.query,
             "category": self.category or "general",
             "keywords": self.keywords or [],
-            "retrieved_info": {
-                "source": "Knowledge Base",
-                "relevance_score": 0.95,
-                "content": "This is a stub answer. Real information will be retrieved from RAG system or knowledge base.",
-                "sources": ["Document 1", "Document 2"],
-            },
-            "note": "This is a stub implementation. Real data will be retrieved from RAG/vector store.",
+            "documents": [
+                {
+                    "source": document["metadata"].get("document_id"),
+                    "category": document["metadata"].get("category"),
+                    "score": round(document["score"], 4),
+                    **({"content": document["text"]} if self.context_needed else {}),
+                }
+                for document in documents
+            ],
         }
-        return self.model_dump_json(indent=2) + f"\n\nStub Result: {result}"
+        return json.dumps(result, ensure_ascii=False, indent=2)
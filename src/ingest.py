@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from services.chunk_store import SHARD_SIZE
+from services.collection_profiles import COLLECTION_PROFILES
+from utils.config import CONFIG
+
+# Извлечение текста и чанкинг (пакет rag_sources) лежат в корне репозитория, рядом с src
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+PIPELINE_STAGES = ("download", "extract", "chunk", "embed", "upsert")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Загрузка чанков в Qdrant")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Эмбеддинг и загрузка файлов с чанками в коллекцию")
+    load.add_argument("files", nargs="+", help="chunks_*.json, *.jsonl или каталоги хранилища чанков")
+    load.add_argument("--collection", default=CONFIG.qdrant.collection)
+    load.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+    load.add_argument("--parallel", type=int, default=CONFIG.ingestion.parallel)
+    load.add_argument("--recreate", action="store_true", help="Удалить коллекцию перед загрузкой")
+    load.add_argument("--profile", choices=list(COLLECTION_PROFILES), default=CONFIG.qdrant.profile, help="Профиль хранения векторов новой коллекции")
+
+    sync = commands.add_parser("sync", help="Инкрементальная переиндексация: загрузить новые и изменённые чанки, удалить исчезнувшие")
+    sync.add_argument("files", nargs="+", help="chunks_*.json, *.jsonl или каталоги хранилища чанков")
+    sync.add_argument("--collection", default=CONFIG.qdrant.collection)
+    sync.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+    sync.add_argument("--parallel", type=int, default=CONFIG.ingestion.parallel)
+    sync.add_argument("--profile", choices=list(COLLECTION_PROFILES), default=CONFIG.qdrant.profile, help="Профиль хранения векторов новой коллекции")
+
+    reindex = commands.add_parser("reindex", help="Blue/green переиндексация: загрузка в новую версию коллекции и переключение алиаса")
+    reindex.add_argument("files", nargs="+", help="chunks_*.json, *.jsonl или каталоги хранилища чанков")
+    reindex.add_argument("--collection", default=CONFIG.qdrant.collection, help="Алиас, на который переключается новая версия")
+    reindex.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+    reindex.add_argument("--parallel", type=int, default=CONFIG.ingestion.parallel)
+    reindex.add_argument("--profile", choices=list(COLLECTION_PROFILES), default=CONFIG.qdrant.profile, help="Профиль хранения векторов новой версии")
+
+    gc = commands.add_parser("gc", help="Удалить версии коллекции, выведенные из работы дольше grace-периода")
+    gc.add_argument("--collection", default=CONFIG.qdrant.collection)
+    gc.add_argument("--grace-seconds", type=int, default=CONFIG.ingestion.version_grace_seconds)
+
+    pipeline = commands.add_parser(
+        "pipeline", help="Потоковая загрузка с сайта: ссылки -> скачивание -> извлечение текста -> чанки -> эмбеддинги -> Qdrant"
+    )
+    pipeline.add_argument("links", nargs="+", help="CSV со ссылками (url[,тип]), например parser/out_spider/spiders/links.csv")
+    pipeline.add_argument("--kinds", nargs="+", choices=["pdf", "docx", "html"], default=["pdf", "docx"])
+    pipeline.add_argument("--collection", default=CONFIG.qdrant.collection)
+    pipeline.add_argument("--recreate", action="store_true", help="Удалить коллекцию перед загрузкой")
+    pipeline.add_argument("--profile", choices=list(COLLECTION_PROFILES), default=CONFIG.qdrant.profile, help="Профиль хранения векторов новой коллекции")
+    pipeline.add_argument("--download-dir", default=CONFIG.ingestion.pipeline.download_dir)
+    pipeline.add_argument("--output", help="Дополнительно записать чанки в .jsonl или каталог хранилища чанков (для load/sync/local-build)")
+    pipeline.add_argument("--chunk-set", default="pipeline", help="Значение payload chunk_set загруженных чанков")
+    pipeline.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+    pipeline.add_argument("--queue-size", type=int, default=CONFIG.ingestion.pipeline.queue_size)
+    for stage in PIPELINE_STAGES:
+        pipeline.add_argument(f"--{stage}-workers", type=int, default=getattr(CONFIG.ingestion.pipeline, f"{stage}_workers"))
+
+    local_build = commands.add_parser("local-build", help="Собрать встроенный векторный индекс (qdrant.backend: local) из файлов чанков")
+    local_build.add_argument("files", nargs="*", help="По умолчанию - qdrant.local.sources из конфига")
+    local_build.add_argument("--collection", default=CONFIG.qdrant.collection)
+    local_build.add_argument("--path", default=CONFIG.qdrant.local.path)
+    local_build.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+
+    store = commands.add_parser("store", help="Переложить файлы чанков в хранилище (шарды JSONL, индекс, эмбеддинги в mmap)")
+    store.add_argument("files", nargs="+", help="chunks_*.json, *.jsonl или каталоги хранилища чанков")
+    store.add_argument("--output", required=True, help="Каталог хранилища")
+    store.add_argument("--append", action="store_true", help="Дописать существующее хранилище")
+    store.add_argument("--embed", action="store_true", help="Сохранить рядом эмбеддинги чанков (через кэш эмбеддингов)")
+    store.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    store.add_argument("--batch-size", type=int, default=CONFIG.ingestion.batch_size)
+
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace):
+    from services.chunk_files import batched, iter_chunk_files
+    from services.chunk_store import ChunkStoreWriter
+    from services.ingestion_service import ingestion_service
+    from services.qdrant_service import qdrant_service
+    from services.vector_backends import LocalVectorBackend
+
+    if args.command == "load":
+        for i, path in enumerate(args.files):
+            stats = await ingestion_service.ingest_file(
+                path,
+                collection_name=args.collection,
+                batch_size=args.batch_size,
+                parallel=args.parallel,
+                recreate=args.recreate and i == 0,
+                profile=args.profile,
+            )
+            print(f"{path}: {stats}")
+
+    elif args.command == "sync":
+        for path in args.files:
+            stats = await ingestion_service.sync_file(
+                path,
+                collection_name=args.collection,
+                batch_size=args.batch_size,
+                parallel=args.parallel,
+                profile=args.profile,
+            )
+            print(f"{path}: {stats}")
+
+    elif args.command == "reindex":
+        stats = await ingestion_service.reindex_files(
+            args.files,
+            alias=args.collection,
+            profile=args.profile,
+            batch_size=args.batch_size,
+            parallel=args.parallel,
+        )
+        print(f"{args.collection}: {stats}")
+
+    elif args.command == "gc":
+        deleted = await ingestion_service.collect_garbage(args.collection, grace_seconds=args.grace_seconds)
+        print(f"Удалено версий: {len(deleted)} {deleted}")
+
+    elif args.command == "pipeline":
+        from services.document_pipeline import DocumentPipeline
+
+        pipeline = DocumentPipeline(
+            ingestion_service,
+            collection_name=args.collection,
+            download_dir=args.download_dir,
+            chunk_set=args.chunk_set,
+            output=args.output,
+            batch_size=args.batch_size,
+            queue_size=args.queue_size,
+            workers={stage: getattr(args, f"{stage}_workers") for stage in PIPELINE_STAGES},
+        )
+        stats = await pipeline.run(args.links, kinds=args.kinds, recreate=args.recreate, profile=args.profile)
+        print(stats)
+
+    elif args.command == "local-build":
+        backend = LocalVectorBackend(args.path, qdrant_service.sparse_encoder, qdrant_service.get_embeddings)
+        await backend.build(args.collection, iter_chunk_files(args.files or CONFIG.qdrant.local.sources), batch_size=args.batch_size)
+
+    elif args.command == "store":
+        with ChunkStoreWriter(args.output, shard_size=args.shard_size, append=args.append) as writer:
+            for batch in batched(iter_chunk_files(args.files), args.batch_size):
+                vectors = await qdrant_service.get_embeddings([chunk["text"] for chunk in batch]) if args.embed else [None] * len(batch)
+                for chunk, vector in zip(batch, vectors, strict=True):
+                    writer.add(chunk, vector)
+        print(f"{args.output}: {writer.count} чанков в {len(writer.shards)} шардах, эмбеддинги: {writer.dim or 'нет'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
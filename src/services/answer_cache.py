@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+
+from services.qdrant_service import qdrant_service
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("AnswerCache")
+
+EmbedFunc = Callable[[str], Awaitable[List[float]]]
+
+
+class AnswerCache:
+    """
+    Семантический кэш финальных ответов агента.
+
+    Ответ выдаётся из кэша, если косинусная близость эмбеддинга нового вопроса
+    к сохранённому не ниже threshold и запись моложе ttl_seconds. Записи хранятся
+    в SQLite, в памяти держится нормированная матрица эмбеддингов вопросов.
+    Переиндексация вызывает invalidate(); другие процессы замечают это по
+    PRAGMA data_version и перечитывают кэш.
+    """
+
+    def __init__(self, embed: EmbedFunc, path: str, threshold: float, ttl_seconds: int, max_entries: int):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " query TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+        self._data_version: int | None = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._created_at = np.zeros(0, dtype=np.float64)
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, query: str) -> str | None:
+        vector = self._normalize(await self.embed(query))
+        answer = await asyncio.to_thread(self._lookup, vector)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(f"Ответ на '{query[:100]}' взят из кэша (hits={self.hits}, misses={self.misses})")
+        return answer
+
+    async def store(self, query: str, answer: str):
+        vector = self._normalize(await self.embed(query))
+        await asyncio.to_thread(self._store, query, vector, answer)
+
+    def invalidate(self):
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+            self._reload()
+        logger.info("Кэш ответов очищен")
+
+    def _lookup(self, vector: np.ndarray) -> str | None:
+        with self._lock:
+            self._reload_if_changed()
+            if not len(self._ids) or self._matrix.shape[1] != len(vector):
+                return None
+
+            scores = self._matrix @ vector
+            scores[self._created_at < time.time() - self.ttl_seconds] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            row = self._db.execute("SELECT answer FROM answers WHERE id = ?", (int(self._ids[best]),)).fetchone()
+            return row[0] if row else None
+
+    def _store(self, query: str, vector: np.ndarray, answer: str):
+        with self._lock:
+            now = time.time()
+            self._db.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "INSERT INTO answers (query, vector, answer, created_at) VALUES (?, ?, ?, ?)",
+                (query, vector.tobytes(), answer, now),
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+            self._reload()
+
+    def _reload_if_changed(self):
+        (data_version,) = self._db.execute("PRAGMA data_version").fetchone()
+        if data_version != self._data_version:
+            self._reload()
+
+    def _reload(self):
+        rows = self._db.execute("SELECT id, vector, created_at FROM answers").fetchall()
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._created_at = np.array([row[2] for row in rows], dtype=np.float64)
+        self._matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+        (self._data_version,) = self._db.execute("PRAGMA data_version").fetchone()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+
+answer_cache = AnswerCache(
+    embed=qdrant_service.get_embedding,
+    path=CONFIG.answer_cache.path,
+    threshold=CONFIG.answer_cache.threshold,
+    ttl_seconds=CONFIG.answer_cache.ttl_seconds,
+    max_entries=CONFIG.answer_cache.max_entries,
+)
@@ -0,0 +1,48 @@
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from services.chunk_ids import upgrade_legacy_chunks
+from services.chunk_store import ChunkStore, is_chunk_store
+
+# Пространство имён для детерминированных id точек: повторная загрузка перезаписывает те же точки
+POINT_ID_NAMESPACE = uuid.UUID("5b0e7a52-54f4-4a55-9d43-4b8e6a7f2c11")
+
+
+def chunk_point_id(chunk: Dict[str, Any]) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, str(chunk["chunk_uid"])))
+
+
+def iter_chunks(path: str | Path) -> Iterator[Dict[str, Any]]:
+    """
+    Чанки из каталога хранилища (services/chunk_store.py), .jsonl или chunks_*.json - по одному.
+    Чанки старого формата получают стабильные chunk_uid по тексту (services/chunk_ids.py).
+    """
+    yield from upgrade_legacy_chunks(_read_chunks(Path(path)))
+
+
+def _read_chunks(path: Path) -> Iterator[Dict[str, Any]]:
+    if is_chunk_store(path):
+        yield from ChunkStore(path)
+    elif path.suffix == ".jsonl":
+        yield from ChunkStore.iter_shard(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)["chunks"]
+
+
+def iter_chunk_files(paths: Iterable[str | Path]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        yield from iter_chunks(path)
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
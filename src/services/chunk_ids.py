@@ -0,0 +1,50 @@
+import hashlib
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def document_key(doc_id: Any) -> str:
+    return hashlib.sha1(str(doc_id).encode("utf-8")).hexdigest()[:12]
+
+
+def assign_stable_ids(chunks: List[Dict[str, Any]], doc_id: Any) -> List[Dict[str, Any]]:
+    """
+    Проставляет чанкам документа стабильные идентификаторы.
+
+    chunk_uid строится из id документа и хэша текста чанка, поэтому не зависит
+    от порядка документов и от соседних чанков: новый документ не сдвигает id
+    остальных, а изменённый чанк получает новый id. chunk_id остаётся порядковым
+    номером чанка внутри документа.
+    """
+    doc_key = document_key(doc_id)
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        chunk["document_id"] = doc_id
+        chunk["content_hash"] = content_hash(chunk["text"])
+        uid = f"{doc_key}_{chunk['content_hash'][:16]}"
+        # Повторяющийся внутри документа текст различаем номером вхождения
+        seen[uid] = seen.get(uid, 0) + 1
+        chunk["chunk_uid"] = uid if seen[uid] == 1 else f"{uid}_{seen[uid]}"
+    return chunks
+
+
+def upgrade_legacy_chunks(chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Переводит чанки старого формата (без content_hash, chunk_uid вида chunk_N и сквозной
+    по корпусу chunk_id) на стабильные id по тексту, как у assign_stable_ids, с нумерацией
+    chunk_id внутри документа. Чанки документа в таких файлах идут подряд; чанки нового
+    формата не меняются.
+    """
+    for doc_id, group in itertools.groupby(chunks, key=lambda chunk: chunk.get("document_id")):
+        for is_legacy, part in itertools.groupby(group, key=lambda chunk: "content_hash" not in chunk):
+            if not is_legacy:
+                yield from part
+                continue
+            part = list(part)
+            for position, chunk in enumerate(part):
+                chunk["chunk_id"] = position
+            yield from assign_stable_ids(part, doc_id)
@@ -0,0 +1,137 @@
+import re
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Any, Dict, Iterable, Tuple
+from urllib.parse import unquote, urlparse
+
+from qdrant_client.models import DatetimeRange, FieldCondition, Filter, MatchAny, MatchValue, PayloadSchemaType
+
+# Категории совпадают со значениями GeneralInfoTool.category
+CATEGORIES = ("admission", "contacts", "departments", "events", "rules", "services", "general")
+SOURCE_TYPES = ("pdf", "docx", "html")
+
+# Поля payload, по которым строятся индексы Qdrant
+PAYLOAD_INDEXES = {
+    "category": PayloadSchemaType.KEYWORD,
+    "source_type": PayloadSchemaType.KEYWORD,
+    "document_id": PayloadSchemaType.KEYWORD,
+    "chunk_id": PayloadSchemaType.INTEGER,
+    "chunk_set": PayloadSchemaType.KEYWORD,
+    "date": PayloadSchemaType.DATETIME,
+}
+
+# Правила по сегментам пути URL документа, проверяются по порядку
+_CATEGORY_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("admission", ("priem", "abitur", "abiturient", "admission", "pk")),
+    ("contacts", ("contacts", "kontakty", "contact", "phones")),
+    ("events", ("events", "news", "conf", "schoolconf", "itforum", "forum", "olimp", "zavread", "prioritet2030")),
+    ("rules", ("regdocs", "rules", "pravila", "anticor", "document", "docs", "normdocs", "pr_guap")),
+    ("services", ("it", "career", "library", "lib", "grants", "stips", "dormitory", "obsh", "fillpos", "jsal", "osvr")),
+    ("departments", ("struct", "inst", "kaf", "fak", "faculty", "sveden")),
+)
+_TOKEN_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+_YEAR_RE = re.compile(r"(?<![0-9a-z])(20\d{2})(?!\d)")
+
+
+def _document_path(chunk: Dict[str, Any]) -> str:
+    # document_id бывает хэшем (PDF-конвейер), поэтому сначала URL и имя файла
+    document = str(chunk.get("url") or chunk.get("filename") or chunk.get("document_id") or "")
+    return unquote(urlparse(document).path if "://" in document else document).lower()
+
+
+def source_type(chunk: Dict[str, Any]) -> str:
+    suffix = PurePosixPath(_document_path(chunk)).suffix.lstrip(".")
+    if suffix in ("pdf", "docx"):
+        return suffix
+    if suffix == "doc":
+        return "docx"
+    return "html"
+
+
+def classify_category(chunk: Dict[str, Any]) -> str:
+    """Категория документа по сегментам пути его URL, "general" если ни одно правило не подошло."""
+    tokens = set(_TOKEN_SPLIT_RE.split(_document_path(chunk)))
+    for category, markers in _CATEGORY_RULES:
+        if tokens.intersection(markers):
+            return category
+    return "general"
+
+
+def document_date(chunk: Dict[str, Any]) -> str | None:
+    """Дата документа в ISO-формате: явная из чанка или год из URL (1 января этого года)."""
+    if chunk.get("date"):
+        return str(chunk["date"])
+    match = _YEAR_RE.search(_document_path(chunk))
+    return f"{match.group(1)}-01-01" if match else None
+
+
+def chunk_payload(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload точки: поля чанка плюс category, source_type и date для фильтрации."""
+    payload = dict(chunk)
+    payload.setdefault("category", classify_category(chunk))
+    payload.setdefault("source_type", source_type(chunk))
+    date = document_date(chunk)
+    if date:
+        payload["date"] = date
+    return payload
+
+
+def _as_tuple(value: str | Iterable[str] | None) -> Tuple[str, ...] | None:
+    if value is None:
+        return None
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Типизированные фильтры поиска по индексированным полям payload.
+
+    Значения одного поля объединяются через ИЛИ, разные поля - через И.
+    Даты задаются в ISO-формате ("2024-09-01"), границы включительные.
+    """
+
+    category: str | Tuple[str, ...] | None = None
+    source_type: str | Tuple[str, ...] | None = None
+    document_id: str | Tuple[str, ...] | None = None
+    date_from: str | None = None
+    date_to: str | None = None
+
+    def __post_init__(self):
+        for name in ("category", "source_type", "document_id"):
+            object.__setattr__(self, name, _as_tuple(getattr(self, name)))
+
+    def _match_fields(self) -> Dict[str, Tuple[str, ...]]:
+        return {
+            name: values
+            for name, values in (("category", self.category), ("source_type", self.source_type), ("document_id", self.document_id))
+            if values
+        }
+
+    def is_empty(self) -> bool:
+        return not self._match_fields() and self.date_from is None and self.date_to is None
+
+    def to_qdrant(self) -> Filter | None:
+        conditions = []
+        for key, values in self._match_fields().items():
+            match = MatchValue(value=values[0]) if len(values) == 1 else MatchAny(any=list(values))
+            conditions.append(FieldCondition(key=key, match=match))
+        if self.date_from is not None or self.date_to is not None:
+            conditions.append(FieldCondition(key="date", range=DatetimeRange(gte=self.date_from, lte=self.date_to)))
+        return Filter(must=conditions) if conditions else None
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        """Та же проверка на стороне клиента - для локального бэкенда."""
+        for key, values in self._match_fields().items():
+            if payload.get(key) not in values:
+                return False
+        if self.date_from is not None or self.date_to is not None:
+            date = payload.get("date")
+            # ISO-даты одного формата корректно сравниваются как строки
+            if not date:
+                return False
+            if self.date_from is not None and date < self.date_from:
+                return False
+            if self.date_to is not None and date > self.date_to:
+                return False
+        return True
@@ -0,0 +1,230 @@
+import itertools
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+# Хранилище чанков - каталог вместо одного {"chunks": [...]} с отступами:
+#   manifest.json           - список шардов, число чанков и размерность эмбеддингов
+#   shard-00000.jsonl, ...  - чанки по одному JSON в строке, не больше shard_size в шарде
+#   index.json              - chunk_uid -> [номер шарда, смещение строки в байтах, номер строки]
+#   embeddings.f32          - необязательная float32-матрица (строка i - эмбеддинг i-го чанка), читается через mmap
+# Новое хранилище собирается в соседнем каталоге <path>.building и подменяет прежнее целиком при закрытии
+# писателя. При дописывании шарды только растут, а manifest.json заменяется атомарно: оборванная запись
+# не видна читателям, а при следующем дописывании хвост после последнего манифеста отрезается.
+
+MANIFEST = "manifest.json"
+INDEX = "index.json"
+EMBEDDINGS = "embeddings.f32"
+SHARD_SIZE = 10000
+FORMAT_VERSION = 1
+
+
+def is_chunk_store(path: str | Path) -> bool:
+    return (Path(path) / MANIFEST).exists()
+
+
+def _read_json(path: Path) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, data: Any):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class ChunkStoreWriter:
+    """
+    Пишет чанки (и, если переданы, их эмбеддинги) в хранилище по одному, не держа корпус в памяти.
+
+    С append=True дописывает существующее хранилище, иначе собирает новое в <path>.building
+    и при close() подменяет им прежнее через os.replace: до этого читатели видят старое хранилище
+    целиком. Записанное становится видно читателям после close() или выхода из with без исключения;
+    discard() бросает запись, не трогая прежнее хранилище.
+    """
+
+    def __init__(self, path: str | Path, shard_size: int = SHARD_SIZE, append: bool = False):
+        self.target = Path(path)
+        self.building = not (append and is_chunk_store(self.target))
+        self.path = self.target.with_name(self.target.name + ".building") if self.building else self.target
+        if self.building:
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.shards: List[Dict[str, Any]] = []
+        self.index: Dict[str, List[int]] = {}
+        self.count = 0
+        self.dim: int | None = None
+
+        if not self.building:
+            manifest = _read_json(self.path / MANIFEST)
+            self.shards, self.count, self.dim = manifest["shards"], manifest["count"], manifest["dim"]
+            self.index = _read_json(self.path / INDEX)
+
+        # Отрезаем то, что осталось от прерванной записи после последнего манифеста
+        committed = {shard["name"] for shard in self.shards}
+        for stale in self.path.glob("shard-*.jsonl"):
+            if stale.name not in committed:
+                stale.unlink()
+        if self.shards:
+            with open(self.path / self.shards[-1]["name"], "r+b") as f:
+                f.truncate(self.shards[-1]["bytes"])
+        if self.dim:
+            with open(self.path / EMBEDDINGS, "r+b") as f:
+                f.truncate(self.count * self.dim * 4)
+        else:
+            (self.path / EMBEDDINGS).unlink(missing_ok=True)
+
+        self._shard_file = None
+        self._embeddings_file = open(self.path / EMBEDDINGS, "ab") if self.dim else None
+
+    def add(self, chunk: Dict[str, Any], vector: List[float] | np.ndarray | None = None):
+        if self.count and (vector is None) != (self.dim is None):
+            raise ValueError("Эмбеддинги должны быть либо у всех чанков хранилища, либо ни у одного")
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            if self.dim is None:
+                self.dim = len(vector)
+                self._embeddings_file = open(self.path / EMBEDDINGS, "ab")
+            elif len(vector) != self.dim:
+                raise ValueError(f"Размерность эмбеддинга {len(vector)}, в хранилище {self.dim}")
+            self._embeddings_file.write(vector.tobytes())
+
+        if self._shard_file is None or self.shards[-1]["count"] >= self.shard_size:
+            self._open_shard()
+        shard = self.shards[-1]
+        line = (json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8")
+        self.index[str(chunk["chunk_uid"])] = [len(self.shards) - 1, shard["bytes"], self.count]
+        self._shard_file.write(line)
+        shard["bytes"] += len(line)
+        shard["count"] += 1
+        self.count += 1
+
+    def add_all(self, chunks: Iterable[Dict[str, Any]]):
+        for chunk in chunks:
+            self.add(chunk)
+
+    def _open_shard(self):
+        if self._shard_file:
+            self._shard_file.close()
+        if not self.shards or self.shards[-1]["count"] >= self.shard_size:
+            self.shards.append({"name": f"shard-{len(self.shards):05d}.jsonl", "count": 0, "bytes": 0})
+        self._shard_file = open(self.path / self.shards[-1]["name"], "ab")
+
+    def _close_files(self):
+        for f in (self._shard_file, self._embeddings_file):
+            if f:
+                f.close()
+        self._shard_file = self._embeddings_file = None
+
+    def close(self):
+        self._close_files()
+        _write_json(self.path / INDEX, self.index)
+        _write_json(self.path / MANIFEST, {"version": FORMAT_VERSION, "count": self.count, "dim": self.dim, "shards": self.shards})
+        if self.building:
+            self._swap()
+
+    def discard(self):
+        # Манифест не обновляется: для читателей хранилище остаётся прежним
+        self._close_files()
+        if self.building:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def _swap(self):
+        # Открытые читателями файлы прежней версии остаются доступны до закрытия, каталог подменяется целиком
+        retired = self.target.with_name(self.target.name + ".retired")
+        shutil.rmtree(retired, ignore_errors=True)
+        if self.target.exists():
+            os.replace(self.target, retired)
+        os.replace(self.path, self.target)
+        shutil.rmtree(retired, ignore_errors=True)
+        self.path = self.target
+        self.building = False
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ChunkStore:
+    """
+    Чтение хранилища чанков без загрузки корпуса в память.
+
+    Итерация идёт по шардам строка за строкой, шарды можно читать параллельно через
+    iter_shard; get(chunk_uid) читает одну строку по смещению из индекса, а матрица
+    эмбеддингов открывается через mmap и подгружается ОС по мере обращения.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        manifest = _read_json(self.path / MANIFEST)
+        self.count: int = manifest["count"]
+        self.dim: int | None = manifest["dim"]
+        self.shards = [self.path / shard["name"] for shard in manifest["shards"]]
+        # Строки после записанного в манифест числа - хвост незавершённой записи, читатели его не видят
+        self.shard_counts: List[int] = [shard["count"] for shard in manifest["shards"]]
+        self._index: Dict[str, List[int]] | None = None
+        self._embeddings: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for shard, count in zip(self.shards, self.shard_counts, strict=True):
+            yield from self.iter_shard(shard, count)
+
+    @staticmethod
+    def iter_shard(shard: str | Path, count: int | None = None) -> Iterator[Dict[str, Any]]:
+        with open(shard, "r", encoding="utf-8") as f:
+            lines = (line for line in f if line.strip())
+            for line in itertools.islice(lines, count):
+                yield json.loads(line)
+
+    @property
+    def index(self) -> Dict[str, List[int]]:
+        if self._index is None:
+            self._index = _read_json(self.path / INDEX)
+        return self._index
+
+    def __contains__(self, chunk_uid: str) -> bool:
+        return str(chunk_uid) in self.index
+
+    def get(self, chunk_uid: str) -> Dict[str, Any]:
+        shard, offset, _ = self.index[str(chunk_uid)]
+        with open(self.shards[shard], "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    @property
+    def embeddings(self) -> np.ndarray | None:
+        """Матрица эмбеддингов count x dim через mmap или None, если хранилище без эмбеддингов."""
+        if self._embeddings is None and self.dim and self.count:
+            self._embeddings = np.memmap(self.path / EMBEDDINGS, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._embeddings
+
+    def embedding(self, chunk_uid: str) -> np.ndarray | None:
+        if self.embeddings is None:
+            return None
+        return self.embeddings[self.index[str(chunk_uid)][2]]
+
+
+def save_chunks(chunks: Iterable[Dict[str, Any]], output: str | Path, shard_size: int = SHARD_SIZE):
+    """Файл .json - прежний формат {"chunks": [...]}, любой другой путь - каталог хранилища."""
+    output = Path(output)
+    if output.suffix == ".json":
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"chunks": list(chunks)}, f, ensure_ascii=False, indent=2)
+        return
+    with ChunkStoreWriter(output, shard_size=shard_size) as writer:
+        writer.add_all(chunks)
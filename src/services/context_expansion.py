@@ -0,0 +1,127 @@
+import asyncio
+from itertools import pairwise
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from utils.logger import get_logger
+
+logger = get_logger("ContextExpansion")
+
+ChunkKey = Tuple[str, int]
+
+# (коллекция, document_id, первый chunk_id, последний chunk_id) -> payload чанков из этого диапазона
+FetchFunc = Callable[[str, Any, int, int], Awaitable[List[Dict[str, Any]]]]
+
+
+def _token_count(chunk: Dict[str, Any]) -> int:
+    # У чанков без token_count оцениваем ~4 символа на токен
+    return chunk.get("token_count") or len(chunk.get("text", "")) // 4 + 1
+
+
+def stitch_chunks(chunks: List[Dict[str, Any]]) -> str:
+    """Склеивает соседние чанки документа; перекрытие, если оно есть по смещениям, не дублируется."""
+    parts = [chunks[0]["text"]]
+    for previous, chunk in pairwise(chunks):
+        text = chunk["text"]
+        overlap = previous.get("end_offset", -1) - chunk.get("start_offset", -1)
+        if chunk.get("start_offset", -1) >= 0 and 0 < overlap < len(text):
+            text = text[overlap:]
+        parts.append(text)
+    return " ".join(part.strip() for part in parts if part.strip())
+
+
+class NeighbourExpander:
+    """
+    Small-to-big: найденный чанк дополняется соседними чанками того же документа.
+
+    Поиск идёт по маленьким чанкам, а в ответ уходит окно вокруг каждого попадания,
+    набранное поочерёдно слева и справа (не дальше max_neighbours чанков в каждую сторону),
+    пока укладывается в token_budget. Соседи запрашиваются у той же коллекции по document_id
+    и диапазону chunk_id, поэтому окно всегда соответствует проиндексированной версии документа;
+    текст самого попадания берётся из выдачи и сохраняется в metadata.hit_text. Чанки, уже
+    вошедшие в окно более релевантного попадания, повторно не выдаются.
+    """
+
+    def __init__(self, fetch: FetchFunc, token_budget: int, max_neighbours: int):
+        self.fetch = fetch
+        self.token_budget = token_budget
+        self.max_neighbours = max_neighbours
+
+    async def expand(self, collection_name: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        keys = [self._key(document["metadata"]) for document in documents]
+        try:
+            chunks = await self._fetch_neighbours(collection_name, documents, keys)
+        except Exception as e:
+            logger.warning(f"Не удалось получить соседние чанки из {collection_name}, контекст не расширяется: {e}")
+            return documents
+
+        covered: set[ChunkKey] = set()
+        expanded = []
+        for document, key in zip(documents, keys, strict=True):
+            if key is None:
+                expanded.append(document)
+                continue
+            if key in covered:
+                continue
+
+            window = self._window(chunks, key, covered)
+            covered.update(window)
+            window_chunks = [chunks[k] for k in window]
+            expanded.append(
+                {
+                    **document,
+                    "text": stitch_chunks(window_chunks),
+                    "metadata": {
+                        **document["metadata"],
+                        "hit_text": document["text"],
+                        "hit_chunk_id": key[1],
+                        "expanded_chunk_ids": [k[1] for k in window],
+                        "token_count": sum(_token_count(chunk) for chunk in window_chunks),
+                    },
+                }
+            )
+        return expanded
+
+    async def _fetch_neighbours(
+        self, collection_name: str, documents: List[Dict[str, Any]], keys: List[ChunkKey | None]
+    ) -> Dict[ChunkKey, Dict[str, Any]]:
+        hits = {key: document for document, key in zip(documents, keys, strict=True) if key is not None}
+        fetched = await asyncio.gather(
+            *(
+                self.fetch(collection_name, document["metadata"]["document_id"], max(0, key[1] - self.max_neighbours), key[1] + self.max_neighbours)
+                for key, document in hits.items()
+            )
+        )
+        chunks = {}
+        for payloads in fetched:
+            for payload in payloads:
+                key = self._key(payload)
+                if key is not None:
+                    chunks[key] = payload
+        # Само попадание - ровно тот текст, что вернул поиск
+        for key, document in hits.items():
+            chunks[key] = {**document["metadata"], "text": document["text"]}
+        return chunks
+
+    def _window(self, chunks: Dict[ChunkKey, Dict[str, Any]], key: ChunkKey, covered: set[ChunkKey]) -> List[ChunkKey]:
+        document_id, chunk_id = key
+        window = [chunk_id]
+        budget = self.token_budget - _token_count(chunks[key])
+        # Следующий кандидат в каждую сторону; сторона закрывается на первом неподходящем чанке
+        frontier = {1: chunk_id + 1, -1: chunk_id - 1}
+        while frontier:
+            for direction in list(frontier):
+                neighbour = (document_id, frontier[direction])
+                chunk = chunks.get(neighbour)
+                if chunk is None or neighbour in covered or abs(neighbour[1] - chunk_id) > self.max_neighbours or _token_count(chunk) > budget:
+                    del frontier[direction]
+                    continue
+                budget -= _token_count(chunk)
+                window.append(frontier[direction])
+                frontier[direction] += direction
+        return [(document_id, i) for i in sorted(window)]
+
+    @staticmethod
+    def _key(metadata: Dict[str, Any]) -> ChunkKey | None:
+        if metadata.get("document_id") is None or metadata.get("chunk_id") is None:
+            return None
+        return str(metadata["document_id"]), int(metadata["chunk_id"])
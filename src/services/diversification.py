@@ -0,0 +1,82 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+def collapse_near_duplicates(vectors: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Индексы строк без почти-дубликатов (косинус >= threshold), порядок сохраняется.
+
+    Строки считаются упорядоченными по релевантности: из группы похожих
+    остаётся первая, то есть самая релевантная.
+    """
+    if not len(vectors):
+        return np.zeros(0, dtype=np.int64)
+
+    unit = _normalize_rows(vectors)
+    similarity = unit @ unit.T
+    # Сравниваем каждую строку только с более релевантными
+    duplicate_of_earlier = np.triu(similarity >= threshold, k=1)
+
+    keep = np.ones(len(vectors), dtype=bool)
+    for i in range(len(vectors)):
+        if keep[i]:
+            keep[duplicate_of_earlier[i]] = False
+    return np.flatnonzero(keep)
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_: float) -> np.ndarray:
+    """
+    Maximal Marginal Relevance: жадно выбирает k строк, максимизируя
+    lambda_ * relevance(d) - (1 - lambda_) * max sim(d, уже выбранные).
+    """
+    n = len(vectors)
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    unit = _normalize_rows(vectors)
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return np.asarray(selected, dtype=np.int64)
+
+
+def diversify(
+    documents: List[Dict[str, Any]],
+    vectors: List[List[float]],
+    limit: int,
+    mmr_lambda: float,
+    dedup_threshold: float,
+) -> List[Dict[str, Any]]:
+    """
+    Убирает почти-дубликаты из ранжированного списка и выбирает limit документов через MMR.
+
+    Релевантность берётся из score документов (косинус или RRF), нормированного на максимум,
+    поэтому MMR работает и поверх гибридной выдачи.
+    """
+    if not documents:
+        return documents
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    scores = np.asarray([document["score"] for document in documents], dtype=np.float32)
+    relevance = scores / (scores.max() or 1.0)
+
+    kept = collapse_near_duplicates(matrix, dedup_threshold)
+    selected = kept[mmr_select(relevance[kept], matrix[kept], limit, mmr_lambda)]
+    return [documents[i] for i in selected]
@@ -0,0 +1,253 @@
+import asyncio
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, Iterator, List
+from urllib.parse import urlparse
+
+import httpx
+
+from rag_sources.chunk_ids import assign_stable_ids
+from rag_sources.chunking import chunk_by_gpt_tokens
+from rag_sources.download_cache import DownloadCache
+from rag_sources.downloader import Downloader
+from rag_sources.extractors import extract_document, extract_pdf_page, file_sha1, join_pdf_pages, pdf_page_count
+from rag_sources.near_dedup import CorpusDeduplicator
+from services.chunk_files import chunk_point_id
+from services.chunk_metadata import document_date
+from services.chunk_store import ChunkStoreWriter
+from services.ingestion_service import IngestionService, IngestionStats
+from services.staged_pipeline import PipelineStats, Stage, StagedPipeline
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("DocumentPipeline")
+
+DOCUMENT_KINDS = ("pdf", "docx", "html")
+_HTML_SUFFIXES = ("", ".html", ".htm", ".php")
+
+
+def document_kind(url: str, declared: str | None = None) -> str | None:
+    """Тип документа: из второй колонки CSV, иначе по расширению в пути URL."""
+    if declared in DOCUMENT_KINDS:
+        return declared
+    suffix = PurePosixPath(urlparse(url).path).suffix.lower()
+    if suffix in (".pdf", ".docx"):
+        return suffix.lstrip(".")
+    return "html" if suffix in _HTML_SUFFIXES else None
+
+
+def discover_links(paths: Iterable[str | Path], kinds: Iterable[str] = DOCUMENT_KINDS) -> Iterator[Dict[str, Any]]:
+    """Документы из CSV-файлов ссылок (url[,тип], как пишет link_parser) без повторов, по одному."""
+    kinds = set(kinds)
+    seen: set[str] = set()
+    for path in paths:
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                url = row[0].strip() if row else ""
+                if not url.startswith(("http://", "https://")) or url in seen:
+                    continue
+                kind = document_kind(url, row[1].strip() if len(row) > 1 else None)
+                if kind in kinds:
+                    seen.add(url)
+                    yield {"url": url, "kind": kind}
+
+
+def stale_points(existing: Dict[str, Dict[str, Any]], seen: set[str], processed: set[str], linked: set[str]) -> List[str]:
+    """
+    Точки набора чанков, которые нужно удалить после прогона: чанки обработанных документов,
+    которых больше нет в документе, и чанки документов, исчезнувших из списка ссылок. Чанки
+    документов, которые в этот раз не скачались или не разобрались, остаются.
+    """
+    return [
+        point_id
+        for point_id, payload in existing.items()
+        if point_id not in seen and (payload.get("document_id") in processed or payload.get("document_id") not in linked)
+    ]
+
+
+class DocumentPipeline:
+    """
+    Потоковая загрузка документов с сайта в Qdrant: discover -> download -> extract -> chunk -> embed -> upsert.
+
+    Стадии работают одновременно и связаны ограниченными очередями (services/staged_pipeline.py),
+    поэтому в памяти одновременно находится не больше queue_size элементов на стадию, сколько бы
+    ни было ссылок. Файлы скачиваются на диск в download_dir (rag_sources/download_cache.py: имя по sha1
+    содержимого, ETag/Last-Modified по каноническому URL) и дальше передаются путём; уже скачанные
+    запрашиваются условно и при ответе 304 не передаются заново. Оборванные загрузки докачиваются
+    через Range, повторы идут с экспоненциальной задержкой, число запросов к хосту и общая скорость
+    ограничены настройками ingestion.pipeline (rag_sources/downloader.py). Текст извлекается в пуле процессов (PDF - постранично, с OCR только
+    страниц без текстового слоя и кэшем страниц в ingestion.pipeline.pdf_page_cache), чанки проходят ту же дедупликацию
+    и получают те же стабильные id, что и в скриптах rag_sources, а уже загруженные чанки
+    отсеиваются до эмбеддинга. Зеркала документов только считаются: к уже загруженным чанкам
+    оригинала они не дописываются. После прогона, как в IngestionService.sync_file, из набора
+    chunk_set удаляются чанки, исчезнувшие из обработанных документов, и чанки документов,
+    пропавших из списка ссылок (stale_points).
+    """
+
+    def __init__(
+        self,
+        ingestion: IngestionService,
+        collection_name: str,
+        download_dir: str | Path,
+        chunk_set: str = "pipeline",
+        output: str | Path | None = None,
+        batch_size: int | None = None,
+        queue_size: int | None = None,
+        workers: Dict[str, int] | None = None,
+    ):
+        settings = CONFIG.ingestion.pipeline
+        self.ingestion = ingestion
+        self.collection_name = collection_name
+        self.download_dir = Path(download_dir)
+        self.pdf_cache_dir = settings.pdf_page_cache or None
+        self.chunk_set = chunk_set
+        self.output = Path(output) if output else None
+        self.batch_size = batch_size or CONFIG.ingestion.batch_size
+        self.queue_size = queue_size or settings.queue_size
+        self.workers = {
+            "download": settings.download_workers,
+            "extract": settings.extract_workers,
+            "chunk": settings.chunk_workers,
+            "embed": settings.embed_workers,
+            "upsert": settings.upsert_workers,
+            **{name: count for name, count in (workers or {}).items() if count},
+        }
+        self.dedup = CorpusDeduplicator(document_threshold=0.85, chunk_threshold=0.9)
+        self.stats = IngestionStats()
+        self._downloader: Downloader | None = None
+        self.download_cache: DownloadCache | None = None
+        self._output_file = None
+        self._output_store: ChunkStoreWriter | None = None
+        self._extract_pool: ProcessPoolExecutor | None = None
+        self._existing: Dict[str, Dict[str, Any]] = {}
+        self._existing_hashes: Dict[str, str] = {}
+        self._processed: set[str] = set()
+        self._seen: set[str] = set()
+
+    def stages(self) -> List[Stage]:
+        return [
+            Stage("download", self.download, workers=self.workers["download"]),
+            Stage("extract", self.extract, workers=self.workers["extract"]),
+            Stage("chunk", self.chunk, workers=self.workers["chunk"], flatten=True),
+            # Ошибка эмбеддинга или записи в Qdrant останавливает загрузку, как и в ingest_chunks
+            Stage("embed", self.embed, workers=self.workers["embed"], batch_size=self.batch_size, ignore_errors=False),
+            Stage("upsert", self.upsert, workers=self.workers["upsert"], ignore_errors=False),
+        ]
+
+    async def run(self, links: List[str | Path], kinds: Iterable[str] = DOCUMENT_KINDS, recreate: bool = False, profile: str | None = None) -> PipelineStats:
+        await self.ingestion.prepare_collection(self.collection_name, recreate=recreate, profile=profile)
+        self._existing = await self.ingestion.scroll_chunk_set(self.collection_name, self.chunk_set, ["content_hash", "document_id"])
+        self._existing_hashes = {point_id: payload.get("content_hash", "") for point_id, payload in self._existing.items()}
+        self.download_cache = DownloadCache(self.download_dir, self.download_dir / "downloads.sqlite3")
+
+        # Проверка сертификата отключена, как в rag_sources/download_pdf.py: у части поддоменов ГУАП цепочка неполная
+        async with httpx.AsyncClient(
+            timeout=30,
+            follow_redirects=True,
+            verify=False,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; SUAI-RAG-ingest)"},
+            limits=httpx.Limits(max_connections=self.workers["download"]),
+        ) as client:
+            settings = CONFIG.ingestion.pipeline
+            self._downloader = Downloader(
+                client,
+                self.download_cache,
+                per_host=settings.download_per_host,
+                bytes_per_second=settings.download_bytes_per_second,
+                retries=settings.download_retries,
+                backoff=settings.download_backoff_seconds,
+            )
+            # Чанки дописываются в .jsonl или в хранилище чанков (любой другой путь - каталог хранилища)
+            if self.output and self.output.suffix == ".jsonl":
+                self._output_file = open(self.output, "w", encoding="utf-8")
+            elif self.output:
+                self._output_store = ChunkStoreWriter(self.output)
+            self._extract_pool = ProcessPoolExecutor(max_workers=self.workers["extract"])
+            try:
+                pipeline = StagedPipeline(self.stages(), queue_size=self.queue_size, report_interval=CONFIG.ingestion.pipeline.report_seconds)
+                stats = await pipeline.run(discover_links(links, kinds), source_name="discover")
+            except BaseException:
+                # Недописанное хранилище чанков не подменяет прежнее
+                if self._output_store:
+                    self._output_store.discard()
+                    self._output_store = None
+                raise
+            finally:
+                self._extract_pool.shutdown(cancel_futures=True)
+                if self._output_file:
+                    self._output_file.close()
+                if self._output_store:
+                    self._output_store.close()
+                self.download_cache.close()
+
+        # Старые копии документов, которые пришли раньше своих новых версий, уже загружены
+        if self.dedup.superseded:
+            await self.ingestion.delete_documents(self.collection_name, self.dedup.superseded)
+            if self.output:
+                logger.warning(f"В {self.output} остались чанки {len(self.dedup.superseded)} документов, вытесненных более новыми копиями")
+        # Типы документов, не выбранные в kinds, считаются по-прежнему на месте
+        linked = {document["url"] for document in discover_links(links)}
+        self.stats.deleted = await self.ingestion.delete_points(self.collection_name, stale_points(self._existing, self._seen, self._processed, linked))
+        if self.stats.upserted or self.stats.deleted or self.dedup.superseded:
+            await self.ingestion.invalidate_answers(self.collection_name)
+        logger.info(
+            f"Скачивание: {self.download_cache.summary()}, докачано {self._downloader.resumed}; "
+            f"{self.dedup.summary()}; загрузка в {self.collection_name}: {self.stats}"
+        )
+        return stats
+
+    async def download(self, document: Dict[str, Any]) -> Dict[str, Any] | None:
+        url, kind = document["url"], document["kind"]
+
+        def accept(headers: httpx.Headers) -> bool:
+            if kind != "html" and "text/html" in headers.get("content-type", ""):
+                logger.warning(f"{url}: вместо {kind} пришла HTML-страница, пропускаем")
+                return False
+            return True
+
+        path = await self._downloader.fetch(url, suffix=f".{kind}", accept=accept)
+        return {**document, "path": str(path)} if path else None
+
+    async def extract(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if document["kind"] != "pdf":
+            return await loop.run_in_executor(self._extract_pool, extract_document, document)
+        # PDF разбирается постранично в том же пуле: страницы большого скана делят все процессы
+        path = document["path"]
+        pages = await loop.run_in_executor(self._extract_pool, pdf_page_count, path)
+        file_hash = await loop.run_in_executor(self._extract_pool, file_sha1, path) if self.pdf_cache_dir else None
+        texts = await asyncio.gather(
+            *(loop.run_in_executor(self._extract_pool, extract_pdf_page, path, page, file_hash, self.pdf_cache_dir) for page in range(pages))
+        )
+        return {**document, "text": join_pdf_pages(texts)}
+
+    async def chunk(self, document: Dict[str, Any]) -> List[Dict[str, Any]] | None:
+        text = document["text"]
+        self._processed.add(document["url"])
+        if not text or self.dedup.is_duplicate_document(document["url"], text, version=document_date(document)):
+            return None
+        chunks = await asyncio.to_thread(chunk_by_gpt_tokens, text)
+        chunks = self.dedup.filter_chunks(assign_stable_ids(chunks, document["url"]))
+        for chunk in chunks:
+            chunk["chunk_set"] = self.chunk_set
+            self._seen.add(chunk_point_id(chunk))
+            if self._output_file:
+                self._output_file.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            elif self._output_store:
+                self._output_store.add(chunk)
+        return chunks
+
+    async def embed(self, batch: List[Dict[str, Any]]) -> tuple[List[str], List[Dict[str, Any]], List[List[float]]] | None:
+        self.stats.read += len(batch)
+        ids, batch = await self.ingestion.select_new_chunks(self.collection_name, batch, self.stats, existing=self._existing_hashes)
+        if not batch:
+            return None
+        vectors = await self.ingestion.qdrant.get_embeddings([chunk["text"] for chunk in batch])
+        return ids, batch, vectors
+
+    async def upsert(self, item: tuple[List[str], List[Dict[str, Any]], List[List[float]]]):
+        ids, batch, vectors = item
+        await self.ingestion.upsert_chunks(self.collection_name, ids, batch, vectors, self.stats)
+
@@ -0,0 +1,91 @@
+import asyncio
+from typing import List
+
+from openai import AsyncOpenAI
+
+from utils.logger import get_logger
+
+logger = get_logger("EmbeddingBatcher")
+
+
+class EmbeddingBatcher:
+    """
+    Объединяет конкурентные запросы эмбеддингов в один вызов embeddings.create.
+
+    Запросы копятся в течение flush_window_ms или до max_batch_size текстов,
+    после чего отправляются одним батчем, а векторы раздаются ожидающим вызовам.
+    """
+
+    def __init__(self, client: AsyncOpenAI, model: str, flush_window_ms: int, max_batch_size: int, dimensions: int | None = None):
+        self.client = client
+        self.model = model
+        # Размерность, которую возвращает сам API (параметр dimensions у text-embedding-3-*)
+        self.dimensions = dimensions or None
+        self.flush_window = flush_window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        self.requests_sent = 0
+        self.texts_embedded = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size or self.flush_window <= 0:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending[: self.max_batch_size], self._pending[self.max_batch_size :]
+        if self._pending:
+            # Остаток не поместился в батч - отправляем его следующим заходом
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        # Одинаковые тексты внутри батча отправляем один раз
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            if self.dimensions:
+                response = await self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dimensions)
+            else:
+                response = await self.client.embeddings.create(model=self.model, input=texts)
+            vectors = {texts[item.index]: item.embedding for item in response.data}
+        except Exception as e:
+            logger.error(f"Ошибка при получении батча эмбеддингов ({len(texts)} шт.): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.requests_sent += 1
+        self.texts_embedded += len(vectors)
+        logger.debug(f"Батч эмбеддингов: {len(batch)} запросов, {len(texts)} уникальных текстов")
+        if len(vectors) < len(texts):
+            logger.error(f"API вернул {len(vectors)} эмбеддингов на {len(texts)} текстов батча")
+
+        # Ответ получает каждый ожидающий вызов: пропущенный в ответе API текст - ошибка только для его вызовов
+        for text, future in batch:
+            if future.done():
+                continue
+            if text in vectors:
+                future.set_result(vectors[text])
+            else:
+                future.set_exception(ValueError(f"API не вернул эмбеддинг для текста {text[:50]!r}"))
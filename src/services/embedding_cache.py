@@ -0,0 +1,175 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger("EmbeddingCache")
+
+# Время обращения к строкам дискового кэша (для вытеснения) пишется пачками, а не коммитом на каждое чтение
+TOUCH_BATCH = 256
+TOUCH_INTERVAL_SECONDS = 30.0
+
+
+def normalize_cache_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_cache_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Двухуровневый кэш эмбеддингов: LRU в памяти процесса + SQLite-файл на диске.
+
+    Ключ - (модель, нормализованный текст). Дисковый уровень переживает рестарты
+    и используется как для пользовательских запросов, так и при индексации чанков.
+    Пустой path отключает дисковый уровень. Векторы хранятся и возвращаются как float32-массивы
+    numpy: список Python float занимает в памяти в несколько раз больше.
+    """
+
+    def __init__(self, memory_size: int, path: str = "", max_rows: int = 0):
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._touched: dict[str, float] = {}
+        self._touch_flushed_at = time.monotonic()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+            self._db.commit()
+
+    def get_many(self, model: str, texts: list[str]) -> list[np.ndarray | None]:
+        keys = [embedding_cache_key(model, text) for text in texts]
+        result: list[np.ndarray | None] = [None] * len(keys)
+        disk_lookup: dict[str, list[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    result[i] = vector
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._db is not None:
+                found = self._read_disk(list(disk_lookup))
+                for key, vector in found.items():
+                    for i in disk_lookup.pop(key):
+                        result[i] = vector
+                        self.disk_hits += 1
+                    self._remember(key, vector)
+
+            self.misses += sum(len(positions) for positions in disk_lookup.values())
+
+        return result
+
+    def get(self, model: str, text: str) -> np.ndarray | None:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[List[float] | np.ndarray]):
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors, strict=True):
+                key = embedding_cache_key(model, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model, vector.tobytes(), now))
+
+            if self._db is not None and rows:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector, accessed_at) VALUES (?, ?, ?, ?)", rows)
+                # Вытеснение смотрит на accessed_at, поэтому накопленные обращения записываются до него
+                self._flush_touched()
+                self._evict_disk()
+                self._db.commit()
+
+    def put(self, model: str, text: str, vector: List[float] | np.ndarray):
+        self.put_many(model, [text], [vector])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_size": len(self._memory),
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._flush_touched()
+                self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        # SQLite ограничивает число параметров в запросе
+        for start in range(0, len(keys), 500):
+            part = keys[start : start + 500]
+            placeholders = ",".join("?" * len(part))
+            for key, blob in self._db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part):
+                # Массив только для чтения: закэшированный вектор нельзя случайно изменить на месте
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            self._touched.update(dict.fromkeys(found, time.time()))
+            if len(self._touched) >= TOUCH_BATCH or time.monotonic() - self._touch_flushed_at >= TOUCH_INTERVAL_SECONDS:
+                self._flush_touched()
+                self._db.commit()
+        return found
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany("UPDATE embeddings SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+        self._touch_flushed_at = time.monotonic()
+
+    def _evict_disk(self):
+        if self.max_rows <= 0:
+            return
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_rows
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+            logger.debug(f"Вытеснено {overflow} эмбеддингов из дискового кэша")
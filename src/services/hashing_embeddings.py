@@ -0,0 +1,67 @@
+import hashlib
+import math
+from collections import Counter
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+from services.sparse_encoder import tokenize
+
+HASHING_MODEL = "hashing"
+DEFAULT_DIMENSIONS = 512
+
+# Вклад символьных n-грамм относительно целых основ слов
+_NGRAM_WEIGHT = 0.5
+_NGRAM_SIZE = 3
+
+
+def _bucket(feature: str, dimensions: int) -> tuple[int, float]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimensions, 1.0 if value >> 63 else -1.0
+
+
+def _features(text: str) -> Counter:
+    features = Counter()
+    for token in tokenize(text):
+        features[token] += 1.0
+        padded = f"#{token}#"
+        for i in range(len(padded) - _NGRAM_SIZE + 1):
+            features[padded[i : i + _NGRAM_SIZE]] += _NGRAM_WEIGHT
+    return features
+
+
+def hashing_embedding(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> List[float]:
+    """
+    Детерминированный эмбеддинг без модели: основы слов и символьные триграммы
+    хэшируются со знаком в dimensions корзин, частоты логарифмируются, вектор L2-нормируется.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, count in _features(text).items():
+        index, sign = _bucket(feature, dimensions)
+        vector[index] += sign * (1.0 + math.log(count) if count > 1 else count)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+
+class HashingEmbeddings:
+    """
+    Локальная замена клиента OpenAI для embeddings.create (embeddings.provider: hashing).
+
+    Качество ниже настоящей модели, но векторы воспроизводимы и не требуют сети,
+    поэтому бенчмарки поиска и тесты можно гонять офлайн и в CI.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self.embeddings = self
+
+    async def create(self, model: str, input: List[str], dimensions: int | None = None) -> SimpleNamespace:
+        size = dimensions or self.dimensions
+        return SimpleNamespace(
+            model=model,
+            data=[SimpleNamespace(index=i, embedding=hashing_embedding(text, size)) for i, text in enumerate(input)],
+        )
@@ -0,0 +1,449 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from qdrant_client.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchAny,
+    MatchValue,
+    Modifier,
+    OptimizersConfigDiff,
+    PointIdsList,
+    PointStruct,
+    SparseVectorParams,
+)
+
+from services.answer_cache import answer_cache
+from services.chunk_files import batched, chunk_point_id, iter_chunks
+from services.chunk_ids import content_hash
+from services.chunk_metadata import PAYLOAD_INDEXES, chunk_payload
+from services.collection_profiles import CollectionProfile, get_collection_profile
+from services.qdrant_service import QdrantService, qdrant_service
+from services.sparse_encoder import SPARSE_VECTOR_NAME
+from utils.config import CONFIG
+from utils.logger import get_logger
+
+logger = get_logger("IngestionService")
+
+# Значение indexing_threshold по умолчанию в Qdrant (КБ); 0 отключает построение HNSW на время загрузки
+DEFAULT_INDEXING_THRESHOLD = 20000
+_VERSION_SUFFIX_RE = re.compile(r"__v(\d{8}T\d{6})$")
+
+
+def chunk_content_hash(chunk: Dict[str, Any]) -> str:
+    return chunk.get("content_hash") or content_hash(chunk["text"])
+
+
+def iter_chunk_set(path: str | Path, seen: set[str] | None = None) -> Iterator[Dict[str, Any]]:
+    """Чанки файла с payload chunk_set = имя файла и content_hash; id точек складываются в seen."""
+    chunk_set = Path(path).stem
+    for chunk in iter_chunks(path):
+        chunk["chunk_set"] = chunk_set
+        chunk["content_hash"] = chunk_content_hash(chunk)
+        if seen is not None:
+            seen.add(chunk_point_id(chunk))
+        yield chunk
+
+
+class IngestionStats:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.read = 0
+        self.skipped = 0
+        self.upserted = 0
+        self.deleted = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return (self.upserted + self.skipped) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"прочитано {self.read}, загружено {self.upserted}, пропущено {self.skipped}, удалено {self.deleted}, "
+            f"{self.elapsed:.1f} с, {self.throughput:.1f} чанков/с"
+        )
+
+
+class IngestionService:
+    """
+    Загрузка чанков в Qdrant: батчевый эмбеддинг и параллельный upsert.
+
+    Одновременно в работе не больше parallel батчей, поэтому чтение файла
+    не убегает вперёд эмбеддинга и загрузки. Id точек детерминированы по chunk_uid,
+    так что прерванную загрузку можно перезапустить: уже загруженные точки пропускаются.
+    В payload добавляются category, source_type и date, по ним и по document_id
+    строятся payload-индексы для фильтрованного поиска.
+    """
+
+    def __init__(self, qdrant: QdrantService):
+        self.qdrant = qdrant
+        self._collection_lock = asyncio.Lock()
+        self._ready_collections: set[str] = set()
+        self._profiles: Dict[str, CollectionProfile] = {}
+        self._bulk_collections: set[str] = set()
+
+    async def prepare_collection(self, collection_name: str, recreate: bool = False, profile: str | None = None):
+        async with self._collection_lock:
+            # Профиль действует только при создании коллекции, у существующей он уже зафиксирован
+            self._profiles[collection_name] = get_collection_profile(profile or CONFIG.qdrant.profile)
+            client = self.qdrant.client
+            exists = await client.collection_exists(collection_name)
+            if exists and recreate and await self.alias_target(collection_name):
+                raise ValueError(f"{collection_name} - алиас, пересоздание выполняется через reindex")
+            if exists and recreate:
+                logger.info(f"Удаляем коллекцию {collection_name} перед пересозданием")
+                await client.delete_collection(collection_name)
+                exists = False
+
+            if exists:
+                # Коллекции, созданные до появления фильтров, получают недостающие индексы
+                await self.ensure_payload_indexes(collection_name)
+                self._ready_collections.add(collection_name)
+            else:
+                self._ready_collections.discard(collection_name)
+
+    async def ensure_collection(self, collection_name: str, vector_size: int):
+        async with self._collection_lock:
+            if collection_name in self._ready_collections:
+                return
+
+            if not await self.qdrant.client.collection_exists(collection_name):
+                profile = self._profiles.get(collection_name) or get_collection_profile(CONFIG.qdrant.profile)
+                await self.qdrant.client.create_collection(
+                    collection_name=collection_name,
+                    vectors_config=profile.vectors_config(vector_size),
+                    # IDF для BM25 считает Qdrant по всей коллекции
+                    sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)},
+                    optimizers_config=OptimizersConfigDiff(indexing_threshold=0) if collection_name in self._bulk_collections else None,
+                )
+                logger.info(
+                    f"Создана коллекция {collection_name} (size={vector_size}, distance=cosine, sparse={SPARSE_VECTOR_NAME}, profile={profile.name})"
+                )
+                await self.ensure_payload_indexes(collection_name)
+
+            self._ready_collections.add(collection_name)
+
+    async def ensure_payload_indexes(self, collection_name: str):
+        info = await self.qdrant.client.get_collection(collection_name)
+        existing = info.payload_schema or {}
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in existing:
+                await self.qdrant.client.create_payload_index(collection_name, field_name=field_name, field_schema=schema, wait=True)
+                logger.info(f"{collection_name}: создан payload-индекс {field_name} ({schema.value})")
+
+    async def ingest_chunks(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        collection_name: str | None = None,
+        batch_size: int | None = None,
+        parallel: int | None = None,
+        recreate: bool = False,
+        existing: Dict[str, str] | None = None,
+        profile: str | None = None,
+    ) -> IngestionStats:
+        collection_name = collection_name or CONFIG.qdrant.collection
+        batch_size = batch_size or CONFIG.ingestion.batch_size
+        parallel = parallel or CONFIG.ingestion.parallel
+
+        await self.prepare_collection(collection_name, recreate=recreate, profile=profile)
+
+        stats = IngestionStats()
+        # Не больше parallel батчей в работе: чтение ждёт, пока освободится слот
+        semaphore = asyncio.Semaphore(parallel)
+        tasks: set[asyncio.Task] = set()
+        errors: list[Exception] = []
+
+        async def run(batch: List[Dict[str, Any]]):
+            try:
+                await self._ingest_batch(collection_name, batch, stats, existing)
+            except Exception as e:
+                logger.error(f"Ошибка загрузки батча в {collection_name}: {e}")
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        try:
+            for batch in batched(chunks, batch_size):
+                await semaphore.acquire()
+                if errors:
+                    semaphore.release()
+                    break
+                stats.read += len(batch)
+                task = asyncio.create_task(run(batch))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        if errors:
+            raise errors[0]
+
+        if stats.upserted:
+            await self.invalidate_answers(collection_name)
+
+        logger.info(f"Загрузка в {collection_name} завершена: {stats}")
+        return stats
+
+    async def ingest_file(self, path: str | Path, **kwargs) -> IngestionStats:
+        logger.info(f"Загрузка чанков из {path}")
+        return await self.ingest_chunks(iter_chunks(path), **kwargs)
+
+    async def sync_file(self, path: str | Path, collection_name: str | None = None, **kwargs) -> IngestionStats:
+        """
+        Инкрементальная переиндексация набора чанков.
+
+        Сравнивает чанки файла с тем, что уже лежит в коллекции для этого набора
+        (payload chunk_set = имя файла), эмбеддит и загружает только новые и изменённые
+        чанки и удаляет исчезнувшие.
+        """
+        collection_name = collection_name or CONFIG.qdrant.collection
+        chunk_set = Path(path).stem
+        await self.prepare_collection(collection_name, recreate=kwargs.pop("recreate", False), profile=kwargs.get("profile"))
+
+        existing = await self.scroll_content_hashes(collection_name, chunk_set)
+        logger.info(f"Синхронизация {path} -> {collection_name}: в коллекции {len(existing)} чанков набора {chunk_set}")
+
+        seen: set[str] = set()
+        stats = await self.ingest_chunks(iter_chunk_set(path, seen), collection_name=collection_name, existing=existing, **kwargs)
+
+        stats.deleted = await self.delete_points(collection_name, [point_id for point_id in existing if point_id not in seen])
+        if stats.deleted:
+            await self.invalidate_answers(collection_name)
+
+        logger.info(f"Синхронизация {chunk_set} завершена: {stats}")
+        return stats
+
+    async def reindex_files(self, paths: List[str | Path], alias: str | None = None, profile: str | None = None, **kwargs) -> IngestionStats:
+        """
+        Blue/green переиндексация: файлы загружаются в новую версию коллекции <alias>__v<время>,
+        после чего алиас атомарно переключается на неё. Поиск всё это время читает старую версию.
+
+        На время загрузки HNSW не строится (indexing_threshold=0), индекс строится один раз
+        в конце, и алиас переключается только после того, как оптимизатор закончил работу.
+        """
+        alias = alias or CONFIG.qdrant.collection
+        collection_name = f"{alias}__v{datetime.now(timezone.utc):%Y%m%dT%H%M%S}"
+        if await self.qdrant.client.collection_exists(alias) and not await self.alias_target(alias):
+            raise ValueError(f"{alias} - обычная коллекция, а не алиас; удалите или переименуйте её перед reindex")
+
+        logger.info(f"Переиндексация {alias}: загрузка в {collection_name}")
+        self._bulk_collections.add(collection_name)
+        total = IngestionStats()
+        try:
+            for path in paths:
+                # Чанки помечаются набором, как в sync_file, чтобы новую версию можно было дальше синхронизировать
+                stats = await self.ingest_chunks(iter_chunk_set(path), collection_name=collection_name, profile=profile, **kwargs)
+                total.read += stats.read
+                total.upserted += stats.upserted
+                total.skipped += stats.skipped
+        except BaseException:
+            logger.error(f"Переиндексация {alias} прервана, удаляем недостроенную {collection_name}")
+            await self.qdrant.client.delete_collection(collection_name)
+            raise
+        finally:
+            self._bulk_collections.discard(collection_name)
+
+        if not await self.qdrant.client.collection_exists(collection_name):
+            raise ValueError(f"В файлах {paths} нет чанков, алиас {alias} не переключён")
+
+        await self.qdrant.client.update_collection(
+            collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=DEFAULT_INDEXING_THRESHOLD)
+        )
+        await self.wait_for_optimizers(collection_name)
+        await self.switch_alias(alias, collection_name)
+        await self.invalidate_answers(alias)
+        await self.collect_garbage(alias)
+
+        logger.info(f"Переиндексация {alias} завершена: {total}")
+        return total
+
+    async def invalidate_answers(self, collection_name: str):
+        """
+        Сбрасывает кэш ответов, если изменилась коллекция, по которой отвечает агент:
+        CONFIG.qdrant.collection или версия, на которую указывает этот алиас.
+        Загрузки в прочие коллекции (бенчмарки, недостроенные версии) кэш не трогают.
+        """
+        live = CONFIG.qdrant.collection
+        if collection_name == live or collection_name == await self.alias_target(live):
+            # Корпус изменился - ранее закэшированные ответы могли устареть
+            answer_cache.invalidate()
+
+    async def alias_target(self, alias: str) -> str | None:
+        aliases = await self.qdrant.client.get_aliases()
+        return next((a.collection_name for a in aliases.aliases if a.alias_name == alias), None)
+
+    async def switch_alias(self, alias: str, collection_name: str):
+        previous = await self.alias_target(alias)
+        operations = [CreateAliasOperation(create_alias=CreateAlias(collection_name=collection_name, alias_name=alias))]
+        if previous:
+            # Удаление и создание в одном запросе применяются атомарно
+            operations.insert(0, DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+        await self.qdrant.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Алиас {alias}: {previous or '-'} -> {collection_name}")
+
+    async def collection_versions(self, alias: str) -> List[tuple[datetime, str]]:
+        """Версии коллекции алиаса от старых к новым."""
+        collections = await self.qdrant.client.get_collections()
+        versions = []
+        for collection in collections.collections:
+            match = _VERSION_SUFFIX_RE.search(collection.name)
+            if match and collection.name[: match.start()] == alias:
+                created_at = datetime.strptime(match.group(1), "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+                versions.append((created_at, collection.name))
+        return sorted(versions)
+
+    async def collect_garbage(self, alias: str | None = None, grace_seconds: int | None = None) -> List[str]:
+        """
+        Удаляет старые версии коллекции алиаса.
+
+        Версия считается выведенной из работы с момента создания следующей за ней и удаляется,
+        если с тех пор прошло больше grace_seconds. Текущая версия и более новые
+        (например, ещё загружаемые) не удаляются никогда.
+        """
+        alias = alias or CONFIG.qdrant.collection
+        grace_seconds = CONFIG.ingestion.version_grace_seconds if grace_seconds is None else grace_seconds
+        live = await self.alias_target(alias)
+        versions = await self.collection_versions(alias)
+        names = [name for _, name in versions]
+        if live not in names:
+            return []
+
+        now = datetime.now(timezone.utc)
+        deleted = []
+        for (_, name), (superseded_at, _) in zip(versions[: names.index(live)], versions[1 : names.index(live) + 1], strict=True):
+            if (now - superseded_at).total_seconds() > grace_seconds:
+                await self.qdrant.client.delete_collection(name)
+                self._ready_collections.discard(name)
+                deleted.append(name)
+                logger.info(f"Удалена старая версия {name} алиаса {alias}")
+        return deleted
+
+    async def wait_for_optimizers(self, collection_name: str, timeout: float = 3600, poll_interval: float = 1):
+        deadline = time.monotonic() + timeout
+        green_polls = 0
+        while True:
+            info = await self.qdrant.client.get_collection(collection_name)
+            # Статус меняется не сразу после смены конфигурации, поэтому ждём два зелёных опроса подряд
+            green_polls = green_polls + 1 if info.status == CollectionStatus.GREEN else 0
+            if green_polls >= 2:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Оптимизация коллекции {collection_name} не завершилась за {timeout} с")
+            await asyncio.sleep(poll_interval)
+
+    async def delete_documents(self, collection_name: str, document_ids: Iterable[str]):
+        """Удаляет все чанки перечисленных документов."""
+        document_ids = list(document_ids)
+        if not document_ids:
+            return
+        points_filter = Filter(must=[FieldCondition(key="document_id", match=MatchAny(any=document_ids))])
+        await self.qdrant.client.delete(collection_name, points_selector=FilterSelector(filter=points_filter), wait=True)
+        logger.info(f"{collection_name}: удалены чанки {len(document_ids)} документов")
+
+    async def delete_points(self, collection_name: str, point_ids: List[str]) -> int:
+        """Удаляет точки по id пачками; возвращает их число."""
+        for ids in batched(point_ids, 1000):
+            await self.qdrant.client.delete(collection_name, points_selector=PointIdsList(points=ids), wait=True)
+        return len(point_ids)
+
+    async def scroll_content_hashes(self, collection_name: str, chunk_set: str) -> Dict[str, str]:
+        payloads = await self.scroll_chunk_set(collection_name, chunk_set, ["content_hash"])
+        return {point_id: payload.get("content_hash", "") for point_id, payload in payloads.items()}
+
+    async def scroll_chunk_set(self, collection_name: str, chunk_set: str, fields: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Поля payload всех точек набора чанков по id точки."""
+        payloads: Dict[str, Dict[str, Any]] = {}
+        if collection_name not in self._ready_collections:
+            return payloads
+
+        scroll_filter = Filter(must=[FieldCondition(key="chunk_set", match=MatchValue(value=chunk_set))])
+        offset = None
+        while True:
+            points, offset = await self.qdrant.client.scroll(
+                collection_name,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=fields,
+                with_vectors=False,
+            )
+            for point in points:
+                payloads[str(point.id)] = point.payload or {}
+            if offset is None:
+                return payloads
+
+    async def _ingest_batch(
+        self,
+        collection_name: str,
+        batch: List[Dict[str, Any]],
+        stats: IngestionStats,
+        existing: Dict[str, str] | None = None,
+    ):
+        ids, batch = await self.select_new_chunks(collection_name, batch, stats, existing)
+        if not batch:
+            return
+        vectors = await self.qdrant.get_embeddings([chunk["text"] for chunk in batch])
+        await self.upsert_chunks(collection_name, ids, batch, vectors, stats)
+
+    async def select_new_chunks(
+        self,
+        collection_name: str,
+        batch: List[Dict[str, Any]],
+        stats: IngestionStats,
+        existing: Dict[str, str] | None = None,
+    ) -> tuple[List[str], List[Dict[str, Any]]]:
+        """Id точек и чанки батча, которых ещё нет в коллекции; остальные учитываются в stats.skipped."""
+        ids = [chunk_point_id(chunk) for chunk in batch]
+
+        if existing is not None:
+            # Состояние коллекции уже известно: пропускаем чанки с тем же id и тем же содержимым
+            pairs = [(point_id, chunk) for point_id, chunk in zip(ids, batch, strict=True) if existing.get(point_id) != chunk_content_hash(chunk)]
+        elif collection_name in self._ready_collections:
+            existing_points = await self.qdrant.client.retrieve(collection_name, ids=ids, with_payload=False, with_vectors=False)
+            existing_ids = {str(point.id) for point in existing_points}
+            pairs = [(point_id, chunk) for point_id, chunk in zip(ids, batch, strict=True) if point_id not in existing_ids]
+        else:
+            return ids, batch
+
+        stats.skipped += len(batch) - len(pairs)
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+
+    async def upsert_chunks(
+        self,
+        collection_name: str,
+        ids: List[str],
+        batch: List[Dict[str, Any]],
+        vectors: List[List[float]],
+        stats: IngestionStats,
+    ):
+        await self.ensure_collection(collection_name, len(vectors[0]))
+
+        encoder = self.qdrant.sparse_encoder
+        points = [
+            PointStruct(id=point_id, vector={"": vector, SPARSE_VECTOR_NAME: encoder.encode_document(chunk["text"])}, payload=chunk_payload(chunk))
+            for point_id, vector, chunk in zip(ids, vectors, batch, strict=True)
+        ]
+        await self.qdrant.client.upsert(collection_name=collection_name, points=points, wait=True)
+
+        stats.upserted += len(points)
+        logger.info(f"{collection_name}: {stats}")
+
+
+ingestion_service = IngestionService(qdrant_service)
@@ -1,15 +1,38 @@
+import asyncio
 from typing import List, Dict, Any
 
+import numpy as np
 from openai import AsyncOpenAI
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, ScoredPoint
+from qdrant_client.models import ScoredPoint, SparseVector
 
+from services.chunk_metadata import SearchFilters
+from services.collection_profiles import search_params
+from services.context_expansion import NeighbourExpander
+from services.embedding_batcher import EmbeddingBatcher
+from services.diversification import diversify as diversify_documents
+from services.embedding_cache import EmbeddingCache
+from services.hashing_embeddings import HASHING_MODEL, HashingEmbeddings
+from services.sparse_encoder import SparseEncoder, reciprocal_rank_fusion
+from services.vector_backends import LocalVectorBackend, RemoteQdrantBackend, VectorBackend
 from utils.config import CONFIG
 from utils.logger import get_logger
 
 logger = get_logger("QdrantService")
 
 
+def truncate_embeddings(vectors: List[List[float]], dimensions: int) -> List[List[float]]:
+    """
+    Первые dimensions компонент с повторной L2-нормировкой.
+
+    У text-embedding-3-* это эквивалентно параметру dimensions API, поэтому
+    уменьшенные векторы получаются из закэшированных полных без новых запросов.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix.tolist()
+
+
 class QdrantService:
 
     def __init__(self):
@@ -18,45 +41,98 @@ class QdrantService:
             port=CONFIG.qdrant.port,
             api_key=CONFIG.qdrant.api_key if CONFIG.qdrant.api_key else None,
         )
-        self.embeddings_client = AsyncOpenAI(
+        self.embeddings_client, self.embeddings_model = self._create_embeddings_client()
+        # Либо API сразу отдаёт укороченные векторы, либо запрашиваем полные и усекаем локально
+        self.truncate_dimensions = CONFIG.embeddings.dimensions if CONFIG.embeddings.truncate_locally else 0
+        api_dimensions = 0 if CONFIG.embeddings.truncate_locally else CONFIG.embeddings.dimensions
+        # Векторы разной размерности от API не должны смешиваться в кэше
+        self.embeddings_cache_model = f"{self.embeddings_model}@{api_dimensions}" if api_dimensions else self.embeddings_model
+        self.embedding_batcher = EmbeddingBatcher(
+            client=self.embeddings_client,
+            model=self.embeddings_model,
+            flush_window_ms=CONFIG.embeddings.batch_flush_ms,
+            max_batch_size=CONFIG.embeddings.batch_max_size,
+            dimensions=api_dimensions,
+        )
+        self.embedding_cache = EmbeddingCache(
+            memory_size=CONFIG.embeddings.cache_memory_size,
+            path=CONFIG.embeddings.cache_path,
+            max_rows=CONFIG.embeddings.cache_max_rows,
+        )
+        self.sparse_encoder = SparseEncoder()
+        self.backend = self._create_backend()
+        self.neighbour_expander = NeighbourExpander(
+            fetch=self.backend.fetch_chunks,
+            token_budget=CONFIG.search.expansion_token_budget,
+            max_neighbours=CONFIG.search.expansion_neighbours,
+        )
+
+    @staticmethod
+    def _create_embeddings_client() -> tuple[AsyncOpenAI | HashingEmbeddings, str]:
+        if CONFIG.embeddings.provider == "hashing":
+            logger.info("Используются локальные хэширующие эмбеддинги")
+            return HashingEmbeddings(), HASHING_MODEL
+        client = AsyncOpenAI(
             api_key=CONFIG.embeddings.api_key,
             base_url=CONFIG.embeddings.base_url,
         )
-        self.embeddings_model = CONFIG.embeddings.model
+        return client, CONFIG.embeddings.model
+
+    def _create_backend(self) -> VectorBackend:
+        if CONFIG.qdrant.backend == "local":
+            local = CONFIG.qdrant.local
+            logger.info(f"Используется локальный векторный индекс в {local.path}")
+            return LocalVectorBackend(
+                path=local.path,
+                sparse_encoder=self.sparse_encoder,
+                embed=self.get_embeddings,
+                sources=local.sources,
+                ivf_threshold=local.ivf_threshold,
+                ivf_nprobe=local.ivf_nprobe,
+            )
+        return RemoteQdrantBackend(self.client)
 
     async def get_embedding(self, text: str) -> List[float]:
+        return (await self.get_embeddings([text]))[0]
+
+    async def get_embeddings(self, texts: List[str], truncate: bool = True) -> List[List[float]]:
+        """Эмбеддинги в размерности из конфига; truncate=False - без локального усечения."""
         try:
-            response = await self.embeddings_client.embeddings.create(
-                model=self.embeddings_model,
-                input=text,
-            )
-            return response.data[0].embedding
+            vectors = await asyncio.to_thread(self.embedding_cache.get_many, self.embeddings_cache_model, texts)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                embedded = await asyncio.gather(*(self.embedding_batcher.embed(text) for text in missing_texts))
+                await asyncio.to_thread(self.embedding_cache.put_many, self.embeddings_cache_model, missing_texts, embedded)
+                for i, vector in zip(missing, embedded, strict=True):
+                    vectors[i] = vector
+            if truncate and self.truncate_dimensions and vectors:
+                return truncate_embeddings(vectors, self.truncate_dimensions)
+            # Кэш отдаёт float32-массивы, наружу уходят списки
+            return [vector.tolist() if isinstance(vector, np.ndarray) else vector for vector in vectors]
         except Exception as e:
             logger.error(f"Ошибка при получении эмбединга: {e}")
             raise
 
     async def search(
-        self, collection_name: str, query: str, limit: int = 5
+        self,
+        collection_name: str,
+        query: str,
+        limit: int = 5,
+        hybrid: bool | None = None,
+        diversify: bool | None = None,
+        filters: SearchFilters | None = None,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        expand: bool | None = None,
     ) -> List[Dict[str, Any]]:
         try:
-            query_embedding = await self.get_embedding(query)
-
-            results: List[ScoredPoint] = await self.client.search(
-                collection_name=collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-            )
-
-            documents = []
-            for result in results:
-                documents.append({
-                    "id": result.id,
-                    "score": result.score,
-                    "text": result.payload.get("text", ""),
-                    "metadata": {
-                        k: v for k, v in result.payload.items() if k != "text"
-                    },
-                })
+            documents = (
+                await self._search_batch(
+                    collection_name, [query], limit, hybrid=hybrid, diversify=diversify, filters=filters, hnsw_ef=hnsw_ef, oversampling=oversampling
+                )
+            )[0]
+            documents = await self._expand(collection_name, documents, expand)
 
             logger.info(f"Найдено {len(documents)} документов в коллекции {collection_name}")
             return documents
@@ -65,5 +141,139 @@ class QdrantService:
             logger.error(f"Ошибка при поиске документов: {e}")
             raise
 
+    async def search_many(
+        self,
+        collection_name: str,
+        queries: List[str],
+        limit: int = 5,
+        hybrid: bool | None = None,
+        diversify: bool | None = None,
+        filters: SearchFilters | None = None,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        expand: bool | None = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Поиск по нескольким запросам: один запрос эмбеддингов и один пакетный запрос к Qdrant."""
+        try:
+            results = await self._search_batch(
+                collection_name, queries, limit, hybrid=hybrid, diversify=diversify, filters=filters, hnsw_ef=hnsw_ef, oversampling=oversampling
+            )
+            results = [await self._expand(collection_name, documents, expand) for documents in results]
+
+            logger.info(f"Пакетный поиск по {len(queries)} запросам в коллекции {collection_name}: {[len(r) for r in results]}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном поиске документов: {e}")
+            raise
+
+    async def search_many_fused(
+        self,
+        collection_name: str,
+        queries: List[str],
+        limit: int = 5,
+        hybrid: bool | None = None,
+        diversify: bool | None = None,
+        filters: SearchFilters | None = None,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        expand: bool | None = None,
+    ) -> List[Dict[str, Any]]:
+        """То же, что search_many, но результаты всех запросов слиты через RRF в один список без дублей."""
+        results = await self.search_many(
+            collection_name,
+            queries,
+            limit,
+            hybrid=hybrid,
+            diversify=diversify,
+            filters=filters,
+            hnsw_ef=hnsw_ef,
+            oversampling=oversampling,
+            expand=False,
+        )
+        # Соседей добавляем после слияния, чтобы окна разных запросов не пересекались
+        return await self._expand(collection_name, reciprocal_rank_fusion(results, k=CONFIG.search.rrf_k, limit=limit), expand)
+
+    async def _expand(self, collection_name: str, documents: List[Dict[str, Any]], expand: bool | None) -> List[Dict[str, Any]]:
+        if not (CONFIG.search.expand_neighbours if expand is None else expand):
+            return documents
+        return await self.neighbour_expander.expand(collection_name, documents)
+
+    async def _search_batch(
+        self,
+        collection_name: str,
+        queries: List[str],
+        limit: int,
+        hybrid: bool | None = None,
+        diversify: bool | None = None,
+        filters: SearchFilters | None = None,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+    ) -> List[List[Dict[str, Any]]]:
+        hybrid = CONFIG.search.hybrid if hybrid is None else hybrid
+        diversify = CONFIG.search.diversify if diversify is None else diversify
+        params = search_params(
+            hnsw_ef=CONFIG.search.hnsw_ef if hnsw_ef is None else hnsw_ef,
+            oversampling=CONFIG.search.oversampling if oversampling is None else oversampling,
+        )
+        if not queries:
+            return []
+
+        embeddings = await self.get_embeddings(queries)
+        requests: List[List[float] | SparseVector] = list(embeddings)
+        sparse_owners = []
+        if hybrid:
+            # BM25-запросы уходят в тот же пакет, что и плотные, затем сливаются через RRF
+            for i, query in enumerate(queries):
+                sparse_vector = self.sparse_encoder.encode_query(query)
+                if sparse_vector.indices:
+                    sparse_owners.append(i)
+                    requests.append(sparse_vector)
+
+        # Для MMR нужен запас кандидатов, из которых выбираются limit разнообразных
+        candidates = limit
+        if hybrid:
+            candidates = max(candidates, CONFIG.search.hybrid_candidates)
+        if diversify:
+            candidates = max(candidates, CONFIG.search.diversify_candidates)
+        results = await self.backend.search_batch(collection_name, requests, candidates, with_vectors=diversify, filters=filters, params=params)
+
+        ranked = [[self._to_document(point) for point in points] for points in results[: len(queries)]]
+        if hybrid:
+            sparse: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for owner, points in zip(sparse_owners, results[len(queries) :], strict=True):
+                sparse[owner] = [self._to_document(point) for point in points]
+            ranked = [reciprocal_rank_fusion([d, s], k=CONFIG.search.rrf_k) for d, s in zip(ranked, sparse, strict=True)]
+
+        if not diversify:
+            return [documents[:limit] for documents in ranked]
+
+        vectors = {point.id: self._dense_vector(point) for points in results for point in points}
+        return [
+            diversify_documents(
+                documents,
+                [vectors[document["id"]] for document in documents],
+                limit=limit,
+                mmr_lambda=CONFIG.search.mmr_lambda,
+                dedup_threshold=CONFIG.search.dedup_threshold,
+            )
+            for documents in ranked
+        ]
+
+    @staticmethod
+    def _dense_vector(point: ScoredPoint) -> List[float]:
+        return point.vector.get("") if isinstance(point.vector, dict) else point.vector
+
+    @staticmethod
+    def _to_document(result: ScoredPoint) -> Dict[str, Any]:
+        return {
+            "id": result.id,
+            "score": result.score,
+            "text": result.payload.get("text", ""),
+            "metadata": {
+                k: v for k, v in result.payload.items() if k != "text"
+            },
+        }
+
 
 qdrant_service = QdrantService()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client.models import SparseVector
+
+SPARSE_VECTOR_NAME = "bm25"
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+(?:[-./][0-9a-zа-я]+)*")
+_CYRILLIC_WORD_RE = re.compile(r"[а-я]+")
+
+# Окончания для лёгкого стемминга: "стипендия"/"стипендии"/"стипендию" -> "стипенд"
+_RU_ENDINGS = sorted(
+    [
+        "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ого", "его", "ому", "ему", "ыми", "ими",
+        "ая", "яя", "ое", "ее", "ие", "ые", "ой", "ей", "ий", "ый", "ую", "юю", "ам", "ям", "ах", "ях",
+        "ом", "ем", "ов", "ев", "ию", "ия", "ии", "ть", "ся", "сь",
+        "а", "я", "о", "е", "и", "ы", "у", "ю", "ь", "й",
+    ],
+    key=len,
+    reverse=True,
+)
+_MIN_STEM_LEN = 4
+
+
+def _stem(word: str) -> str:
+    if not _CYRILLIC_WORD_RE.fullmatch(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM_LEN:
+            return word[: -len(ending)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Токенизация с учётом русского языка и кодов вида "ИВТ-21", "№ 05-145/23".
+
+    Составной токен сохраняется целиком (для точного совпадения) и дополнительно
+    разбивается на части, слова на кириллице приводятся к основе.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower().replace("ё", "е")):
+        token = match.group()
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.append(token)
+        tokens.extend(_stem(part) for part in parts if part)
+    return tokens
+
+
+def _token_index(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class SparseEncoder:
+    """
+    BM25-векторы для именованного sparse-вектора Qdrant.
+
+    В документе хранится насыщенная частота терма с нормировкой на длину,
+    IDF считает сам Qdrant (Modifier.IDF в конфигурации коллекции),
+    поэтому в запросе каждый терм имеет вес 1.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_len: float = 256):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_len = avg_doc_len
+
+    def encode_document(self, text: str) -> SparseVector:
+        tokens = tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_len)
+        weights: dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            index = _token_index(token)
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return SparseVector(indices=list(weights), values=list(weights.values()))
+
+    def encode_query(self, text: str) -> SparseVector:
+        indices = sorted({_token_index(token) for token in tokenize(text)})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], k: int = 60, limit: int | None = None) -> list[dict]:
+    """Объединяет ранжированные списки документов по id: score = сумма 1 / (k + rank)."""
+    scores: dict = {}
+    documents: dict = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            doc_id = document["id"]
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(doc_id, document)
+
+    fused = []
+    for doc_id in sorted(scores, key=scores.get, reverse=True)[:limit]:
+        fused.append({**documents[doc_id], "score": scores[doc_id]})
+    return fused
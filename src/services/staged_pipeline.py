@@ -0,0 +1,215 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Callable, Iterable, List
+
+from utils.logger import get_logger
+
+logger = get_logger("StagedPipeline")
+
+# Конец потока: каждый воркер стадии получает свой маркер
+_END = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    executor: str | None = None  # None - корутина в event loop, "thread"/"process" - синхронная функция в пуле
+    batch_size: int = 0  # > 0: func получает список до batch_size элементов
+    flatten: bool = False  # func возвращает несколько элементов, дальше они идут по одному
+    ignore_errors: bool = True  # ошибка элемента логируется и он отбрасывается; иначе конвейер останавливается
+
+
+class StageCounters:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0  # суммарное время обработки по всем воркерам
+        self.waiting_output = 0.0  # сколько воркеры ждали места в очереди следующей стадии
+
+    def utilisation(self, elapsed: float) -> float:
+        return self.busy / (self.workers * elapsed) if elapsed else 0.0
+
+    def format(self, elapsed: float, queue: asyncio.Queue | None = None) -> str:
+        rate = self.items_out / elapsed if elapsed else 0.0
+        line = f"{self.name}: {self.items_in} -> {self.items_out} ({rate:.1f}/с), занятость {self.utilisation(elapsed):.0%}"
+        if queue is not None:
+            line += f", очередь {queue.qsize()}/{queue.maxsize}"
+        if self.waiting_output:
+            line += f", ждали следующую стадию {self.waiting_output:.1f} с"
+        if self.errors:
+            line += f", ошибок {self.errors}"
+        return line
+
+
+class PipelineStats:
+    def __init__(self, counters: List[StageCounters]):
+        self.started_at = time.monotonic()
+        self.counters = counters
+        self.finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def bottleneck(self) -> StageCounters:
+        # Узкое место - стадия, воркеры которой дольше всех были заняты работой
+        return max(self.counters[1:] or self.counters, key=lambda counters: counters.utilisation(self.elapsed))
+
+    def __getitem__(self, name: str) -> StageCounters:
+        return next(counters for counters in self.counters if counters.name == name)
+
+    def __str__(self):
+        lines = [counters.format(self.elapsed) for counters in self.counters]
+        lines.append(f"{self.elapsed:.1f} с, узкое место: {self.bottleneck.name}")
+        return "\n".join(lines)
+
+
+class StagedPipeline:
+    """
+    Потоковый конвейер из стадий с ограниченными очередями между ними.
+
+    Источник и каждая стадия работают параллельно: у стадии workers воркеров, которые
+    берут элементы из своей входной очереди и кладут результаты во входную очередь
+    следующей. Очереди ограничены queue_size, поэтому быстрая стадия упирается в медленную
+    и память не растёт с размером корпуса. Для каждой стадии считаются элементы на входе
+    и выходе, занятость воркеров и ожидание следующей стадии; раз в report_interval секунд
+    они пишутся в лог, так что узкое место видно по ходу загрузки.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 64, report_interval: float = 10):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.report_interval = report_interval
+
+    async def run(self, source: Iterable[Any] | AsyncIterable[Any], source_name: str = "source") -> PipelineStats:
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stats = PipelineStats([StageCounters(source_name, 1), *(StageCounters(stage.name, stage.workers) for stage in self.stages)])
+        executors = {i: self._create_executor(stage) for i, stage in enumerate(self.stages) if stage.executor}
+
+        tasks = [asyncio.create_task(self._feed(source, queues[0], self.stages[0].workers, stats.counters[0]))]
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            next_workers = self.stages[i + 1].workers if outbox is not None else 0
+            tasks.append(asyncio.create_task(self._run_stage(stage, stats.counters[i + 1], queues[i], outbox, next_workers, executors.get(i))))
+        reporter = asyncio.create_task(self._report(stats, queues))
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            reporter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, reporter, return_exceptions=True)
+            for executor in executors.values():
+                executor.shutdown(cancel_futures=True)
+            stats.finished_at = time.monotonic()
+
+        logger.info(f"Конвейер завершён:\n{stats}")
+        return stats
+
+    @staticmethod
+    def _create_executor(stage: Stage) -> Executor:
+        if stage.executor == "process":
+            return ProcessPoolExecutor(max_workers=stage.workers)
+        if stage.executor == "thread":
+            return ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name)
+        raise ValueError(f"Неизвестный executor стадии {stage.name}: {stage.executor}")
+
+    @staticmethod
+    async def _feed(source: Iterable[Any] | AsyncIterable[Any], queue: asyncio.Queue, workers: int, counters: StageCounters):
+        async def put(item: Any):
+            started = time.monotonic()
+            await queue.put(item)
+            counters.waiting_output += time.monotonic() - started
+            counters.items_in += 1
+            counters.items_out += 1
+
+        if isinstance(source, AsyncIterable):
+            async for item in source:
+                await put(item)
+        else:
+            for item in source:
+                await put(item)
+        for _ in range(workers):
+            await queue.put(_END)
+
+    async def _run_stage(
+        self,
+        stage: Stage,
+        counters: StageCounters,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue | None,
+        next_workers: int,
+        executor: Executor | None,
+    ):
+        await asyncio.gather(*(self._work(stage, counters, inbox, outbox, executor) for _ in range(stage.workers)))
+        # Все воркеры стадии закончили - передаём конец потока следующей
+        for _ in range(next_workers):
+            await outbox.put(_END)
+
+    @staticmethod
+    async def _take(inbox: asyncio.Queue, batch_size: int) -> tuple[Any, bool]:
+        """Следующий элемент (или батч) и признак конца потока."""
+        if not batch_size:
+            item = await inbox.get()
+            return (None, True) if item is _END else (item, False)
+        batch = []
+        while len(batch) < batch_size:
+            item = await inbox.get()
+            if item is _END:
+                return (batch or None), True
+            batch.append(item)
+        return batch, False
+
+    async def _work(self, stage: Stage, counters: StageCounters, inbox: asyncio.Queue, outbox: asyncio.Queue | None, executor: Executor | None):
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item, finished = await self._take(inbox, stage.batch_size)
+            if item is None:
+                continue
+            counters.items_in += len(item) if stage.batch_size else 1
+
+            started = time.monotonic()
+            try:
+                if executor is not None:
+                    result = await loop.run_in_executor(executor, stage.func, item)
+                else:
+                    result = await stage.func(item)
+            except Exception as e:
+                counters.errors += 1
+                if not stage.ignore_errors:
+                    raise
+                logger.warning(f"{stage.name}: элемент пропущен из-за ошибки: {e}")
+                result = None
+            finally:
+                counters.busy += time.monotonic() - started
+
+            outputs = [] if result is None else list(result) if stage.flatten else [result]
+            counters.items_out += len(outputs)
+            if outbox is not None and outputs:
+                started = time.monotonic()
+                for output in outputs:
+                    await outbox.put(output)
+                counters.waiting_output += time.monotonic() - started
+
+    async def _report(self, stats: PipelineStats, queues: List[asyncio.Queue]):
+        if self.report_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.report_interval)
+            lines = [stats.counters[0].format(stats.elapsed)]
+            lines += [counters.format(stats.elapsed, queue) for counters, queue in zip(stats.counters[1:], queues, strict=True)]
+            logger.info("Конвейер, " + f"{stats.elapsed:.0f} с:\n" + "\n".join(lines))
+
@@ -0,0 +1,379 @@
+import asyncio
+import math
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchValue,
+    NamedSparseVector,
+    Range,
+    ScoredPoint,
+    SearchParams,
+    SearchRequest,
+    SparseVector,
+)
+
+from services.chunk_files import batched, chunk_point_id, iter_chunk_files
+from services.chunk_metadata import SearchFilters, chunk_payload
+from services.chunk_store import ChunkStore, ChunkStoreWriter, is_chunk_store
+from services.sparse_encoder import SPARSE_VECTOR_NAME, SparseEncoder
+from utils.logger import get_logger
+
+logger = get_logger("VectorBackends")
+
+# Плотный вектор в коллекции безымянный, sparse-вектор для возврата не нужен
+DENSE_VECTOR_SELECTOR = [""]
+
+EmbedFunc = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class VectorBackend(ABC):
+    """Бэкенд векторного поиска, за которым стоит QdrantService."""
+
+    @abstractmethod
+    async def dense_search(
+        self,
+        collection_name: str,
+        vector: List[float],
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+        params: SearchParams | None = None,
+    ) -> List[ScoredPoint]:
+        ...
+
+    @abstractmethod
+    async def sparse_search(
+        self,
+        collection_name: str,
+        vector: SparseVector,
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+    ) -> List[ScoredPoint]:
+        ...
+
+    @abstractmethod
+    async def fetch_chunks(self, collection_name: str, document_id: Any, first: int, last: int) -> List[Dict[str, Any]]:
+        """Payload чанков документа с chunk_id от first до last включительно."""
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        vectors: List[List[float] | SparseVector],
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+        params: SearchParams | None = None,
+    ) -> List[List[ScoredPoint]]:
+        return await asyncio.gather(
+            *(
+                self.sparse_search(collection_name, vector, limit, with_vectors, filters)
+                if isinstance(vector, SparseVector)
+                else self.dense_search(collection_name, vector, limit, with_vectors, filters, params)
+                for vector in vectors
+            )
+        )
+
+
+class RemoteQdrantBackend(VectorBackend):
+    def __init__(self, client: AsyncQdrantClient):
+        self.client = client
+
+    async def dense_search(
+        self,
+        collection_name: str,
+        vector: List[float],
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+        params: SearchParams | None = None,
+    ) -> List[ScoredPoint]:
+        return await self.client.search(
+            collection_name=collection_name,
+            query_vector=vector,
+            query_filter=filters.to_qdrant() if filters else None,
+            search_params=params,
+            limit=limit,
+            with_vectors=DENSE_VECTOR_SELECTOR if with_vectors else False,
+        )
+
+    async def sparse_search(
+        self,
+        collection_name: str,
+        vector: SparseVector,
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+    ) -> List[ScoredPoint]:
+        return await self.client.search(
+            collection_name=collection_name,
+            query_vector=NamedSparseVector(name=SPARSE_VECTOR_NAME, vector=vector),
+            query_filter=filters.to_qdrant() if filters else None,
+            limit=limit,
+            with_vectors=DENSE_VECTOR_SELECTOR if with_vectors else False,
+        )
+
+    async def search_batch(
+        self,
+        collection_name: str,
+        vectors: List[List[float] | SparseVector],
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+        params: SearchParams | None = None,
+    ) -> List[List[ScoredPoint]]:
+        # Фильтр применяется внутри HNSW-поиска по payload-индексам, а не к готовой выдаче
+        query_filter = filters.to_qdrant() if filters else None
+        requests = [
+            SearchRequest(
+                vector=NamedSparseVector(name=SPARSE_VECTOR_NAME, vector=vector) if isinstance(vector, SparseVector) else vector,
+                filter=query_filter,
+                # hnsw_ef и oversampling относятся к плотному HNSW-индексу
+                params=None if isinstance(vector, SparseVector) else params,
+                limit=limit,
+                with_payload=True,
+                with_vector=DENSE_VECTOR_SELECTOR if with_vectors else False,
+            )
+            for vector in vectors
+        ]
+        return await self.client.search_batch(collection_name=collection_name, requests=requests)
+
+    async def fetch_chunks(self, collection_name: str, document_id: Any, first: int, last: int) -> List[Dict[str, Any]]:
+        points, _ = await self.client.scroll(
+            collection_name=collection_name,
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(key="document_id", match=MatchValue(value=document_id)),
+                    FieldCondition(key="chunk_id", range=Range(gte=first, lte=last)),
+                ]
+            ),
+            limit=last - first + 1,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [point.payload for point in points]
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    if limit >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, limit)[:limit]
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    """Приближённый индекс: k-means по векторам и поиск только в nprobe ближайших кластерах."""
+
+    def __init__(self, matrix: np.ndarray, nlist: int, nprobe: int, iterations: int = 10, seed: int = 0):
+        self.nprobe = min(nprobe, nlist)
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), size=min(len(matrix), nlist * 64), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self.centroids = centroids
+
+        assignment = np.concatenate([np.argmax(part @ centroids.T, axis=1) for part in np.array_split(matrix, max(1, len(matrix) // 65536))])
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        self.lists = [order[bounds[c] : bounds[c + 1]] for c in range(nlist)]
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        return np.concatenate([self.lists[c] for c in probes])
+
+
+class LocalCollection:
+    def __init__(self, path: Path, sparse_encoder: SparseEncoder, ivf_threshold: int, ivf_nprobe: int):
+        store = ChunkStore(path)
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        for payload in store:
+            self.ids.append(chunk_point_id(payload))
+            # Индексы, собранные до появления полей фильтрации, дополняются при загрузке
+            self.payloads.append(chunk_payload(payload))
+
+        # Матрица не читается в память целиком: ОС подгружает страницы по мере обращения
+        self.matrix: np.ndarray = store.embeddings if store.embeddings is not None else np.zeros((0, store.dim or 0), dtype=np.float32)
+
+        self.ivf: IVFIndex | None = None
+        if ivf_threshold and len(self.ids) >= ivf_threshold:
+            self.ivf = IVFIndex(self.matrix, nlist=int(math.sqrt(len(self.ids))), nprobe=ivf_nprobe)
+
+        self._masks: Dict[SearchFilters, np.ndarray] = {}
+        self._build_sparse_index(sparse_encoder)
+        self._rows = {(payload.get("document_id"), payload.get("chunk_id")): row for row, payload in enumerate(self.payloads)}
+
+    def _build_sparse_index(self, sparse_encoder: SparseEncoder):
+        postings: Dict[int, tuple[list[int], list[float]]] = {}
+        for row, payload in enumerate(self.payloads):
+            vector = sparse_encoder.encode_document(payload.get("text", ""))
+            for index, value in zip(vector.indices, vector.values, strict=True):
+                rows, weights = postings.setdefault(index, ([], []))
+                rows.append(row)
+                weights.append(value)
+
+        n = len(self.payloads)
+        self.postings = {}
+        for index, (rows, weights) in postings.items():
+            # Та же формула IDF, что и у Modifier.IDF в Qdrant
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            self.postings[index] = (np.asarray(rows, dtype=np.int64), np.asarray(weights, dtype=np.float32) * idf)
+
+    def mask(self, filters: SearchFilters | None) -> np.ndarray | None:
+        """Булева маска строк, подходящих под фильтр; кэшируется, так как фильтров немного."""
+        if filters is None or filters.is_empty():
+            return None
+        mask = self._masks.get(filters)
+        if mask is None:
+            mask = np.fromiter((filters.matches(payload) for payload in self.payloads), dtype=bool, count=len(self.payloads))
+            self._masks[filters] = mask
+        return mask
+
+    def dense_search(
+        self, vector: List[float], limit: int, with_vectors: bool = False, filters: SearchFilters | None = None, exact: bool = False
+    ) -> List[ScoredPoint]:
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        mask = self.mask(filters)
+        if mask is not None:
+            # Как и в Qdrant при фильтрации: точный перебор только подходящих строк
+            rows = np.flatnonzero(mask)
+            scores = np.asarray(self.matrix[rows] @ query)
+        elif self.ivf is not None and not exact:
+            rows = np.sort(self.ivf.candidates(query))
+            scores = np.asarray(self.matrix[rows] @ query)
+        else:
+            rows = np.arange(len(self.ids))
+            scores = np.asarray(self.matrix @ query)
+
+        return [self._point(int(rows[i]), float(scores[i]), with_vectors) for i in _top_k(scores, limit)]
+
+    def sparse_search(self, vector: SparseVector, limit: int, with_vectors: bool = False, filters: SearchFilters | None = None) -> List[ScoredPoint]:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for index, value in zip(vector.indices, vector.values, strict=True):
+            posting = self.postings.get(index)
+            if posting is not None:
+                scores[posting[0]] += posting[1] * value
+
+        mask = self.mask(filters)
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        matched = np.flatnonzero(scores)
+        top = matched[_top_k(scores[matched], limit)]
+        return [self._point(int(row), float(scores[row]), with_vectors) for row in top]
+
+    def fetch_chunks(self, document_id: Any, first: int, last: int) -> List[Dict[str, Any]]:
+        rows = (self._rows.get((document_id, chunk_id)) for chunk_id in range(first, last + 1))
+        return [self.payloads[row] for row in rows if row is not None]
+
+    def _point(self, row: int, score: float, with_vectors: bool = False) -> ScoredPoint:
+        vector = self.matrix[row].tolist() if with_vectors else None
+        return ScoredPoint(id=self.ids[row], version=0, score=score, payload=self.payloads[row], vector=vector)
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    Встроенный векторный индекс без внешних сервисов.
+
+    Коллекция - это хранилище чанков <path>/<collection> (services/chunk_store.py): payload
+    чанков в шардах JSONL и нормированная float32-матрица эмбеддингов, открываемая через mmap.
+    Поиск - полный перебор на NumPy; для больших коллекций (от ivf_threshold векторов)
+    используется приближённый IVF-индекс. BM25 считается по инвертированному индексу в памяти.
+    Если каталога коллекции нет, он собирается из файлов чанков sources.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sparse_encoder: SparseEncoder,
+        embed: EmbedFunc,
+        sources: List[str] | None = None,
+        ivf_threshold: int = 0,
+        ivf_nprobe: int = 16,
+    ):
+        self.path = Path(path)
+        self.sparse_encoder = sparse_encoder
+        self.embed = embed
+        self.sources = sources or []
+        self.ivf_threshold = ivf_threshold
+        self.ivf_nprobe = ivf_nprobe
+        self.collections: Dict[str, LocalCollection] = {}
+        self._lock = asyncio.Lock()
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return is_chunk_store(self.path / collection_name)
+
+    async def build(self, collection_name: str, chunks: Iterable[Dict[str, Any]], batch_size: int = 64):
+        # Коллекция - хранилище чанков (services/chunk_store.py) с payload и нормированными эмбеддингами;
+        # векторы пишутся на диск по батчам, поэтому память не зависит от размера корпуса. Писатель собирает
+        # её в <collection>.building и подменяет прежнюю версию целиком при закрытии
+        with ChunkStoreWriter(self.path / collection_name) as writer:
+            for batch in batched(chunks, batch_size):
+                embedded = np.asarray(await self.embed([chunk["text"] for chunk in batch]), dtype=np.float32)
+                embedded /= np.maximum(np.linalg.norm(embedded, axis=1, keepdims=True), 1e-12)
+                for chunk, vector in zip(batch, embedded, strict=True):
+                    writer.add(chunk_payload(chunk), vector)
+
+        self.collections.pop(collection_name, None)
+        logger.info(f"Локальный индекс {collection_name} собран: {writer.count} векторов, размерность {writer.dim}")
+
+    async def get_collection(self, collection_name: str) -> LocalCollection:
+        collection = self.collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        async with self._lock:
+            if collection_name not in self.collections:
+                if not self.collection_exists(collection_name):
+                    if not self.sources:
+                        raise ValueError(f"Локальный индекс {collection_name} не найден в {self.path}")
+                    logger.info(f"Локальный индекс {collection_name} не найден, собираем из {self.sources}")
+                    await self.build(collection_name, iter_chunk_files(self.sources))
+                self.collections[collection_name] = await asyncio.to_thread(
+                    LocalCollection, self.path / collection_name, self.sparse_encoder, self.ivf_threshold, self.ivf_nprobe
+                )
+                logger.info(f"Загружен локальный индекс {collection_name}: {len(self.collections[collection_name].ids)} чанков")
+            return self.collections[collection_name]
+
+    async def dense_search(
+        self,
+        collection_name: str,
+        vector: List[float],
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+        params: SearchParams | None = None,
+    ) -> List[ScoredPoint]:
+        collection = await self.get_collection(collection_name)
+        # HNSW здесь нет, поэтому из параметров запроса учитывается только exact (поиск без IVF)
+        return collection.dense_search(vector, limit, with_vectors, filters, exact=bool(params and params.exact))
+
+    async def sparse_search(
+        self,
+        collection_name: str,
+        vector: SparseVector,
+        limit: int,
+        with_vectors: bool = False,
+        filters: SearchFilters | None = None,
+    ) -> List[ScoredPoint]:
+        collection = await self.get_collection(collection_name)
+        return collection.sparse_search(vector, limit, with_vectors, filters)
+
+    async def fetch_chunks(self, collection_name: str, document_id: Any, first: int, last: int) -> List[Dict[str, Any]]:
+        collection = await self.get_collection(collection_name)
+        return collection.fetch_chunks(document_id, first, last)
@@ -68,18 +68,63 @@ class ConfigGPT:
     base_url: str
 
 
+@dataclass
+class ConfigLocalIndex:
+    path: str
+    sources: list[str]  # файлы чанков, из которых собирается индекс, если его ещё нет
+    ivf_threshold: int  # с какого числа векторов включать приближённый IVF-индекс, 0 - никогда
+    ivf_nprobe: int
+
+
 @dataclass
 class ConfigQdrant:
     host: str
     port: int
     api_key: str
+    collection: str
+    backend: str  # "remote" - сервер Qdrant, "local" - встроенный индекс на NumPy
+    profile: str  # профиль новых коллекций: full, int8, binary, disk (services/collection_profiles.py)
+    local: ConfigLocalIndex
 
 
 @dataclass
 class ConfigEmbeddings:
+    provider: str  # "openai" - API эмбеддингов, "hashing" - локальный детерминированный (офлайн-бенчмарки, CI)
     model: str
     base_url: str
     api_key: str
+    batch_flush_ms: int  # сколько ждать соседние запросы перед отправкой батча
+    batch_max_size: int
+    cache_memory_size: int
+    cache_path: str  # пустая строка отключает дисковый кэш
+    cache_max_rows: int
+    dimensions: int  # размерность векторов, 0 - полная размерность модели
+    truncate_locally: bool  # получать dimensions усечением полных векторов из кэша, а не параметром API
+
+
+@dataclass
+class ConfigIngestionPipeline:
+    download_dir: str
+    pdf_page_cache: str  # кэш текста страниц PDF по (sha1 файла, страница), "" - без кэша
+    download_per_host: int  # одновременных запросов к одному хосту
+    download_bytes_per_second: int  # общий предел скорости скачивания, 0 - без предела
+    download_retries: int
+    download_backoff_seconds: float  # базовая задержка повтора, растёт вдвое с каждой попыткой
+    queue_size: int  # размер очередей между стадиями
+    download_workers: int
+    extract_workers: int  # процессы извлечения текста
+    chunk_workers: int
+    embed_workers: int
+    upsert_workers: int
+    report_seconds: int  # как часто писать в лог счётчики стадий, 0 - только в конце
+
+
+@dataclass
+class ConfigIngestion:
+    batch_size: int
+    parallel: int
+    version_grace_seconds: int  # сколько хранить версию коллекции после переключения алиаса на новую
+    pipeline: ConfigIngestionPipeline
 
 
 @dataclass
@@ -116,6 +161,27 @@ class ConfigExecution:
 @dataclass
 class ConfigSearch:
     max_results: int
+    hybrid: bool  # плотный + BM25 поиск с объединением через RRF
+    hybrid_candidates: int  # сколько кандидатов берём из каждого вида поиска до слияния
+    rrf_k: int
+    diversify: bool  # MMR-отбор и схлопывание почти-дубликатов среди найденных чанков
+    diversify_candidates: int
+    mmr_lambda: float  # 1.0 - только релевантность, 0.0 - только разнообразие
+    dedup_threshold: float  # косинус, начиная с которого чанки считаются дубликатами
+    hnsw_ef: int  # ширина поиска по HNSW, 0 - значение сервера
+    oversampling: float  # запас кандидатов для пересчёта по исходным векторам при квантовании, 0 - по умолчанию
+    expand_neighbours: bool  # small-to-big: дополнять найденный чанк соседними чанками документа
+    expansion_token_budget: int  # размер окна вокруг попадания в токенах
+    expansion_neighbours: int  # не больше стольких соседних чанков с каждой стороны попадания
+
+
+@dataclass
+class ConfigAnswerCache:
+    enabled: bool
+    path: str  # пустая строка - кэш только в памяти процесса
+    threshold: float  # минимальная косинусная близость вопросов
+    ttl_seconds: int
+    max_entries: int
 
 
 @dataclass
@@ -139,10 +205,12 @@ class Config:
     gpt: ConfigGPT
     qdrant: ConfigQdrant
     embeddings: ConfigEmbeddings
+    ingestion: ConfigIngestion
     openai: ConfigOpenAI
     prompts: ConfigPrompts
     execution: ConfigExecution
     search: ConfigSearch
+    answer_cache: ConfigAnswerCache
     mcp: ConfigMCP
     scraping: ConfigScraping
 
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from services.answer_cache import AnswerCache
+
+VECTORS = {
+    "Как получить справку об обучении?": [1.0, 0.0, 0.0],
+    "Как получить справку с места учёбы?": [0.95, 0.05, 0.0],
+    "Где находится столовая?": [0.0, 1.0, 0.0],
+}
+
+
+async def embed(text):
+    return VECTORS[text]
+
+
+def make_cache(path="", threshold=0.9, ttl_seconds=3600, max_entries=100):
+    return AnswerCache(embed=embed, path=path, threshold=threshold, ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+
+@pytest.mark.asyncio
+async def test_similar_question_hits_and_different_question_misses():
+    cache = make_cache()
+    await cache.store("Как получить справку об обучении?", "В деканате")
+
+    assert await cache.lookup("Как получить справку с места учёбы?") == "В деканате"
+    assert await cache.lookup("Где находится столовая?") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_expired_answers_are_not_returned():
+    cache = make_cache(ttl_seconds=-1)
+    await cache.store("Как получить справку об обучении?", "В деканате")
+
+    assert await cache.lookup("Как получить справку об обучении?") is None
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_all_answers():
+    cache = make_cache()
+    await cache.store("Как получить справку об обучении?", "В деканате")
+
+    cache.invalidate()
+
+    assert await cache.lookup("Как получить справку об обучении?") is None
+
+
+@pytest.mark.asyncio
+async def test_max_entries_keeps_newest_answers():
+    cache = make_cache(max_entries=1)
+    await cache.store("Как получить справку об обучении?", "В деканате")
+    await cache.store("Где находится столовая?", "В корпусе 1")
+
+    assert await cache.lookup("Как получить справку об обучении?") is None
+    assert await cache.lookup("Где находится столовая?") == "В корпусе 1"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_by_another_process_is_noticed(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    cache = make_cache(path=path)
+    await cache.store("Как получить справку об обучении?", "В деканате")
+    assert await cache.lookup("Как получить справку об обучении?") == "В деканате"
+
+    with sqlite3.connect(path) as db:
+        db.execute("DELETE FROM answers")
+
+    assert await cache.lookup("Как получить справку об обучении?") is None
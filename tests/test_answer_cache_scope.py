@@ -0,0 +1,77 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from core.agents import university_agent
+from core.agents.base_agent import BaseAgent
+from core.agents.university_agent import UniversityAssistantAgent
+from core.models import AgentStatesEnum
+from core.tools import FinalAnswerTool
+from core.tools.general_info_tool import GeneralInfoTool
+from core.tools.schedule_tool import ScheduleTool
+from utils.config import CONFIG
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AsyncMock()
+    cache.lookup.return_value = None
+    monkeypatch.setattr(university_agent, "answer_cache", cache)
+    monkeypatch.setattr(CONFIG.answer_cache, "enabled", True)
+    return cache
+
+
+def fake_run(monkeypatch, *tools, clarifications=0):
+    async def execute(agent):
+        agent.used_tools.update(tools)
+        agent._context.clarifications_used = clarifications
+        agent._context.execution_result = "ответ"
+        agent._context.state = AgentStatesEnum.COMPLETED
+
+    monkeypatch.setattr(BaseAgent, "execute", execute)
+
+
+@pytest.mark.asyncio
+async def test_general_info_answer_is_stored(monkeypatch, cache):
+    fake_run(monkeypatch, GeneralInfoTool, FinalAnswerTool)
+
+    await UniversityAssistantAgent(task="Как получить справку об обучении?").execute()
+
+    cache.store.assert_awaited_once_with("Как получить справку об обучении?", "ответ")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tools", [(ScheduleTool, FinalAnswerTool), (GeneralInfoTool, ScheduleTool, FinalAnswerTool), (FinalAnswerTool,)])
+async def test_answers_depending_on_date_or_without_sources_are_not_stored(monkeypatch, cache, tools):
+    fake_run(monkeypatch, *tools)
+
+    await UniversityAssistantAgent(task="Какая пара завтра у ИВТ-21?").execute()
+
+    cache.store.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_answers_after_clarification_are_not_stored(monkeypatch, cache):
+    fake_run(monkeypatch, GeneralInfoTool, FinalAnswerTool, clarifications=1)
+
+    await UniversityAssistantAgent(task="Где получить справку?").execute()
+
+    cache.store.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "collection_name, invalidated",
+    [(CONFIG.qdrant.collection, True), (f"{CONFIG.qdrant.collection}__v20260101T000000", True), ("benchmark_profile", False)],
+)
+async def test_ingestion_invalidates_only_for_live_collection(monkeypatch, collection_name, invalidated):
+    from services import ingestion_service
+
+    cache = MagicMock()
+    monkeypatch.setattr(ingestion_service, "answer_cache", cache)
+    service = ingestion_service.IngestionService(AsyncMock())
+    monkeypatch.setattr(service, "alias_target", AsyncMock(return_value=f"{CONFIG.qdrant.collection}__v20260101T000000"))
+
+    await service.invalidate_answers(collection_name)
+
+    assert cache.invalidate.called == invalidated
@@ -0,0 +1,35 @@
+from services.chunk_ids import assign_stable_ids, upgrade_legacy_chunks
+
+
+def legacy_chunks():
+    return [
+        {"chunk_uid": "chunk_7", "chunk_id": 7, "text": "первый", "document_id": "doc-a"},
+        {"chunk_uid": "chunk_8", "chunk_id": 8, "text": "второй", "document_id": "doc-a"},
+        {"chunk_uid": "chunk_9", "chunk_id": 9, "text": "первый", "document_id": "doc-b"},
+    ]
+
+
+def test_legacy_chunks_get_text_derived_uids():
+    upgraded = list(upgrade_legacy_chunks(legacy_chunks()))
+
+    expected = assign_stable_ids([{"text": "первый"}, {"text": "второй"}], "doc-a")
+    assert [chunk["chunk_uid"] for chunk in upgraded[:2]] == [chunk["chunk_uid"] for chunk in expected]
+    assert [chunk["chunk_id"] for chunk in upgraded] == [0, 1, 0]
+    # Тот же текст в другом документе - другой id
+    assert upgraded[2]["chunk_uid"] != upgraded[0]["chunk_uid"]
+
+
+def test_legacy_uids_do_not_depend_on_corpus_position():
+    shifted = [{"chunk_uid": "chunk_0", "chunk_id": 0, "text": "новый", "document_id": "doc-0"}] + legacy_chunks()
+
+    before = {chunk["text"] + chunk["document_id"]: chunk["chunk_uid"] for chunk in upgrade_legacy_chunks(legacy_chunks())}
+    after = {chunk["text"] + chunk["document_id"]: chunk["chunk_uid"] for chunk in upgrade_legacy_chunks(shifted)}
+
+    assert all(after[key] == uid for key, uid in before.items())
+
+
+def test_current_chunks_are_left_unchanged():
+    chunks = assign_stable_ids([{"text": "текст", "chunk_id": 3}], "doc-a")
+    snapshot = [dict(chunk) for chunk in chunks]
+
+    assert list(upgrade_legacy_chunks(chunks)) == snapshot
@@ -0,0 +1,34 @@
+from services.chunk_metadata import chunk_payload, classify_category, document_date, source_type
+
+
+def test_hash_document_id_is_classified_by_filename():
+    chunk = {"document_id": "a1b2c3d4e5", "filename": "pdf_1_123.pdf", "text": "..."}
+
+    assert source_type(chunk) == "pdf"
+    assert chunk_payload(chunk)["source_type"] == "pdf"
+
+
+def test_hash_document_id_does_not_produce_category_or_year():
+    # Хэш из цифр и латиницы не должен совпадать с маркерами категорий и годами
+    chunk = {"document_id": "2024abcd1f", "filename": "rules_2019.docx"}
+
+    assert source_type(chunk) == "docx"
+    assert classify_category(chunk) == "rules"
+    assert document_date(chunk) == "2019-01-01"
+
+
+def test_url_document_id_is_classified_by_path():
+    chunk = {"document_id": "https://guap.ru/content/sveden/grants/2025-009-08/krit.docx"}
+
+    assert source_type(chunk) == "docx"
+    assert classify_category(chunk) == "services"
+    assert document_date(chunk) == "2025-01-01"
+
+
+def test_explicit_fields_win():
+    chunk = {"document_id": "a1b2c3d4e5", "filename": "x.pdf", "date": "2023-09-01", "category": "events"}
+
+    payload = chunk_payload(chunk)
+
+    assert payload["date"] == "2023-09-01"
+    assert payload["category"] == "events"
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from services.chunk_store import ChunkStore, ChunkStoreWriter, is_chunk_store, save_chunks
+
+
+def make_chunks(count, prefix="c"):
+    return [{"chunk_uid": f"{prefix}{i}", "chunk_id": i, "text": f"текст {i} ✓"} for i in range(count)]
+
+
+def test_round_trip_with_embeddings(tmp_path):
+    chunks = make_chunks(7)
+    vectors = np.arange(14, dtype=np.float32).reshape(7, 2)
+    with ChunkStoreWriter(tmp_path / "store", shard_size=3) as writer:
+        for chunk, vector in zip(chunks, vectors, strict=True):
+            writer.add(chunk, vector)
+
+    store = ChunkStore(tmp_path / "store")
+    assert list(store) == chunks
+    assert len(store.shards) == 3
+    assert store.get("c5") == chunks[5]
+    assert "c6" in store and "c7" not in store
+    np.testing.assert_array_equal(store.embeddings, vectors)
+    np.testing.assert_array_equal(store.embedding("c4"), vectors[4])
+
+
+def test_append_keeps_existing_chunks(tmp_path):
+    save_chunks(make_chunks(2), tmp_path / "store")
+    with ChunkStoreWriter(tmp_path / "store", append=True) as writer:
+        writer.add_all(make_chunks(2, prefix="d"))
+
+    assert [chunk["chunk_uid"] for chunk in ChunkStore(tmp_path / "store")] == ["c0", "c1", "d0", "d1"]
+
+
+def test_rewrite_replaces_store_only_on_close(tmp_path):
+    path = tmp_path / "store"
+    save_chunks(make_chunks(3), path)
+
+    writer = ChunkStoreWriter(path)
+    writer.add_all(make_chunks(1, prefix="new"))
+    # Пока новое хранилище не закрыто, читатели видят прежнее целиком
+    assert [chunk["chunk_uid"] for chunk in ChunkStore(path)] == ["c0", "c1", "c2"]
+
+    writer.close()
+    assert [chunk["chunk_uid"] for chunk in ChunkStore(path)] == ["new0"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+
+
+def test_failed_rewrite_leaves_previous_store(tmp_path):
+    path = tmp_path / "store"
+    save_chunks(make_chunks(3), path)
+
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(path) as writer:
+            writer.add_all(make_chunks(1, prefix="new"))
+            raise RuntimeError("оборвалась запись")
+
+    assert [chunk["chunk_uid"] for chunk in ChunkStore(path)] == ["c0", "c1", "c2"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+
+
+def test_uncommitted_append_tail_is_invisible_and_cut(tmp_path):
+    path = tmp_path / "store"
+    save_chunks(make_chunks(2), path)
+
+    writer = ChunkStoreWriter(path, append=True)
+    writer.add_all(make_chunks(2, prefix="lost"))
+    writer._close_files()
+    assert len(list(ChunkStore(path))) == 2
+
+    with ChunkStoreWriter(path, append=True) as writer:
+        writer.add_all(make_chunks(1, prefix="d"))
+    assert [chunk["chunk_uid"] for chunk in ChunkStore(path)] == ["c0", "c1", "d0"]
+
+
+def test_save_chunks_json(tmp_path):
+    save_chunks(make_chunks(2), tmp_path / "chunks.json")
+
+    assert not is_chunk_store(tmp_path / "chunks.json")
+    assert (tmp_path / "chunks.json").read_text(encoding="utf-8").startswith('{\n  "chunks"')
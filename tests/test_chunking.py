@@ -0,0 +1,70 @@
+from itertools import pairwise
+
+import pytest
+import tiktoken
+
+from rag_sources import chunking
+from rag_sources.chunking import chunk_by_gpt_tokens, get_encoding
+
+# Локальная кодировка вместо cl100k_base (её файл скачивается из сети): все байты плюс строчные
+# и заглавные буквы кириллицы одним токеном, поэтому эмодзи по-прежнему режутся посреди символа
+_LETTERS = [chr(code) for code in range(ord("А"), ord("я") + 1)] + ["ё", "Ё"]
+_RANKS = {bytes([i]): i for i in range(256)} | {letter.encode(): 256 + i for i, letter in enumerate(_LETTERS)}
+LOCAL_ENCODING = tiktoken.Encoding(
+    name="test_bytes",
+    pat_str=r""" ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+    mergeable_ranks=_RANKS,
+    special_tokens={},
+)
+# Около токена на символ: в чанке примерно столько же символов, сколько в 64/8 токенах cl100k
+CHUNK_SIZE = 160
+OVERLAP = 20
+
+
+@pytest.fixture(autouse=True)
+def local_encoding(monkeypatch):
+    monkeypatch.setattr(chunking, "_encoding", LOCAL_ENCODING)
+
+
+PARAGRAPH = "Стипендия назначается приказом ректора. Выплата производится ежемесячно до 25 числа! Вопросы — в деканат 😀. "
+
+
+@pytest.mark.parametrize("text", [PARAGRAPH * 40, "абв" * 2000, ("ГУАП" * 300 + " ") * 5])
+def test_offsets_point_at_chunk_text(text):
+    chunks = chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk["start_offset"] : chunk["end_offset"]] == chunk["text"]
+        assert chunk["token_count"] <= CHUNK_SIZE
+
+
+def test_repeated_fragments_get_their_own_offsets():
+    text = PARAGRAPH * 40
+    chunks = chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+
+    starts = [chunk["start_offset"] for chunk in chunks]
+    assert starts == sorted(set(starts))
+
+
+def test_chunks_cover_the_text_with_overlap():
+    text = PARAGRAPH * 40
+    chunks = chunk_by_gpt_tokens(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+
+    assert chunks[0]["start_offset"] == 0
+    assert chunks[-1]["end_offset"] == len(text.rstrip())
+    for previous, chunk in pairwise(chunks):
+        # Следующий чанк начинается внутри предыдущего, но позже его начала
+        assert previous["start_offset"] < chunk["start_offset"] <= previous["end_offset"]
+
+
+def test_chunks_end_on_sentence_boundaries_when_possible():
+    chunks = chunk_by_gpt_tokens(PARAGRAPH * 40, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+
+    assert all(chunk["text"][-1] in ".!?…" for chunk in chunks[:-1])
+
+
+def test_short_text_is_one_chunk():
+    [chunk] = chunk_by_gpt_tokens("Коротко.")
+
+    assert chunk["token_count"] == len(get_encoding().encode_ordinary("Коротко."))
@@ -0,0 +1,76 @@
+import pytest
+
+from services.context_expansion import NeighbourExpander
+from services.sparse_encoder import SparseEncoder
+from services.vector_backends import LocalVectorBackend
+
+DOCUMENT = [{"document_id": "doc-a", "chunk_id": i, "text": f"чанк {i}", "token_count": 10} for i in range(10)]
+
+
+class FakeCollection:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.requests = []
+
+    async def fetch(self, collection_name, document_id, first, last):
+        self.requests.append((collection_name, document_id, first, last))
+        return [chunk for chunk in self.chunks if chunk["document_id"] == document_id and first <= chunk["chunk_id"] <= last]
+
+
+def hit(chunk_id, text=None):
+    return {"id": chunk_id, "score": 1.0, "text": text or f"чанк {chunk_id}", "metadata": {"document_id": "doc-a", "chunk_id": chunk_id, "token_count": 10}}
+
+
+@pytest.mark.asyncio
+async def test_neighbours_are_fetched_from_the_searched_collection():
+    collection = FakeCollection(DOCUMENT)
+    expander = NeighbourExpander(collection.fetch, token_budget=1000, max_neighbours=2)
+
+    [document] = await expander.expand("docs", [hit(5)])
+
+    assert collection.requests == [("docs", "doc-a", 3, 7)]
+    assert document["metadata"]["expanded_chunk_ids"] == [3, 4, 5, 6, 7]
+    assert document["text"] == "чанк 3 чанк 4 чанк 5 чанк 6 чанк 7"
+
+
+@pytest.mark.asyncio
+async def test_hit_text_comes_from_the_search_result():
+    stale = [dict(chunk, text="старый текст") if chunk["chunk_id"] == 5 else chunk for chunk in DOCUMENT]
+    expander = NeighbourExpander(FakeCollection(stale).fetch, token_budget=1000, max_neighbours=1)
+
+    [document] = await expander.expand("docs", [hit(5, "новый текст")])
+
+    assert document["text"] == "чанк 4 новый текст чанк 6"
+    assert document["metadata"]["hit_text"] == "новый текст"
+
+
+@pytest.mark.asyncio
+async def test_window_respects_budget_and_skips_covered_hits():
+    expander = NeighbourExpander(FakeCollection(DOCUMENT).fetch, token_budget=30, max_neighbours=3)
+
+    documents = await expander.expand("docs", [hit(5), hit(6), hit(0)])
+
+    assert [document["metadata"]["expanded_chunk_ids"] for document in documents] == [[4, 5, 6], [0, 1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_fetch_errors_leave_results_unexpanded():
+    async def fetch(*args):
+        raise ConnectionError("qdrant недоступен")
+
+    documents = [hit(5)]
+
+    assert await NeighbourExpander(fetch, token_budget=1000, max_neighbours=2).expand("docs", documents) == documents
+
+
+@pytest.mark.asyncio
+async def test_local_backend_fetches_chunk_range(tmp_path):
+    async def embed(texts):
+        return [[1.0, float(i)] for i, _ in enumerate(texts)]
+
+    backend = LocalVectorBackend(str(tmp_path), SparseEncoder(), embed)
+    await backend.build("docs", [dict(chunk, chunk_uid=f"a{chunk['chunk_id']}") for chunk in DOCUMENT])
+
+    chunks = await backend.fetch_chunks("docs", "doc-a", 8, 12)
+
+    assert [chunk["chunk_id"] for chunk in chunks] == [8, 9]
@@ -0,0 +1,113 @@
+import hashlib
+
+import httpx
+import pytest
+
+from rag_sources.download_cache import DownloadCache, canonical_url
+from rag_sources.downloader import Downloader
+from rag_sources.pdf_to_chunks_pipeline import pdf_sources
+
+
+def test_canonical_url_normalises_equivalent_links():
+    encoded = "https://guap.ru/docs/%D0%9F%D0%BE%D0%BB%D0%BE%D0%B6%D0%B5%D0%BD%D0%B8%D0%B5.pdf?a=1&b=2"
+    assert canonical_url("HTTPS://GUAP.ru:443/docs/Положение.pdf?b=2&a=1#p3") == canonical_url(encoded)
+    assert canonical_url("http://guap.ru:8080") == "http://guap.ru:8080/"
+
+
+class Server:
+    """Отдаёт документы по URL с ETag и отвечает 304 на совпавший If-None-Match."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        body = self.documents[str(request.url)]
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        return httpx.Response(200, content=body, headers={"etag": etag, "content-type": "application/pdf"})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DownloadCache(tmp_path / "objects", tmp_path / "index.sqlite3")
+    yield cache
+    cache.close()
+
+
+async def fetch(server, cache, url, **kwargs):
+    async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+        return await Downloader(client, cache, retries=0).fetch(url, suffix=".pdf", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_repeated_fetch_is_conditional(cache):
+    server = Server({"https://guap.ru/a.pdf": b"%PDF-1 a"})
+
+    first = await fetch(server, cache, "https://guap.ru/a.pdf")
+    second = await fetch(server, cache, "https://guap.ru/a.pdf")
+
+    assert first == second and first.read_bytes() == b"%PDF-1 a"
+    assert "if-none-match" not in server.requests[0].headers
+    assert server.requests[1].headers["if-none-match"] == f'"{hashlib.sha1(b"%PDF-1 a").hexdigest()}"'
+    assert (cache.downloaded, cache.hits) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_same_content_under_different_urls_is_stored_once(cache):
+    server = Server({"https://guap.ru/a.pdf": b"%PDF-1 same", "https://fs.guap.ru/copy.pdf": b"%PDF-1 same"})
+
+    first = await fetch(server, cache, "https://guap.ru/a.pdf")
+    second = await fetch(server, cache, "https://fs.guap.ru/copy.pdf")
+
+    assert first == second
+    assert [path.name for path in cache.objects_dir.glob("*.pdf")] == [first.name]
+
+
+@pytest.mark.asyncio
+async def test_changed_document_replaces_previous_version(cache):
+    server = Server({"https://guap.ru/a.pdf": b"%PDF-1 old"})
+    old = await fetch(server, cache, "https://guap.ru/a.pdf")
+
+    server.documents["https://guap.ru/a.pdf"] = b"%PDF-1 new"
+    new = await fetch(server, cache, "https://guap.ru/a.pdf")
+
+    assert new != old and new.read_bytes() == b"%PDF-1 new"
+    assert not old.exists()
+    assert cache.lookup("https://GUAP.ru/a.pdf")["path"] == new
+
+
+@pytest.mark.asyncio
+async def test_rejected_response_is_not_cached(cache):
+    server = Server({"https://guap.ru/a.pdf": b"<html>"})
+
+    assert await fetch(server, cache, "https://guap.ru/a.pdf", accept=lambda headers: False) is None
+    assert cache.lookup("https://guap.ru/a.pdf") is None
+    assert not list(cache.parts_dir.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_pdf_documents_keep_their_id_when_the_content_changes(tmp_path, cache):
+    url = "https://guap.ru/docs/%D0%9F%D0%BE%D0%BB%D0%BE%D0%B6%D0%B5%D0%BD%D0%B8%D0%B5.pdf"
+    objects, index = tmp_path / "objects", tmp_path / "index.sqlite3"
+    server = Server({url: b"%PDF-1.4 first"})
+    first = await fetch(server, cache, url)
+    before = pdf_sources([first], objects, index)[first]
+
+    server.documents[url] = b"%PDF-1.4 second"
+    second = await fetch(server, cache, url)
+    after = pdf_sources([second], objects, index)[second]
+
+    assert first != second
+    assert before == after == [(canonical_url(url), canonical_url(url), "Положение.pdf")]
+
+
+def test_files_outside_the_download_index_are_named_by_file(tmp_path, cache):
+    legacy = tmp_path / "objects" / "pdf_1_123.pdf"
+    legacy.write_bytes(b"%PDF-1.4 legacy")
+
+    sources = pdf_sources([legacy], tmp_path / "objects", tmp_path / "index.sqlite3")
+
+    assert sources[legacy] == [(hashlib.sha1(b"pdf_1_123.pdf").hexdigest()[:10], None, "pdf_1_123.pdf")]
@@ -0,0 +1,140 @@
+import hashlib
+
+import httpx
+import pytest
+
+from rag_sources.download_cache import DownloadCache
+from rag_sources.downloader import BLOCK_SIZE, Downloader
+
+BODY = bytes(range(256)) * 1024
+ETAG = '"v1"'
+# Обрыв на границе блока записи Downloader, иначе неполный последний блок не успевает попасть на диск
+CUT_AT = 2 * BLOCK_SIZE
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """Отдаёт начало тела и обрывает соединение."""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+        raise httpx.ReadError("соединение оборвано")
+
+
+class FlakyServer:
+    """Первый ответ обрывается на середине, дальше поддерживаются Range и If-Range."""
+
+    def __init__(self, body=BODY, etag=ETAG, cut_at=CUT_AT):
+        self.body, self.etag, self.cut_at = body, etag, cut_at
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if len(self.requests) == 1:
+            return httpx.Response(200, headers={"etag": self.etag}, stream=BrokenStream(self.body[: self.cut_at]))
+        range_header = request.headers.get("range")
+        if range_header and request.headers.get("if-range") == self.etag:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+            headers = {"etag": self.etag, "content-range": f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"}
+            return httpx.Response(206, headers=headers, content=self.body[start:])
+        return httpx.Response(200, headers={"etag": self.etag}, content=self.body)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DownloadCache(tmp_path / "objects", tmp_path / "index.sqlite3")
+    yield cache
+    cache.close()
+
+
+async def fetch(server, cache, retries=1):
+    async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+        downloader = Downloader(client, cache, retries=retries, backoff=0)
+        return await downloader.fetch("https://guap.ru/big.pdf", suffix=".pdf"), downloader
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_is_resumed_with_range(cache):
+    server = FlakyServer()
+
+    path, downloader = await fetch(server, cache)
+
+    assert path.read_bytes() == BODY
+    assert path.name == hashlib.sha1(BODY).hexdigest() + ".pdf"
+    assert downloader.resumed == 1
+    assert server.requests[1].headers["range"] == f"bytes={CUT_AT}-"
+    assert server.requests[1].headers["if-range"] == ETAG
+
+
+@pytest.mark.asyncio
+async def test_partial_file_survives_until_the_next_run(cache):
+    server = FlakyServer()
+
+    with pytest.raises(httpx.ReadError):
+        await fetch(server, cache, retries=0)
+    assert [part.stat().st_size for part in cache.parts_dir.glob("*.part")] == [CUT_AT]
+
+    path, downloader = await fetch(server, cache, retries=0)
+    assert path.read_bytes() == BODY
+    assert downloader.resumed == 1
+    assert not list(cache.parts_dir.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_changed_document_is_downloaded_from_scratch(cache):
+    server = FlakyServer()
+    with pytest.raises(httpx.ReadError):
+        await fetch(server, cache, retries=0)
+
+    # Документ изменился: If-Range не совпал, сервер отдаёт всё тело заново
+    server.etag = '"v2"'
+    path, downloader = await fetch(server, cache, retries=0)
+
+    assert path.read_bytes() == BODY
+    assert downloader.resumed == 0
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_retried(cache):
+    responses = iter([httpx.Response(503), httpx.Response(200, content=b"%PDF-1")])
+
+    path, _ = await fetch(lambda request: next(responses), cache)
+
+    assert path.read_bytes() == b"%PDF-1"
+
+
+@pytest.mark.asyncio
+async def test_final_errors_leave_no_partial_file(cache):
+    server = FlakyServer()
+    with pytest.raises(httpx.ReadError):
+        await fetch(server, cache, retries=0)
+
+    # Документ убрали с сайта: недокачанное начало удаляется, следующий запуск не пошлёт по нему Range
+    with pytest.raises(httpx.HTTPStatusError):
+        await fetch(lambda request: httpx.Response(404), cache)
+    assert not list(cache.parts_dir.iterdir())
+
+    path, downloader = await fetch(server, cache, retries=0)
+    assert path.read_bytes() == BODY
+    assert "range" not in server.requests[-1].headers
+    assert downloader.resumed == 0
+
+
+@pytest.mark.asyncio
+async def test_rejected_range_starts_over(cache):
+    server = FlakyServer()
+    with pytest.raises(httpx.ReadError):
+        await fetch(server, cache, retries=0)
+
+    def range_not_satisfiable(request):
+        if "range" in request.headers:
+            return httpx.Response(416)
+        return server(request)
+
+    path, downloader = await fetch(range_not_satisfiable, cache)
+
+    assert path.read_bytes() == BODY
+    assert downloader.resumed == 0
+    assert not list(cache.parts_dir.iterdir())
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEmbeddingsClient:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        self.embeddings = self
+
+    async def create(self, model, input, **kwargs):
+        self.calls.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)])
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_on_batch_size():
+    client = FakeEmbeddingsClient()
+    # Окно больше таймаута теста: сработать может только переполнение батча
+    batcher = EmbeddingBatcher(client, "model", flush_window_ms=60_000, max_batch_size=3)
+
+    vectors = await asyncio.wait_for(asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "ccc"])), timeout=1)
+
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert client.calls == [["a", "bb", "ccc"]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_on_timeout():
+    client = FakeEmbeddingsClient()
+    batcher = EmbeddingBatcher(client, "model", flush_window_ms=20, max_batch_size=100)
+
+    first = asyncio.create_task(batcher.embed("a"))
+    second = asyncio.create_task(batcher.embed("bb"))
+    await asyncio.sleep(0)
+    assert client.calls == []
+
+    assert await asyncio.wait_for(asyncio.gather(first, second), timeout=1) == [[1.0], [2.0]]
+    assert client.calls == [["a", "bb"]]
+    assert batcher.requests_sent == 1
+
+
+@pytest.mark.asyncio
+async def test_batcher_embeds_duplicate_texts_once():
+    client = FakeEmbeddingsClient()
+    batcher = EmbeddingBatcher(client, "model", flush_window_ms=10, max_batch_size=100)
+
+    vectors = await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "a", "a"]))
+
+    assert vectors == [[1.0], [2.0], [1.0], [1.0]]
+    assert client.calls == [["a", "bb"]]
+    assert batcher.texts_embedded == 2
+
+
+@pytest.mark.asyncio
+async def test_batcher_propagates_api_errors():
+    client = FakeEmbeddingsClient()
+
+    async def fail(model, input, **kwargs):
+        raise RuntimeError("api down")
+
+    client.create = fail
+    batcher = EmbeddingBatcher(client, "model", flush_window_ms=0, max_batch_size=10)
+
+    with pytest.raises(RuntimeError, match="api down"):
+        await batcher.embed("a")
+
+
+@pytest.mark.asyncio
+async def test_batcher_resolves_every_caller_when_the_api_skips_an_input():
+    client = FakeEmbeddingsClient()
+    create = client.create
+
+    async def create_without_second(model, input, **kwargs):
+        response = await create(model, input, **kwargs)
+        response.data = [item for item in response.data if item.index != 1]
+        return response
+
+    client.create = create_without_second
+    batcher = EmbeddingBatcher(client, "model", flush_window_ms=10, max_batch_size=100)
+
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "ccc"]), return_exceptions=True), timeout=1)
+
+    assert results[0] == [1.0] and results[2] == [3.0]
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,80 @@
+import sqlite3
+
+import numpy as np
+
+from services import embedding_cache
+from services.embedding_cache import EmbeddingCache, embedding_cache_key
+
+
+class TickingClock:
+    """Каждый вызов time() на секунду позже предыдущего: порядок обращений не зависит от разрешения часов."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def accessed_at(path, text):
+    with sqlite3.connect(path) as db:
+        (value,) = db.execute("SELECT accessed_at FROM embeddings WHERE key = ?", (embedding_cache_key("model", text),)).fetchone()
+    return value
+
+
+def test_disk_hits_survive_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(memory_size=10, path=path)
+    cache.put_many("model", ["Стипендия", "Общежитие"], [[1.0, 2.0], [3.0, 4.0]])
+    cache.close()
+
+    cache = EmbeddingCache(memory_size=10, path=path)
+    vectors = cache.get_many("model", ["стипендия ", "Расписание"])
+
+    np.testing.assert_array_equal(vectors[0], np.array([1.0, 2.0], dtype=np.float32))
+    assert vectors[1] is None
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+
+def test_access_times_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "time", TickingClock())
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH", 2)
+    monkeypatch.setattr(embedding_cache, "TOUCH_INTERVAL_SECONDS", 3600)
+    path = str(tmp_path / "embeddings.sqlite3")
+    texts = ["a", "b", "c"]
+    EmbeddingCache(memory_size=10, path=path).put_many("model", texts, [[1.0], [2.0], [3.0]])
+    written = {text: accessed_at(path, text) for text in texts}
+
+    # Память пуста, каждое чтение - попадание на диск
+    cache = EmbeddingCache(memory_size=0, path=path)
+    cache.get("model", "a")
+    assert accessed_at(path, "a") == written["a"]
+
+    cache.get("model", "b")
+    assert accessed_at(path, "a") > written["a"] and accessed_at(path, "b") > written["b"]
+
+    cache.get("model", "c")
+    cache.close()
+    assert accessed_at(path, "c") > written["c"]
+
+
+def test_eviction_sees_pending_access_times(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "time", TickingClock())
+    monkeypatch.setattr(embedding_cache, "TOUCH_INTERVAL_SECONDS", 3600)
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(memory_size=0, path=path, max_rows=2)
+    cache.put_many("model", ["old"], [[1.0]])
+    cache.put_many("model", ["newer"], [[2.0]])
+
+    # Прочитанная запись свежее, хотя время обращения ещё не записано на диск
+    cache.get("model", "old")
+    cache.put_many("model", ["newest"], [[3.0]])
+
+    assert cache.get("model", "old") is not None
+    assert cache.get("model", "newer") is None
+    cache.close()
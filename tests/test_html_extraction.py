@@ -0,0 +1,71 @@
+import pytest
+
+# Стек паука (Scrapy, lxml, Twisted) не входит в зависимости сервера
+pytest.importorskip("lxml")
+pytest.importorskip("twisted")
+
+from out_spider.extraction import extract  # noqa: E402
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Стипендии ГУАП</title>
+  <style>.content { color: red; }</style>
+  <script>var tracking = "счётчик";</script>
+</head>
+<body>
+  <header>Меню сайта</header>
+  <form>Поиск по сайту</form>
+  <div class="page content wide">
+    <h1>Академическая стипендия</h1>
+    <p>Назначается приказом ректора
+       по итогам сессии.</p>
+    <!-- комментарий редактора -->
+    <div class="ads">Реклама</div>
+    <script>alert("в тексте не нужен");</script>
+    <table><tr><td>Размер</td><td>3 000 ₽</td></tr></table>
+  </div>
+  <aside>Новости</aside>
+  <footer>© ГУАП</footer>
+</body>
+</html>
+"""
+
+
+def test_text_comes_from_the_main_content_block():
+    fields = extract(PAGE.encode("utf-8"), "utf-8")
+
+    assert fields["text_content"] == "Академическая стипендия Назначается приказом ректора по итогам сессии. Реклама Размер 3 000 ₽"
+    assert "raw_content" not in fields and "cleaned_content" not in fields
+
+
+def test_boilerplate_is_stripped_from_pages_without_a_main_block():
+    page = PAGE.replace('class="page content wide"', 'class="page"')
+
+    text = extract(page.encode("utf-8"), "utf-8")["text_content"]
+
+    assert text.startswith("Стипендии ГУАП Академическая стипендия Назначается приказом ректора")
+    for boilerplate in ("Меню сайта", "Поиск по сайту", "Новости", "© ГУАП", "tracking", "color", "alert", "комментарий"):
+        assert boilerplate not in text
+
+
+def test_keep_html_returns_raw_and_cleaned_markup():
+    fields = extract(PAGE.encode("utf-8"), "utf-8", keep_html=True)
+
+    assert fields["raw_content"] == PAGE
+    cleaned = fields["cleaned_content"]
+    assert "<title>Стипендии ГУАП</title>" in cleaned and "<h1>Академическая стипендия</h1>" in cleaned
+    for removed in ("<script", "<style", "комментарий редактора", "Реклама"):
+        assert removed not in cleaned
+    # Очистка HTML не влияет на извлечённый текст
+    assert fields["text_content"] == extract(PAGE.encode("utf-8"), "utf-8")["text_content"]
+
+
+def test_declared_encoding_is_used():
+    body = PAGE.replace(" ₽", "").encode("cp1251")
+
+    assert "Академическая стипендия" in extract(body, "cp1251")["text_content"]
+
+
+def test_empty_body_gives_empty_fields():
+    assert extract(b"", "utf-8", keep_html=True) == {"raw_content": "", "cleaned_content": "", "text_content": ""}
@@ -0,0 +1,140 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from services import ingestion_service
+from services.chunk_files import chunk_point_id
+from services.chunk_ids import assign_stable_ids
+from services.ingestion_service import IngestionService, IngestionStats, chunk_content_hash
+from services.sparse_encoder import SPARSE_VECTOR_NAME, SparseEncoder
+
+COLLECTION = "test_chunks"
+
+
+class FakeQdrantClient:
+    """Коллекции Qdrant в памяти: точки по id с вектором и payload."""
+
+    def __init__(self):
+        self.collections: dict[str, dict[str, SimpleNamespace]] = {}
+
+    async def collection_exists(self, collection_name):
+        return collection_name in self.collections
+
+    async def create_collection(self, collection_name, **kwargs):
+        self.collections[collection_name] = {}
+
+    async def get_collection(self, collection_name):
+        return SimpleNamespace(payload_schema={})
+
+    async def create_payload_index(self, collection_name, **kwargs):
+        pass
+
+    async def get_aliases(self):
+        return SimpleNamespace(aliases=[])
+
+    async def retrieve(self, collection_name, ids, **kwargs):
+        points = self.collections[collection_name]
+        return [points[point_id] for point_id in ids if point_id in points]
+
+    async def upsert(self, collection_name, points, wait=False):
+        for point in points:
+            self.collections[collection_name][point.id] = point
+
+    async def scroll(self, collection_name, scroll_filter, limit, offset=None, **kwargs):
+        chunk_set = scroll_filter.must[0].match.value
+        points = [point for point in self.collections[collection_name].values() if point.payload.get("chunk_set") == chunk_set]
+        return points, None
+
+    async def delete(self, collection_name, points_selector, wait=False):
+        for point_id in points_selector.points:
+            self.collections[collection_name].pop(point_id, None)
+
+
+class FakeQdrantService:
+    def __init__(self):
+        self.client = FakeQdrantClient()
+        self.sparse_encoder = SparseEncoder()
+        self.embedded: list[str] = []
+
+    async def get_embeddings(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(ingestion_service, "answer_cache", MagicMock())
+    return IngestionService(FakeQdrantService())
+
+
+def make_chunk(uid, text):
+    return {"chunk_uid": uid, "document_id": "doc", "text": text}
+
+
+def write_chunks(path, chunks):
+    path.write_text("\n".join(json.dumps(chunk, ensure_ascii=False) for chunk in chunks), encoding="utf-8")
+
+
+@pytest.mark.asyncio
+async def test_restarted_ingestion_skips_loaded_points(service):
+    chunks = [make_chunk(f"c{i}", f"Текст чанка {i}") for i in range(5)]
+
+    stats = await service.ingest_chunks(chunks, collection_name=COLLECTION, batch_size=2, parallel=2)
+    assert (stats.read, stats.upserted, stats.skipped) == (5, 5, 0)
+    assert set(service.qdrant.client.collections[COLLECTION]) == {chunk_point_id(chunk) for chunk in chunks}
+
+    service.qdrant.embedded.clear()
+    stats = await service.ingest_chunks(chunks + [make_chunk("c5", "Новый чанк")], collection_name=COLLECTION, batch_size=2, parallel=2)
+
+    assert (stats.read, stats.upserted, stats.skipped) == (6, 1, 5)
+    assert service.qdrant.embedded == ["Новый чанк"]
+
+
+@pytest.mark.asyncio
+async def test_select_new_chunks_keeps_only_changed_and_new(service):
+    unchanged, changed, new = make_chunk("a", "Стипендия"), make_chunk("b", "Общежитие"), make_chunk("c", "Расписание")
+    existing = {
+        chunk_point_id(unchanged): chunk_content_hash(unchanged),
+        chunk_point_id(changed): chunk_content_hash(make_chunk("b", "Старый текст")),
+    }
+    stats = IngestionStats()
+
+    ids, batch = await service.select_new_chunks(COLLECTION, [unchanged, changed, new], stats, existing)
+
+    assert batch == [changed, new]
+    assert ids == [chunk_point_id(changed), chunk_point_id(new)]
+    assert stats.skipped == 1
+
+
+@pytest.mark.asyncio
+async def test_upsert_chunks_writes_dense_and_sparse_vectors(service):
+    chunk = make_chunk("a", "Академическая стипендия назначается по итогам сессии")
+    stats = IngestionStats()
+
+    await service.upsert_chunks(COLLECTION, [chunk_point_id(chunk)], [chunk], [[0.5, 0.5]], stats)
+
+    point = service.qdrant.client.collections[COLLECTION][chunk_point_id(chunk)]
+    assert point.vector[""] == [0.5, 0.5]
+    assert point.vector[SPARSE_VECTOR_NAME] == service.qdrant.sparse_encoder.encode_document(chunk["text"])
+    assert point.payload["text"] == chunk["text"] and "category" in point.payload
+    assert stats.upserted == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_file_reembeds_only_changed_chunks_and_deletes_removed(service, tmp_path):
+    path = tmp_path / "scholarships.jsonl"
+    write_chunks(path, assign_stable_ids([{"text": "Стипендия"}, {"text": "Общежитие"}, {"text": "Расписание"}], "doc"))
+    await service.sync_file(path, collection_name=COLLECTION, batch_size=2, parallel=1)
+    service.qdrant.embedded.clear()
+
+    # Изменённый чанк получает новый chunk_uid: старая точка удаляется вместе с исчезнувшим чанком
+    write_chunks(path, assign_stable_ids([{"text": "Стипендия"}, {"text": "Общежитие ГУАП"}, {"text": "Военный учебный центр"}], "doc"))
+    stats = await service.sync_file(path, collection_name=COLLECTION, batch_size=2, parallel=1)
+
+    assert sorted(service.qdrant.embedded) == ["Военный учебный центр", "Общежитие ГУАП"]
+    assert (stats.read, stats.upserted, stats.skipped, stats.deleted) == (3, 2, 1, 2)
+    points = service.qdrant.client.collections[COLLECTION].values()
+    assert sorted(point.payload["text"] for point in points) == ["Военный учебный центр", "Общежитие ГУАП", "Стипендия"]
+    assert all(point.payload["chunk_set"] == "scholarships" for point in points)
@@ -0,0 +1,42 @@
+from rag_sources.near_dedup import CorpusDeduplicator
+
+REGULATION = " ".join(f"пункт {i} положения о стипендиях обучающихся университета" for i in range(60))
+HEADER = "федеральное государственное автономное образовательное учреждение высшего образования санкт-петербургский университет"
+
+
+def chunks(doc_id, texts):
+    return [{"document_id": doc_id, "chunk_id": i, "chunk_uid": f"{doc_id}_{i}", "text": text} for i, text in enumerate(texts)]
+
+
+def test_newest_copy_is_kept():
+    dedup = CorpusDeduplicator()
+
+    assert not dedup.is_duplicate_document("2023.pdf", REGULATION, version="2023-01-01")
+    assert not dedup.is_duplicate_document("2025.pdf", REGULATION + " редакция", version="2025-01-01")
+    assert dedup.is_duplicate_document("2024.pdf", REGULATION, version="2024-01-01")
+
+    assert dedup.superseded == {"2023.pdf"}
+    assert dedup.mirrors["2025.pdf"] == ["2023.pdf", "2024.pdf"]
+
+
+def test_chunks_of_superseded_copy_do_not_hide_newer_chunks():
+    dedup = CorpusDeduplicator()
+    dedup.is_duplicate_document("old", REGULATION, version=1.0)
+    old = dedup.filter_chunks(chunks("old", [REGULATION[:300], REGULATION[300:600]]))
+
+    dedup.is_duplicate_document("new", REGULATION, version=2.0)
+    new = dedup.filter_chunks(chunks("new", [REGULATION[:300], REGULATION[300:600]]))
+
+    assert len(new) == 2
+    assert dedup.without_superseded(old + new) == new
+
+
+def test_dropped_chunks_leave_no_gaps_in_chunk_ids():
+    dedup = CorpusDeduplicator()
+    dedup.filter_chunks(chunks("a", [HEADER, "текст первого документа о стипендиях и материальной помощи студентам"]))
+
+    kept = dedup.filter_chunks(chunks("b", ["начало второго документа про общежития и заселение", HEADER, "продолжение второго документа"]))
+
+    assert [chunk["chunk_id"] for chunk in kept] == [0, 1]
+    assert [chunk["chunk_uid"] for chunk in kept] == ["b_0", "b_2"]
+    assert dedup.duplicate_of == {"b_1": "a_0"}
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from rag_sources import extractors, pdf_to_chunks_pipeline
+from services import document_pipeline
+from services.document_pipeline import DocumentPipeline
+
+
+def test_pages_are_bounded_and_files_come_in_order(monkeypatch):
+    submitted, lock = [], threading.Lock()
+
+    def extract_page(pdf_file, page, file_hash, cache_dir):
+        with lock:
+            submitted.append((pdf_file, page))
+        return f"{pdf_file}:{page}"
+
+    monkeypatch.setattr(pdf_to_chunks_pipeline, "safe_extract_page", extract_page)
+    infos = [("h1", 3), (None, 0), ("h3", 40)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        texts = pdf_to_chunks_pipeline.iter_pdf_texts(executor, ["a.pdf", "b.pdf", "c.pdf"], infos, None, max_pending=5)
+        first = next(texts)
+        # Пока разобран первый файл, в пул ушло не больше max_pending страниц сверх него
+        assert len(submitted) <= 3 + 5
+        rest = list(texts)
+
+    assert first == ("a.pdf", pdf_to_chunks_pipeline.join_pdf_pages(["a.pdf:0", "a.pdf:1", "a.pdf:2"]))
+    assert [pdf_file for pdf_file, _ in rest] == ["c.pdf"]
+    assert len(submitted) == 43
+
+
+@pytest.mark.parametrize(
+    "text_layer, expected",
+    [
+        ("12", "Распознанный текст скана страницы"),  # номер страницы поверх скана
+        ("", "Распознанный текст скана страницы"),
+        ("Текстовый слой страницы, которого достаточно для поиска по документу", "Текстовый слой страницы, которого достаточно для поиска по документу"),
+    ],
+)
+def test_pages_with_little_text_layer_are_ocred(monkeypatch, text_layer, expected):
+    ocr_calls = []
+    monkeypatch.setattr(extractors, "_pdf_page_text_layer", lambda pdf_path, page: text_layer)
+    monkeypatch.setattr(extractors, "_pdf_page_ocr", lambda pdf_path, page: ocr_calls.append(page) or "Распознанный текст скана страницы")
+
+    assert extractors.extract_pdf_page("scan.pdf", 0) == expected
+    assert len(ocr_calls) == (len(text_layer) < extractors.OCR_MIN_TEXT_CHARS)
+
+
+def test_page_errors_skip_the_page_but_bugs_propagate(monkeypatch):
+    class PageError(Exception):
+        pass
+
+    def extract_page(pdf_path, page, file_hash, cache_dir):
+        if page == 1:
+            raise PageError("битая страница")
+        raise KeyError(page)
+
+    monkeypatch.setattr(pdf_to_chunks_pipeline, "pdf_page_errors", lambda: (PageError,))
+    monkeypatch.setattr(pdf_to_chunks_pipeline, "extract_pdf_page", extract_page)
+
+    assert pdf_to_chunks_pipeline.safe_extract_page("a.pdf", 1, None, None) == ""
+    with pytest.raises(KeyError):
+        pdf_to_chunks_pipeline.safe_extract_page("a.pdf", 2, None, None)
+
+
+async def test_server_pipeline_extracts_pdf_pages_in_the_pool(monkeypatch, tmp_path):
+    threads, lock = set(), threading.Lock()
+
+    def extract_page(pdf_path, page, file_hash, cache_dir):
+        with lock:
+            threads.add(threading.get_ident())
+        return f"страница {page}"
+
+    monkeypatch.setattr(document_pipeline, "pdf_page_count", lambda path: 6)
+    monkeypatch.setattr(document_pipeline, "extract_pdf_page", extract_page)
+    pipeline = DocumentPipeline(MagicMock(), "docs", tmp_path)
+    pipeline.pdf_cache_dir = None
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        pipeline._extract_pool = pool
+        document = await pipeline.extract({"url": "https://guap.ru/a.pdf", "kind": "pdf", "path": "a.pdf"})
+
+    assert document["text"] == extractors.join_pdf_pages(f"страница {page}" for page in range(6))
+    assert threading.get_ident() not in threads
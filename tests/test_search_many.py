@@ -0,0 +1,74 @@
+import pytest
+from qdrant_client.models import ScoredPoint, SparseVector
+
+from services.qdrant_service import QdrantService
+from services.vector_backends import VectorBackend
+
+
+class RecordingBackend(VectorBackend):
+    """Отдаёт по вектору запроса свою выдачу и запоминает пакеты запросов."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def dense_search(self, collection_name, vector, limit, with_vectors=False, filters=None, params=None):
+        return [point(f"dense-{vector[0]:.3f}-{i}", 1.0 - i / 10) for i in range(limit)]
+
+    async def sparse_search(self, collection_name, vector, limit, with_vectors=False, filters=None):
+        return [point(f"sparse-{vector.indices[0]}-{i}", 1.0 - i / 10) for i in range(limit)]
+
+    async def fetch_chunks(self, collection_name, document_id, first, last):
+        return []
+
+    async def search_batch(self, collection_name, vectors, limit, with_vectors=False, filters=None, params=None):
+        self.batches.append(vectors)
+        return await super().search_batch(collection_name, vectors, limit, with_vectors, filters, params)
+
+
+def point(point_id, score):
+    return ScoredPoint(id=point_id, version=0, score=score, payload={"text": point_id})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = QdrantService()
+    service.backend = RecordingBackend()
+    embedded = []
+
+    async def get_embeddings(texts, truncate=True):
+        embedded.append(list(texts))
+        return [[len(text) / 100, 0.0] for text in texts]
+
+    monkeypatch.setattr(service, "get_embeddings", get_embeddings)
+    service.embedded = embedded
+    return service
+
+
+@pytest.mark.asyncio
+async def test_search_many_sends_one_embedding_call_and_one_batch(service):
+    queries = ["общежитие", "стипендия ИВТ-21"]
+
+    results = await service.search_many("docs", queries, limit=3, hybrid=True, diversify=False, expand=False)
+
+    assert service.embedded == [queries]
+    assert len(service.backend.batches) == 1
+    sparse = [vector for vector in service.backend.batches[0] if isinstance(vector, SparseVector)]
+    assert len(service.backend.batches[0]) == 4 and len(sparse) == 2
+    assert len(results) == 2
+    assert all(len(documents) == 3 for documents in results)
+    # Каждый запрос получает свою выдачу, а не общую
+    assert {d["id"] for d in results[0]}.isdisjoint({d["id"] for d in results[1]})
+
+
+@pytest.mark.asyncio
+async def test_search_many_fused_deduplicates_across_queries(service):
+    fused = await service.search_many_fused("docs", ["общежитие", "общежитие"], limit=4, hybrid=False, diversify=False, expand=False)
+
+    assert len(fused) == 4
+    assert len({document["id"] for document in fused}) == 4
+
+
+@pytest.mark.asyncio
+async def test_search_many_without_queries(service):
+    assert await service.search_many("docs", [], expand=False) == []
+    assert service.backend.batches == []
@@ -0,0 +1,50 @@
+import pytest
+
+from services.sparse_encoder import SparseEncoder, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_codes_and_stems_russian_words():
+    tokens = tokenize("Стипендии группы ИВТ-21, приказ № 05-145/23")
+
+    assert "ивт-21" in tokens
+    assert {"ивт", "21"} <= set(tokens)
+    assert "05-145/23" in tokens
+    assert tokenize("стипендия") == tokenize("стипендию") == tokenize("стипендии")
+
+
+def test_tokenize_treats_yo_as_ye():
+    assert tokenize("учёба") == tokenize("учеба")
+
+
+def test_encode_document_saturates_term_frequency():
+    encoder = SparseEncoder()
+    single = encoder.encode_document("общежитие")
+    repeated = encoder.encode_document("общежитие " * 10)
+
+    assert len(single.indices) == len(repeated.indices) == 1
+    assert single.values[0] < repeated.values[0] < encoder.k1 + 1
+
+
+def test_encode_query_has_unit_weights_and_unique_indices():
+    query = SparseEncoder().encode_query("общежитие общежития ИВТ-21")
+
+    assert query.indices == sorted(set(query.indices))
+    assert query.values == [1.0] * len(query.indices)
+
+
+def test_reciprocal_rank_fusion_rewards_documents_in_both_rankings():
+    dense = [{"id": "a", "text": "A"}, {"id": "b", "text": "B"}, {"id": "c", "text": "C"}]
+    sparse = [{"id": "c", "text": "C"}, {"id": "d", "text": "D"}]
+
+    fused = reciprocal_rank_fusion([dense, sparse], k=60)
+
+    # b и d оба на втором месте: при равном счёте сохраняется порядок первого появления
+    assert [document["id"] for document in fused] == ["c", "a", "b", "d"]
+    assert fused[0]["score"] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[0]["text"] == "C"
+
+
+def test_reciprocal_rank_fusion_limit():
+    ranking = [{"id": str(i)} for i in range(10)]
+
+    assert [document["id"] for document in reciprocal_rank_fusion([ranking], limit=3)] == ["0", "1", "2"]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from services.document_pipeline import stale_points
+from services.staged_pipeline import Stage, StagedPipeline
+
+
+@pytest.mark.asyncio
+async def test_slow_stage_holds_back_the_source():
+    produced = 0
+    release = asyncio.Event()
+
+    def source():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    async def passthrough(item):
+        return item
+
+    async def slow(item):
+        await release.wait()
+        return item
+
+    pipeline = StagedPipeline([Stage("fast", passthrough), Stage("slow", slow)], queue_size=2, report_interval=0)
+    run = asyncio.create_task(pipeline.run(source()))
+    await asyncio.sleep(0.1)
+
+    # Очереди по 2 элемента и по элементу в руках у каждого воркера и источника
+    assert produced <= 8
+
+    release.set()
+    stats = await run
+    assert produced == 100
+    assert stats["slow"].items_out == 100
+
+
+@pytest.mark.asyncio
+async def test_errors_are_skipped_or_stop_the_pipeline():
+    async def fail_on_three(item):
+        if item == 3:
+            raise ValueError("плохой элемент")
+        return item
+
+    collected = []
+
+    async def collect(item):
+        collected.append(item)
+
+    stats = await StagedPipeline([Stage("check", fail_on_three), Stage("collect", collect)], report_interval=0).run(range(6))
+
+    assert sorted(collected) == [0, 1, 2, 4, 5]
+    assert stats["check"].errors == 1
+
+    with pytest.raises(ValueError, match="плохой элемент"):
+        await StagedPipeline([Stage("check", fail_on_three, ignore_errors=False), Stage("collect", collect)], report_interval=0).run(range(100))
+
+
+@pytest.mark.asyncio
+async def test_batches_and_flatten():
+    async def split(item):
+        return [item, item]
+
+    batches = []
+
+    async def collect(batch):
+        batches.append(batch)
+
+    await StagedPipeline([Stage("split", split, flatten=True), Stage("collect", collect, batch_size=4)], report_interval=0).run(range(5))
+
+    assert sorted(len(batch) for batch in batches) == [2, 4, 4]
+
+
+def test_stale_points_keep_chunks_of_documents_not_processed_this_time():
+    existing = {
+        "kept": {"document_id": "https://a/1.pdf"},
+        "shrunk": {"document_id": "https://a/1.pdf"},
+        "failed": {"document_id": "https://a/2.pdf"},
+        "unlinked": {"document_id": "https://a/3.pdf"},
+    }
+
+    stale = stale_points(existing, seen={"kept"}, processed={"https://a/1.pdf"}, linked={"https://a/1.pdf", "https://a/2.pdf"})
+
+    assert sorted(stale) == ["shrunk", "unlinked"]